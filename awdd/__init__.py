@@ -1,10 +1,12 @@
 import io
 import struct
-from typing import *
-from enum import IntFlag
-from datetime import datetime, time
-from enum import *
-from dataclasses import *
+from typing import TYPE_CHECKING, BinaryIO, Generator, Generic, List, NamedTuple, Optional, Type, TypeVar, Union
+from enum import IntEnum, IntFlag
+from datetime import datetime, timedelta
+from dataclasses import dataclass
+
+if TYPE_CHECKING:
+    from .instrumentation import DecodeStats
 
 
 BYTE_PARSE_STRUCT = b"B"
@@ -14,20 +16,21 @@ class ManifestError(Exception):
     pass
 
 
+class DecodeError(Exception):
+    pass
+
+
+class TruncatedTagError(DecodeError):
+    def __init__(self, offset: int):
+        super().__init__(f"Incomplete tag at offset {offset}")
+        self.offset = offset
+
+
+UNIX_EPOCH = datetime(1970, 1, 1)
+
+
 def apple_time_to_datetime(epoch_milliseconds: int) -> datetime:
-    unix_epoch = epoch_milliseconds / 1000
-    micros = (epoch_milliseconds % 1000) * 1000
-    base_date_time = datetime.utcfromtimestamp(unix_epoch)
-    return datetime(
-        base_date_time.year,
-        base_date_time.month,
-        base_date_time.day,
-        hour=base_date_time.hour,
-        minute=base_date_time.minute,
-        second=base_date_time.second,
-        microsecond=micros,
-        tzinfo=base_date_time.tzinfo,
-    )
+    return UNIX_EPOCH + timedelta(milliseconds=epoch_milliseconds)
 
 
 def to_complete_tag(category: int, index: int) -> int:
@@ -98,7 +101,9 @@ encoded as in email 7bit encoding (MIME)
 
 
 def decode_tag(
-    data: Union[io.IOBase, bytes], enum: Optional[Type[IntEnum]] = int
+    data: Union[io.IOBase, bytes],
+    enum: Optional[Type[IntEnum]] = int,
+    stats: Optional["DecodeStats"] = None,
 ) -> Optional[Tag]:
     reader = io.BytesIO(data) if isinstance(data, bytes) else data
 
@@ -111,6 +116,9 @@ def decode_tag(
     type_bits = TagType(encoded_tag & 0b111)
     index_bits = encoded_tag >> 3
 
+    if stats is not None:
+        stats.record_tag(int(type_bits))
+
     if enum == int:
         index = index_bits
     else:
@@ -135,12 +143,60 @@ def decode_tag(
 
 
 def decode_tags(
-    data: Union[bytes, io.IOBase], enum: Optional[Type[IntEnum]] = int
+    data: Union[bytes, io.IOBase],
+    enum: Optional[Type[IntEnum]] = int,
+    stats: Optional["DecodeStats"] = None,
 ) -> List[Tag]:
     reader = io.BytesIO(data) if isinstance(data, bytes) else data
 
     result = []
-    while tag := decode_tag(reader, enum):
+    while tag := decode_tag(reader, enum, stats):
         result.append(tag)
 
     return result
+
+
+# The main classes are reachable from the package itself, imported on first access so that `import awdd` stays
+# cheap and protobuf, sqlite3 and the writers are only loaded by the runs that use them
+_LAZY_EXPORTS = {
+    "Metadata": "metadata",
+    "LogParser": "parser",
+    "DecodeStats": "instrumentation",
+    "DiagnosticObject": "object",
+    "JsonWriter": "json_writer",
+    "TextWriter": "text_writer",
+    "DecodeCache": "cache",
+    "MetadataRegistry": "registry",
+    "MetadataSnapshot": "snapshot",
+    "restore_metadata": "snapshot",
+    "compile_decoders": "codegen",
+    "ProtobufDecoder": "descriptors",
+    "descriptor_set": "descriptors",
+    "export_proto": "protoexport",
+    "SqliteExporter": "sqlite",
+    "Aggregator": "aggregate",
+    "TimeIndex": "timeindex",
+    "build_time_index": "timeindex",
+    "LogFollower": "follow",
+    "Sampler": "sampling",
+    "CensusScanner": "census",
+    "scan_corpus": "census",
+    "timestamps_to_datetime64": "timestamps",
+    "timestamps_to_isoformat": "timestamps",
+}
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from importlib import import_module
+
+    value = getattr(import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted({*globals(), *_LAZY_EXPORTS})
@@ -0,0 +1,366 @@
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+
+from .definition import (
+    IntegerFormat,
+    ManifestObjectDefinition,
+    ManifestProperty,
+    ManifestTypeDefinition,
+    PropertyType,
+    SIGNED_TYPES,
+    TIMESTAMP_FORMATS,
+)
+from .metadata import Metadata
+from .stream import (
+    DEFAULT_MAX_PAYLOAD,
+    DEFAULT_WINDOW_SIZE,
+    ChunkedTagReader,
+    iter_fields,
+)
+
+DEFAULT_MAX_CATEGORIES = 256
+OTHER_CATEGORY = "<other>"
+
+# Integers that name something rather than measure it, summarised by counting distinct values
+IDENTIFIER_FORMATS = frozenset(
+    [
+        IntegerFormat.METRIC_ID,
+        IntegerFormat.TRIGGER_ID,
+        IntegerFormat.PROFILE_ID,
+        IntegerFormat.COMPONENT_ID,
+    ]
+)
+
+CATEGORICAL_TYPES = frozenset(
+    [PropertyType.BOOLEAN, PropertyType.ENUM, PropertyType.STRING, PropertyType.ERROR_CODE]
+)
+
+
+class NumericSummary:
+    """
+    Count, sum, range and a power of two histogram of integer samples.  Bucket `n` holds values with a bit length
+    of `n` (negative buckets for negative values), so the histogram never grows past 130 entries
+    """
+
+    __slots__ = ("count", "total", "minimum", "maximum", "histogram")
+
+    count: int
+    total: int
+    minimum: Optional[int]
+    maximum: Optional[int]
+    histogram: Optional[Dict[int, int]]
+
+    def __init__(self, histogram: bool = True):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+        self.histogram = {} if histogram else None
+
+    def __getstate__(self):
+        return self.count, self.total, self.minimum, self.maximum, self.histogram
+
+    def __setstate__(self, state):
+        self.count, self.total, self.minimum, self.maximum, self.histogram = state
+
+    def add(self, value: int):
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+        if self.histogram is not None:
+            bucket = value.bit_length() if value >= 0 else -value.bit_length()
+            self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def empty(self) -> "NumericSummary":
+        return NumericSummary(histogram=self.histogram is not None)
+
+    def merge(self, other: "NumericSummary"):
+        if not other.count:
+            return
+
+        self.count += other.count
+        self.total += other.total
+        self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+        self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+
+        if self.histogram is not None and other.histogram is not None:
+            for bucket, count in other.histogram.items():
+                self.histogram[bucket] = self.histogram.get(bucket, 0) + count
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def as_dict(self) -> dict:
+        result = {
+            "count": self.count,
+            "min": self.minimum,
+            "max": self.maximum,
+            "mean": self.mean,
+        }
+        if self.histogram is not None:
+            result["histogram"] = dict(sorted(self.histogram.items()))
+        return result
+
+
+class CategoricalSummary:
+    """
+    Occurrence counts of distinct values.  Once `limit` distinct values have been seen, new ones are counted
+    together under `OTHER_CATEGORY` so free form strings cannot grow the summary without bound
+    """
+
+    __slots__ = ("count", "counts", "limit")
+
+    count: int
+    counts: Dict[Union[str, int, bool], int]
+    limit: int
+
+    def __init__(self, limit: int = DEFAULT_MAX_CATEGORIES):
+        self.count = 0
+        self.counts = {}
+        self.limit = limit
+
+    def __getstate__(self):
+        return self.count, self.counts, self.limit
+
+    def __setstate__(self, state):
+        self.count, self.counts, self.limit = state
+
+    def add(self, value: Union[str, int, bool]):
+        self.count += 1
+        counts = self.counts
+        if value in counts:
+            counts[value] += 1
+        elif len(counts) < self.limit:
+            counts[value] = 1
+        else:
+            counts[OTHER_CATEGORY] = counts.get(OTHER_CATEGORY, 0) + 1
+
+    def empty(self) -> "CategoricalSummary":
+        return CategoricalSummary(self.limit)
+
+    def merge(self, other: "CategoricalSummary"):
+        self.count += other.count
+        for value, count in other.counts.items():
+            if value in self.counts or len(self.counts) < self.limit:
+                self.counts[value] = self.counts.get(value, 0) + count
+            else:
+                self.counts[OTHER_CATEGORY] = self.counts.get(OTHER_CATEGORY, 0) + count
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "counts": dict(sorted(self.counts.items(), key=lambda item: -item[1])),
+        }
+
+
+Summary = Union[NumericSummary, CategoricalSummary]
+
+
+class Aggregation:
+    """
+    The mergeable result of aggregating any number of logs: how many objects of each class were seen and a
+    summary per (class name, field name).  Holds no schema objects, so it pickles cheaply between processes
+    """
+
+    records: Dict[Optional[str], int]
+    fields: Dict[Tuple[Optional[str], Optional[str]], Summary]
+    unknown_tags: int
+    skipped_payloads: int
+
+    def __init__(self):
+        self.records = {}
+        self.fields = {}
+        self.unknown_tags = 0
+        self.skipped_payloads = 0
+
+    def merge(self, other: "Aggregation") -> "Aggregation":
+        for name, count in other.records.items():
+            self.records[name] = self.records.get(name, 0) + count
+
+        for key, summary in other.fields.items():
+            existing = self.fields.get(key)
+            if existing is None:
+                existing = self.fields[key] = summary.empty()
+            existing.merge(summary)
+
+        self.unknown_tags += other.unknown_tags
+        self.skipped_payloads += other.skipped_payloads
+        return self
+
+    def __getitem__(self, key: Tuple[str, str]) -> Summary:
+        return self.fields[key]
+
+    def as_dict(self) -> Dict[Optional[str], dict]:
+        """
+        Summaries by class and field name, sorted by name with unnamed classes and fields (None) last
+        """
+        result = {
+            name: {"count": count, "fields": {}}
+            for name, count in sorted(self.records.items(), key=lambda item: _name_order(item[0]))
+        }
+        fields = sorted(
+            self.fields.items(), key=lambda item: (_name_order(item[0][0]), _name_order(item[0][1]))
+        )
+        for (klass, field), summary in fields:
+            result.setdefault(klass, {"count": 0, "fields": {}})["fields"][field] = summary.as_dict()
+        return result
+
+
+def _name_order(name: Optional[str]) -> Tuple[bool, str]:
+    return name is None, name or ""
+
+
+# How a field is folded in: its property, its (class name, field name) group and the kind of summary it feeds
+_FieldPlan = Tuple[ManifestProperty, Tuple[str, str], str]
+
+NUMERIC = "numeric"
+TIME = "time"
+CATEGORY = "category"
+LENGTH = "length"
+NESTED = "nested"
+
+
+class Aggregator:
+    """
+    Folds logs into an `Aggregation` straight from the tag stream, without building `DiagnosticObject`s.  How each
+    field is summarised follows its `ManifestProperty`: numbers get a `NumericSummary`, timestamps their range,
+    enums, booleans, strings and identifiers a `CategoricalSummary`, and bytes the distribution of their lengths.
+    Nested objects are aggregated under their own class.  Memory is proportional to the number of groups
+    """
+
+    metadata: Metadata
+    aggregation: Aggregation
+    max_categories: int
+
+    def __init__(
+        self,
+        metadata: Metadata,
+        max_categories: int = DEFAULT_MAX_CATEGORIES,
+        aggregation: Optional[Aggregation] = None,
+    ):
+        self.metadata = metadata
+        self.metadata.resolve()
+        self.max_categories = max_categories
+        self.aggregation = aggregation if aggregation is not None else Aggregation()
+        self._plans: Dict[int, Dict[int, _FieldPlan]] = {}
+
+    def _plan_field(self, klass: ManifestObjectDefinition, prop: ManifestProperty) -> _FieldPlan:
+        key = (klass.name, prop.name)
+
+        if prop.type == PropertyType.OBJECT:
+            kind = NESTED if isinstance(prop.object_type, ManifestObjectDefinition) else LENGTH
+        elif prop.type in (PropertyType.BYTES, PropertyType.UNKNOWN) or prop.type >= PropertyType.PACKED_TIMES:
+            kind = LENGTH
+        elif prop.type in CATEGORICAL_TYPES or prop.integer_format in IDENTIFIER_FORMATS:
+            kind = CATEGORY
+        elif prop.integer_format in TIMESTAMP_FORMATS:
+            kind = TIME
+        else:
+            kind = NUMERIC
+
+        if kind != NESTED and key not in self.aggregation.fields:
+            if kind == CATEGORY:
+                self.aggregation.fields[key] = CategoricalSummary(self.max_categories)
+            else:
+                self.aggregation.fields[key] = NumericSummary(histogram=kind != TIME)
+
+        return prop, key, kind
+
+    def _plan(self, klass: ManifestObjectDefinition) -> Dict[int, _FieldPlan]:
+        plan = self._plans.get(id(klass))
+        if plan is None:
+            plan = {prop.index: self._plan_field(klass, prop) for prop in klass.properties}
+            self._plans[id(klass)] = plan
+        return plan
+
+    @staticmethod
+    def _category(
+        prop: ManifestProperty, value: Union[int, bytes, memoryview]
+    ) -> Union[str, int, bool]:
+        if isinstance(value, (bytes, memoryview)):
+            return bytes(value).decode("utf-8", errors="replace")
+        if prop.type == PropertyType.BOOLEAN:
+            return bool(value)
+        if prop.type == PropertyType.ENUM and isinstance(prop.enum_type, ManifestTypeDefinition):
+            return prop.enum_type.label_for_value(value)
+        return value
+
+    def feed_object(self, klass: ManifestObjectDefinition, payload: Union[bytes, memoryview]):
+        """
+        Aggregates one encoded object of class `klass`
+        """
+        aggregation = self.aggregation
+        aggregation.records[klass.name] = aggregation.records.get(klass.name, 0) + 1
+        plan = self._plan(klass)
+
+        for index, length_prefixed, value in iter_fields(payload):
+            self._fold(plan, index, length_prefixed, value)
+
+    def _fold(
+        self,
+        plan: Dict[int, _FieldPlan],
+        index: int,
+        length_prefixed: bool,
+        value: Union[int, memoryview, bytes],
+    ):
+        field = plan.get(index)
+        if field is None:
+            self.aggregation.unknown_tags += 1
+            return
+
+        prop, key, kind = field
+        if kind == NESTED:
+            if length_prefixed:
+                self.feed_object(prop.object_type, value)
+            else:
+                self.aggregation.unknown_tags += 1
+        elif kind == CATEGORY:
+            self.aggregation.fields[key].add(self._category(prop, value))
+        elif kind == LENGTH or length_prefixed:
+            self.aggregation.fields[key].add(len(value))
+        else:
+            bits = SIGNED_TYPES.get(prop.type)
+            if bits is not None and value >> (bits - 1):
+                value -= 1 << bits
+            self.aggregation.fields[key].add(value)
+
+    def feed(
+        self,
+        data: Union[bytes, BinaryIO],
+        window_size: int = DEFAULT_WINDOW_SIZE,
+        max_payload: int = DEFAULT_MAX_PAYLOAD,
+    ) -> Aggregation:
+        """
+        Aggregates a whole log.  Streams are read through a `ChunkedTagReader`, top level payloads larger than
+        `max_payload` are skipped and counted in `Aggregation.skipped_payloads`
+        """
+        root = self.metadata.root()
+
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            self.feed_object(root, data)
+            return self.aggregation
+
+        aggregation = self.aggregation
+        aggregation.records[root.name] = aggregation.records.get(root.name, 0) + 1
+        plan = self._plan(root)
+        reader = ChunkedTagReader(data, window_size, max_payload)
+
+        while (header := reader.read_header()) is not None:
+            if header.value is not None:
+                self._fold(plan, header.index, False, header.value)
+            elif header.length > max_payload:
+                reader.skip_payload(header)
+                aggregation.skipped_payloads += 1
+            else:
+                self._fold(plan, header.index, True, reader.read_payload(header))
+
+        return aggregation
+
+    def merge(self, other: Union["Aggregator", Aggregation]) -> Aggregation:
+        return self.aggregation.merge(
+            other.aggregation if isinstance(other, Aggregator) else other
+        )
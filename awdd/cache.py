@@ -0,0 +1,138 @@
+import hashlib
+import marshal
+import os
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from .object import DiagnosticTree
+
+CACHE_MAGIC = b"AWDC"
+CACHE_SUFFIX = ".awdc"
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+
+class DecodeCache:
+    """
+    On-disk cache of decoded logs, keyed by the SHA-256 of the input bytes and the identity of the `Metadata`
+    used to decode them, so a schema change never serves stale results.  Entries are marshalled
+    `DiagnosticTree`s compressed with zlib, the least recently used entries are evicted once the directory grows
+    past `max_bytes`.  Safe to share between processes, writes are atomic renames
+    """
+
+    directory: Path
+    max_bytes: int
+    hits: int
+    misses: int
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int = DEFAULT_CACHE_SIZE):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size: Optional[int] = None
+
+    @staticmethod
+    def key(data: bytes, metadata_identity: bytes) -> str:
+        digest = hashlib.sha256(metadata_identity)
+        digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / (key + CACHE_SUFFIX)
+
+    def get(self, key: str) -> Optional[DiagnosticTree]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as entry:
+                data = entry.read()
+            # Reads refresh the modification time, which orders eviction
+            self._touch(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        header = CACHE_MAGIC + bytes([marshal.version])
+        if data[: len(header)] != header:
+            self.misses += 1
+            return None
+
+        try:
+            tree = marshal.loads(zlib.decompress(data[len(header) :]))
+        except (ValueError, EOFError, TypeError, zlib.error):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return tree
+
+    def put(self, key: str, tree: DiagnosticTree):
+        data = CACHE_MAGIC + bytes([marshal.version]) + zlib.compress(marshal.dumps(tree), 1)
+
+        path = self._path(key)
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as output:
+                output.write(data)
+            self._touch(temporary)
+            try:
+                # An entry written again, e.g. by another process, replaces the old one rather than adding to it
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+        if self._size is None:
+            self._size = self._scan_size()
+        else:
+            self._size += len(data) - replaced
+
+        if self._size > self.max_bytes:
+            self.evict()
+
+    @staticmethod
+    def _touch(path: Union[str, Path]):
+        # Explicit nanosecond times, file system timestamps are often only as fine as the kernel tick
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _entries(self) -> Dict[Path, os.stat_result]:
+        entries = {}
+        for path in self.directory.glob("*" + CACHE_SUFFIX):
+            try:
+                entries[path] = path.stat()
+            except FileNotFoundError:
+                pass
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(stat.st_size for stat in self._entries().values())
+
+    def evict(self):
+        """
+        Deletes least recently used entries until the cache is back under its size budget
+        """
+        entries = self._entries()
+        size = sum(stat.st_size for stat in entries.values())
+
+        for path, stat in sorted(entries.items(), key=lambda entry: entry[1].st_mtime_ns):
+            if size <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            size -= stat.st_size
+
+        self._size = size
+
+    def clear(self):
+        for path in self._entries():
+            path.unlink(missing_ok=True)
+        self._size = 0
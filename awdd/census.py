@@ -0,0 +1,273 @@
+import io
+import os
+from itertools import chain, islice
+from typing import BinaryIO, Dict, Iterable, List, Optional, Union
+
+from . import DecodeError, TagType, TruncatedTagError
+from .definition import ManifestObjectDefinition
+from .metadata import Metadata
+from .stream import DEFAULT_MAX_PAYLOAD, DEFAULT_WINDOW_SIZE, ChunkedTagReader, TagHeader
+from .timeindex import NO_METRIC, metric_id_tags, metric_logs_property
+
+CensusInput = Union[str, os.PathLike, bytes]
+
+# Metric key of entries over the payload budget, never a metric id since those are unsigned varints
+OVERSIZED = -1
+
+
+class Tally:
+    """
+    How many tags of one kind were seen and how many bytes they take, tag headers included
+    """
+
+    __slots__ = ("count", "bytes")
+
+    count: int
+    bytes: int
+
+    def __init__(self):
+        self.count = 0
+        self.bytes = 0
+
+    def __getstate__(self):
+        return self.count, self.bytes
+
+    def __setstate__(self, state):
+        self.count, self.bytes = state
+
+    def add(self, length: int):
+        self.count += 1
+        self.bytes += length
+
+    def merge(self, other: "Tally"):
+        self.count += other.count
+        self.bytes += other.bytes
+
+
+class Census:
+    """
+    The mergeable result of a census over any number of logs: counts and bytes per top level tag and per metric
+    class of the metric log entries.  Keyed by tag and metric id, names are only looked up by `as_dict`, so it
+    holds no schema objects and pickles cheaply between processes
+    """
+
+    files: int
+    failed: int  # Files that could not be read or ended inside a tag, counted up to where they stopped
+    bytes: int
+    tags: Dict[int, Tally]
+    metrics: Dict[int, Tally]
+    skipped_entries: int  # Entries over the payload budget, counted under `OVERSIZED`
+
+    def __init__(self):
+        self.files = 0
+        self.failed = 0
+        self.bytes = 0
+        self.tags = {}
+        self.metrics = {}
+        self.skipped_entries = 0
+
+    def merge(self, other: "Census") -> "Census":
+        self.files += other.files
+        self.failed += other.failed
+        self.bytes += other.bytes
+        self.skipped_entries += other.skipped_entries
+
+        for tallies, others in ((self.tags, other.tags), (self.metrics, other.metrics)):
+            for key, tally in others.items():
+                existing = tallies.get(key)
+                if existing is None:
+                    existing = tallies[key] = Tally()
+                existing.merge(tally)
+
+        return self
+
+    def as_dict(self, metadata: Optional[Metadata] = None) -> dict:
+        """
+        The census with tags and metric classes named through `metadata` where it knows them, each list ordered
+        by the bytes taken, largest first
+        """
+        root = entry_class = None
+        if metadata is not None:
+            root = metadata.root()
+            entry_class = metric_logs_property(metadata).object_type
+
+        def rows(tallies: Dict[int, Tally], key: str, name) -> List[dict]:
+            return [
+                {
+                    "name": name(value),
+                    key: value,
+                    "count": tally.count,
+                    "bytes": tally.bytes,
+                    "share": tally.bytes / self.bytes if self.bytes else 0.0,
+                }
+                for value, tally in sorted(tallies.items(), key=lambda item: (-item[1].bytes, item[0]))
+            ]
+
+        return {
+            "files": self.files,
+            "failed": self.failed,
+            "bytes": self.bytes,
+            "skipped_entries": self.skipped_entries,
+            "tags": rows(self.tags, "tag", lambda tag: tag_name(root, tag)),
+            "metrics": rows(self.metrics, "metric", lambda metric: metric_name(entry_class, metric)),
+        }
+
+
+def tag_name(root: Optional[ManifestObjectDefinition], tag: int) -> str:
+    prop = root.property_for_tag(tag) if root is not None else None
+    return prop.name if prop is not None else f"<tag {tag}>"
+
+
+def metric_name(entry_class: Optional[ManifestObjectDefinition], metric: int) -> str:
+    """
+    The class of a metric, found through the extension property the metric's payload is stored under
+    """
+    if metric == NO_METRIC:
+        return "<none>"
+    if metric == OVERSIZED:
+        return "<oversized>"
+
+    prop = entry_class.property_for_tag(metric) if entry_class is not None else None
+    if prop is None:
+        return f"0x{metric:x}"
+    if isinstance(prop.object_type, ManifestObjectDefinition):
+        return prop.object_type.name
+    return prop.name
+
+
+class CensusScanner:
+    """
+    Walks logs by their tag headers and lengths alone.  Top level payloads are skipped unread, metric log
+    entries are walked field header by field header only as far as the varint holding their metric id and the
+    rest skipped, nothing is decoded.  Keeps just the
+    tags it needs from the schema, so it pickles cheaply to worker processes
+    """
+
+    entry_tag: int
+    metric_tags: frozenset
+    window_size: int
+    max_payload: int
+
+    def __init__(
+        self,
+        metadata: Metadata,
+        window_size: int = DEFAULT_WINDOW_SIZE,
+        max_payload: int = DEFAULT_MAX_PAYLOAD,
+    ):
+        metadata.resolve()
+        prop = metric_logs_property(metadata)
+        self.entry_tag = prop.index
+        self.metric_tags = metric_id_tags(prop.object_type)
+        self.window_size = window_size
+        self.max_payload = max_payload
+
+    def scan(self, data: Union[bytes, BinaryIO], census: Optional[Census] = None) -> Census:
+        """
+        Counts one log into `census` (a new one if not given).  Raises `DecodeError` if the log ends inside a
+        tag, with everything before it already counted
+        """
+        if census is None:
+            census = Census()
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = io.BytesIO(data)
+
+        census.files += 1
+        reader = ChunkedTagReader(data, self.window_size, self.max_payload)
+        tags = census.tags
+        metrics = census.metrics
+        # Skipping past the end of a seekable stream only shows at the next header, so each tag is counted then
+        pending = None
+
+        while True:
+            header = reader.read_header()
+            if pending is not None:
+                index, metric, length = pending
+                if metric is not None:
+                    if metric == OVERSIZED:
+                        census.skipped_entries += 1
+                    tally = metrics.get(metric)
+                    if tally is None:
+                        tally = metrics[metric] = Tally()
+                    tally.add(length)
+
+                tally = tags.get(index)
+                if tally is None:
+                    tally = tags[index] = Tally()
+                tally.add(length)
+                census.bytes += length
+
+            if header is None:
+                break
+
+            metric = None
+            if header.index == self.entry_tag and header.tag_type & TagType.LENGTH_PREFIX:
+                if header.length > self.max_payload:
+                    reader.skip_payload(header)
+                    metric = OVERSIZED
+                else:
+                    metric = self._entry_metric(reader, header)
+            elif header.tag_type & TagType.LENGTH_PREFIX:
+                reader.skip_payload(header)
+
+            pending = header.index, metric, header.header_length + header.length
+
+        return census
+
+    def _entry_metric(self, reader: ChunkedTagReader, header: TagHeader) -> int:
+        # The first of the entry's metric id fields, like `entry_metric` but without reading the entry into memory
+        metric = NO_METRIC
+        while reader.offset < header.end:
+            field = reader.read_header()
+            if field is None or field.end > header.end:
+                raise TruncatedTagError(header.offset)
+            if field.tag_type & TagType.LENGTH_PREFIX:
+                reader.skip_payload(field)
+            elif field.index in self.metric_tags:
+                metric = field.value
+                break
+
+        reader.skip_to(header.end)
+        return metric
+
+    def scan_input(self, item: CensusInput) -> Census:
+        """
+        The census of one log, its bytes or a path.  A log that cannot be read or is cut short is counted as
+        failed rather than raising, so one bad file does not stop a corpus
+        """
+        census = Census()
+        try:
+            if isinstance(item, (bytes, bytearray, memoryview)):
+                self.scan(item, census)
+            else:
+                with open(item, "rb") as stream:
+                    self.scan(stream, census)
+        except (OSError, DecodeError):
+            census.failed += 1
+        return census
+
+
+def scan_corpus(metadata: Metadata, inputs: Iterable[CensusInput], jobs: Optional[int] = None) -> Census:
+    """
+    The census of many logs, scanned in a pool of `jobs` worker processes (one per CPU by default, none with
+    `jobs=1`).  Inputs are taken lazily, a few per worker at a time, so a generated corpus is never held whole
+    """
+    scanner = CensusScanner(metadata)
+    inputs = iter(inputs)
+    first = list(islice(inputs, 2))
+    census = Census()
+
+    if jobs == 1 or len(first) <= 1:
+        for item in chain(first, inputs):
+            census.merge(scanner.scan_input(item))
+        return census
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    from .pipeline import bounded_map
+
+    window = (jobs or os.cpu_count() or 1) * 4
+    with ProcessPoolExecutor(jobs) as pool:
+        for result in bounded_map(pool, scanner.scan_input, chain(first, inputs), window=window):
+            census.merge(result)
+
+    return census
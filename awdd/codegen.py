@@ -0,0 +1,308 @@
+import keyword
+import linecache
+import unicodedata
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import TagType, TruncatedTagError
+from .definition import (
+    SIGNED_TYPES,
+    ManifestObjectDefinition,
+    ManifestProperty,
+    ManifestTypeDefinition,
+    PropertyFlags,
+    PropertyType,
+)
+from .metadata import Metadata
+from .stream import varint_at
+
+# Compiled decoders are shared by every `Metadata` with the same schema identity
+MAX_CACHED_SCHEMAS = 8
+_compiled: Dict[bytes, "CompiledDecoders"] = {}
+_compiled_lock = Lock()
+
+UNKNOWN_FIELD = "_unknown"
+
+# Attributes every generated class inherits, fields of these names get their index appended
+RESERVED_FIELDS = frozenset(["as_dict", "definition"])
+
+
+def identifier(name: Any, fallback: str) -> str:
+    """
+    A valid Python identifier for a manifest name, which may be missing or use characters Python does not allow.
+    Never starts with an underscore, names with one are left to the generated module's own helpers
+    """
+    if not isinstance(name, str) or not name:
+        return fallback
+    # Python reads identifiers NFKC normalized, the names in the source and the slots must agree
+    name = unicodedata.normalize("NFKC", name)
+    name = "".join(char if ("_" + char).isidentifier() else "_" for char in name)
+    if not name.isidentifier() or name[0] == "_" or keyword.iskeyword(name):
+        name = "f_" + name
+    if not name.isidentifier() or unicodedata.normalize("NFKC", name) != name:
+        return fallback
+    return name
+
+
+class DecodedObject:
+    """
+    Base of the generated classes, one slotted subclass per object class with an attribute per field.  Values are
+    converted as `DiagnosticValue.typed` converts them.  Repeated fields are lists, absent fields None, tags the
+    schema does not know are kept unconverted as (index, value) pairs in `_unknown`
+    """
+
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+    definition: Optional[ManifestObjectDefinition] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            name: [item.as_dict() if isinstance(item, DecodedObject) else item for item in value]
+            if isinstance(value, list)
+            else value.as_dict()
+            if isinstance(value, DecodedObject)
+            else value
+            for name, value in ((name, getattr(self, name)) for name in self._fields)
+        }
+
+    def __eq__(self, other: Any) -> bool:
+        return type(other) is type(self) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{type(self).__name__}({fields})"
+
+
+class _SourceWriter:
+    def __init__(self):
+        self.lines: List[str] = []
+        self.indent = 0
+
+    def line(self, text: str = ""):
+        self.lines.append("    " * self.indent + text if text else "")
+
+    def source(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def _payload_expression(prop: ManifestProperty, class_names: Dict[int, str]) -> str:
+    if prop.type == PropertyType.OBJECT and isinstance(prop.object_type, ManifestObjectDefinition):
+        return f"_decode_{class_names[id(prop.object_type)]}(_data, _position, _payload_end)"
+    if prop.type == PropertyType.STRING:
+        return '_str(_data[_position:_payload_end], "utf-8", "replace")'
+    return "_data[_position:_payload_end]"
+
+
+def _convert_varint(out: "_SourceWriter", prop: ManifestProperty, labels: List[Callable]):
+    """
+    Statements converting `_value` in place, the same conversions `DiagnosticValue.typed` makes
+    """
+    if prop.type == PropertyType.ENUM and isinstance(prop.enum_type, ManifestTypeDefinition):
+        out.line(f"_value = _labels[{len(labels)}](_value)")
+        labels.append(prop.enum_type.label_for_value)
+    elif prop.type == PropertyType.BOOLEAN:
+        out.line("_value = _value != 0")
+    elif prop.type in SIGNED_TYPES:
+        bits = SIGNED_TYPES[prop.type]
+        out.line(f"_value &= {(1 << bits) - 1:#x}")
+        out.line(f"if _value >> {bits - 1}:")
+        out.line(f"    _value -= {1 << bits:#x}")
+
+
+def _generate(
+    metadata: Metadata,
+) -> Tuple[str, Dict[int, str], Dict[int, ManifestObjectDefinition], List[Callable]]:
+    """
+    Python source for the decoders of every object class, with the function name of each class by its tag and
+    the enum label lookups the source refers to by position.  Every other name the source uses - its globals
+    and builtins (passed in, `_str`), the decode functions and their locals - starts with an underscore, which
+    `identifier` never produces, so no class can shadow them
+    """
+    out = _SourceWriter()
+    labels: List[Callable] = []
+    class_names: Dict[int, str] = {}
+    used = set()
+    for tag, klass in sorted(metadata.all_objects.items()):
+        name = identifier(klass.name, f"Object_{tag:x}")
+        if name in used or keyword.iskeyword(name):
+            name = f"{name}_{tag:x}"
+        used.add(name)
+        class_names[id(klass)] = name
+
+    definitions = {}
+    functions = {}
+
+    for tag, klass in sorted(metadata.all_objects.items()):
+        class_name = class_names[id(klass)]
+        definitions[tag] = klass
+        functions[tag] = f"_decode_{class_name}"
+
+        fields: List[Tuple[str, Any]] = []
+        names = {UNKNOWN_FIELD} | RESERVED_FIELDS
+        for prop in klass.properties:
+            name = identifier(prop.name, f"field_{prop.index:x}")
+            while name in names:
+                name = f"{name}_{prop.index:x}"
+            names.add(name)
+            fields.append((name, prop))
+
+        slots = tuple(name for name, _ in fields) + (UNKNOWN_FIELD,)
+        out.line(f"class {class_name}(_DecodedObject):")
+        out.indent += 1
+        out.line(f"__slots__ = {slots!r}")
+        out.line(f"_fields = {slots[:-1]!r}")
+        out.indent -= 1
+        out.line(f"{class_name}.definition = _definitions[{tag}]")
+        out.line()
+
+        out.line(f"def _decode_{class_name}(_data, _position, _end):")
+        out.indent += 1
+        out.line(f"_result = _new({class_name})")
+        for name, prop in fields:
+            default = "[]" if prop.flags & PropertyFlags.REPEATED else "None"
+            out.line(f"_result.{name} = {default}")
+        out.line(f"_result.{UNKNOWN_FIELD} = None")
+
+        out.line("while _position < _end:")
+        out.indent += 1
+        # Single byte varints are by far the most common, the helper is only called for longer ones
+        for variable in ("_key", "_value"):
+            out.line(f"{variable} = _data[_position]")
+            out.line(f"if {variable} < 0x80:")
+            out.line("    _position += 1")
+            out.line("else:")
+            out.line(f"    {variable}, _position = _varint_at(_data, _position)")
+        out.line("_index = _key >> 3")
+
+        out.line(f"if _key & {int(TagType.LENGTH_PREFIX)}:")
+        out.indent += 1
+        out.line("_payload_end = _position + _value")
+        out.line("if _payload_end > _end:")
+        out.line("    raise _TruncatedTagError(_position)")
+        keyword_ = "if"
+        for name, prop in fields:
+            out.line(f"{keyword_} _index == {prop.index:#x}:")
+            keyword_ = "elif"
+            converted = _payload_expression(prop, class_names)
+            if prop.flags & PropertyFlags.REPEATED:
+                out.line(f"    _result.{name}.append({converted})")
+            else:
+                out.line(f"    _result.{name} = {converted}")
+        out.line(f"{'else' if fields else 'if True'}:")
+        out.line("    _unknown(_result, _index, _data[_position:_payload_end])")
+        out.line("_position = _payload_end")
+        out.indent -= 1
+
+        out.line("else:")
+        out.indent += 1
+        keyword_ = "if"
+        for name, prop in fields:
+            out.line(f"{keyword_} _index == {prop.index:#x}:")
+            keyword_ = "elif"
+            out.indent += 1
+            _convert_varint(out, prop, labels)
+            if prop.flags & PropertyFlags.REPEATED:
+                out.line(f"_result.{name}.append(_value)")
+            else:
+                out.line(f"_result.{name} = _value")
+            out.indent -= 1
+        out.line(f"{'else' if fields else 'if True'}:")
+        out.line("    _unknown(_result, _index, _value)")
+        out.indent -= 2
+
+        out.line("return _result")
+        out.indent -= 1
+        out.line()
+
+    return out.source(), functions, definitions, labels
+
+
+def _unknown(result: DecodedObject, index: int, value: Any):
+    if result._unknown is None:
+        result._unknown = []
+    result._unknown.append((index, value))
+
+
+class CompiledDecoders:
+    """
+    Decoders generated for one schema: a slotted `DecodedObject` subclass and a decode function per object class,
+    with the tag constants and per field conversions inlined rather than looked up for every tag.  Payloads are
+    copied out, nested objects decoded in place
+    """
+
+    identity: bytes
+    source: str
+    classes: Dict[str, type]
+
+    def __init__(self, metadata: Metadata):
+        metadata.resolve()
+        self.identity = metadata.identity()
+        self.source, functions, definitions, labels = _generate(metadata)
+
+        filename = f"<awdd decoders {self.identity[:8].hex()}>"
+        # Registered so tracebacks through the generated code show its source
+        linecache.cache[filename] = (len(self.source), None, self.source.splitlines(True), filename)
+
+        namespace = {
+            "_DecodedObject": DecodedObject,
+            "_TruncatedTagError": TruncatedTagError,
+            "_definitions": definitions,
+            "_labels": labels,
+            "_new": object.__new__,
+            "_str": str,
+            "_unknown": _unknown,
+            "_varint_at": varint_at,
+        }
+        exec(compile(self.source, filename, "exec"), namespace)
+
+        # By composite tag rather than definition, so any `Metadata` with the same identity can share them
+        self._functions: Dict[int, Callable] = {
+            tag: namespace[name] for tag, name in functions.items()
+        }
+        self.classes = {
+            name: value
+            for name, value in namespace.items()
+            if isinstance(value, type) and issubclass(value, DecodedObject) and value is not DecodedObject
+        }
+        self._decode_root = self.decoder_for(metadata.root())
+
+    def decoder_for(self, klass: ManifestObjectDefinition) -> Callable[[bytes], DecodedObject]:
+        function = self._functions[klass.composite_tag()]
+
+        def decode(data: bytes) -> DecodedObject:
+            try:
+                return function(data, 0, len(data))
+            except IndexError:
+                # A varint running off the end of the data
+                raise TruncatedTagError(len(data)) from None
+
+        return decode
+
+    def decode_object(self, klass: ManifestObjectDefinition, data: bytes) -> DecodedObject:
+        return self.decoder_for(klass)(data)
+
+    def decode(self, data: bytes) -> DecodedObject:
+        """
+        Decodes a whole log, starting from the root object
+        """
+        return self._decode_root(data)
+
+
+def compile_decoders(metadata: Metadata) -> CompiledDecoders:
+    """
+    The decoders for `metadata`, generated on first use and cached by schema identity
+    """
+    identity = metadata.identity()
+    with _compiled_lock:
+        decoders = _compiled.get(identity)
+        if decoders is not None:
+            return decoders
+
+    decoders = CompiledDecoders(metadata)
+    with _compiled_lock:
+        if len(_compiled) >= MAX_CACHED_SCHEMAS:
+            del _compiled[next(iter(_compiled))]
+        _compiled[identity] = decoders
+    return decoders
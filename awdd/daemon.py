@@ -0,0 +1,382 @@
+import json
+import os
+import queue
+import socket
+import socketserver
+import stat
+import struct
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .json_writer import JsonWriter
+from .metadata import Metadata
+from .parser import LogParser
+from .text_writer import TextWriter
+
+# A request or response is a JSON header and a binary body, framed by their lengths
+FRAME = struct.Struct(">IQ")
+
+DEFAULT_SOCKET_PATH = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or os.environ.get("TMPDIR") or "/tmp", "awdd.sock"
+)
+DAEMON_ENVIRONMENT = "AWDD_DAEMON"
+
+DEFAULT_MAX_BATCH = 64
+
+FORMATS = ("json", "text")
+
+# The `kind` of a failed request: the daemon could not read the path it was given, could not decode the log,
+# or could not make sense of the request
+READ_ERROR = "read"
+DECODE_ERROR = "decode"
+REQUEST_ERROR = "request"
+
+
+class DaemonError(Exception):
+    def __init__(self, message: str, kind: str = REQUEST_ERROR):
+        super().__init__(message)
+        self.kind = kind
+
+
+def _receive_exactly(connection: socket.socket, count: int) -> bytes:
+    chunks = []
+    while count:
+        chunk = connection.recv(min(count, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Connection closed mid message")
+        chunks.append(chunk)
+        count -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_message(connection: socket.socket, header: Dict[str, Any], body: bytes = b""):
+    encoded = json.dumps(header).encode("utf-8")
+    connection.sendall(FRAME.pack(len(encoded), len(body)) + encoded)
+    if body:
+        connection.sendall(body)
+
+
+def receive_message(connection: socket.socket) -> Optional[Tuple[Dict[str, Any], bytes]]:
+    """
+    The next message on the connection, None if it was closed between messages
+    """
+    first = connection.recv(FRAME.size)
+    if not first:
+        return None
+    frame = first + _receive_exactly(connection, FRAME.size - len(first))
+    header_length, body_length = FRAME.unpack(frame)
+    header = json.loads(_receive_exactly(connection, header_length))
+    return header, _receive_exactly(connection, body_length)
+
+
+class _Request:
+    __slots__ = ("header", "body", "done", "response", "error", "kind")
+
+    def __init__(self, header: Dict[str, Any], body: bytes):
+        self.header = header
+        self.body = body
+        self.done = threading.Event()
+        self.response = b""
+        self.error: Optional[str] = None
+        self.kind: Optional[str] = None
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    server: "_Server"
+
+    def handle(self):
+        while True:
+            try:
+                message = receive_message(self.request)
+            except (ConnectionError, ValueError):
+                return
+            if message is None:
+                return
+
+            header, body = message
+            daemon = self.server.daemon
+            operation = header.get("op", "decode")
+
+            if operation == "ping":
+                send_message(self.request, {"status": "ok", "schemas": list(daemon.parsers)})
+            elif operation == "stats":
+                send_message(self.request, {"status": "ok", **daemon.statistics()})
+            elif operation == "decode":
+                request = daemon.submit(header, body)
+                request.done.wait()
+                if request.error is not None:
+                    send_message(self.request, {"status": "error", "error": request.error, "kind": request.kind})
+                else:
+                    send_message(self.request, {"status": "ok"}, request.response)
+            else:
+                send_message(self.request, {"status": "error", "error": f"Unknown operation {operation}"})
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    daemon: "DecodeDaemon"
+
+
+class DecodeDaemon:
+    """
+    Keeps resolved schemas warm and decodes logs for clients over a Unix socket.  Connections are served on their
+    own threads, their decode requests are gathered into micro-batches of up to `max_batch` requests and decoded
+    on a single worker, grouped by schema so each batch runs against one warm parser at a time.  A batch is
+    whatever queued up while the worker was busy, a request arriving at an idle daemon is decoded at once.  Clients can pass a local path rather than the log's bytes
+    """
+
+    socket_path: str
+    parsers: Dict[str, LogParser]
+    default_schema: str
+
+    def __init__(
+        self,
+        schemas: Dict[str, Metadata],
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        max_batch: int = DEFAULT_MAX_BATCH,
+    ):
+        if not schemas:
+            raise DaemonError("The daemon needs at least one schema")
+
+        self.socket_path = socket_path
+        self.parsers = {name: LogParser(metadata) for name, metadata in schemas.items()}
+        self.default_schema = next(iter(schemas))
+        self.max_batch = max_batch
+        self.writers = {"json": JsonWriter(), "text": TextWriter()}
+
+        self.requests = 0
+        self.batches = 0
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._server: Optional[_Server] = None
+        self._threads: List[threading.Thread] = []
+
+    def submit(self, header: Dict[str, Any], body: bytes) -> _Request:
+        request = _Request(header, body)
+        self._queue.put(request)
+        return request
+
+    def statistics(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "schemas": list(self.parsers),
+        }
+
+    def _next_batch(self) -> Optional[List[_Request]]:
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        # Only what is already waiting, a lone request is not held back for company
+        batch = [first]
+        while len(batch) < self.max_batch:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)
+                break
+            batch.append(request)
+
+        return batch
+
+    def _decode(self, request: _Request) -> bytes:
+        header = request.header
+        schema = header.get("schema") or self.default_schema
+        parser = self.parsers.get(schema)
+        if parser is None:
+            raise DaemonError(f"Unknown schema {schema}")
+
+        output_format = header.get("format", "json")
+        if output_format not in FORMATS:
+            raise DaemonError(f"Unknown format {output_format}")
+
+        data = request.body
+        if header.get("path"):
+            try:
+                with open(header["path"], "rb") as stream:
+                    data = stream.read()
+            except OSError as error:
+                raise DaemonError(f"{type(error).__name__}: {error}", READ_ERROR) from error
+
+        try:
+            result = parser.parse(data)
+        except Exception as error:
+            raise DaemonError(f"{type(error).__name__}: {error}", DECODE_ERROR) from error
+
+        if output_format == "json":
+            return self.writers["json"].dumps(result).encode("utf-8")
+        return self.writers["text"].write(result)
+
+    def _work(self):
+        while (batch := self._next_batch()) is not None:
+            self.batches += 1
+            self.requests += len(batch)
+
+            batch.sort(key=lambda request: request.header.get("schema") or self.default_schema)
+            for request in batch:
+                try:
+                    request.response = self._decode(request)
+                except DaemonError as error:
+                    request.error, request.kind = str(error), error.kind
+                except Exception as error:
+                    request.error, request.kind = f"{type(error).__name__}: {error}", DECODE_ERROR
+                request.done.set()
+
+    def start(self) -> "DecodeDaemon":
+        """
+        Binds the socket and serves on background threads.  A socket left behind by a daemon that is no longer
+        running is replaced, anything else at the path raises `DaemonError`
+        """
+        _remove_stale_socket(self.socket_path)
+
+        # Only the user running the daemon can connect
+        previous = os.umask(0o077)
+        try:
+            self._server = _Server(self.socket_path, _Handler)
+        finally:
+            os.umask(previous)
+        self._server.daemon = self
+
+        self._threads = [
+            threading.Thread(target=self._work, name="awdd-decode", daemon=True),
+            threading.Thread(target=self._server.serve_forever, name="awdd-accept", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def serve_forever(self):
+        self.start()
+        try:
+            self._threads[1].join()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        if self._server is None:
+            return
+
+        self._server.shutdown()
+        self._server.server_close()
+        self._queue.put(None)
+        self._threads[0].join()
+        self._server = None
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def __enter__(self) -> "DecodeDaemon":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+def _remove_stale_socket(path: str):
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+
+    if not stat.S_ISSOCK(mode):
+        raise DaemonError(f"{path} exists and is not a socket")
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+
+    raise DaemonError(f"A daemon is already listening on {path}")
+
+
+def daemon_socket(socket_path: Optional[str] = None) -> Optional[str]:
+    """
+    The socket a command line tool should decode through.  A path given explicitly must have a daemon listening,
+    `DaemonError` otherwise, without one the daemon named by `AWDD_DAEMON` is used if it can be reached and None
+    is returned (decode in process) if not
+    """
+    if socket_path is None:
+        client = DaemonClient.from_environment()
+        if client is None:
+            return None
+        client.close()
+        return client.socket_path
+
+    try:
+        DaemonClient(socket_path).close()
+    except OSError as error:
+        raise DaemonError(f"Cannot connect to the daemon at {socket_path}: {error.strerror or error}") from error
+    return socket_path
+
+
+class DaemonClient:
+    """
+    Thin client for a `DecodeDaemon`, one connection reused across requests
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH):
+        self.socket_path = socket_path
+        self._connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._connection.connect(socket_path)
+
+    @classmethod
+    def from_environment(cls) -> Optional["DaemonClient"]:
+        """
+        A client for the daemon named by `AWDD_DAEMON`, None if it is unset or nothing is listening there
+        """
+        path = os.environ.get(DAEMON_ENVIRONMENT)
+        if not path:
+            return None
+        try:
+            return cls(path)
+        except OSError:
+            return None
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self) -> "DaemonClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _call(self, header: Dict[str, Any], body: bytes = b"") -> Tuple[Dict[str, Any], bytes]:
+        send_message(self._connection, header, body)
+        message = receive_message(self._connection)
+        if message is None:
+            raise DaemonError("The daemon closed the connection")
+
+        response, data = message
+        if response.get("status") != "ok":
+            raise DaemonError(response.get("error", "Unknown error"), response.get("kind") or REQUEST_ERROR)
+        return response, data
+
+    def ping(self) -> List[str]:
+        return self._call({"op": "ping"})[0]["schemas"]
+
+    def statistics(self) -> Dict[str, Any]:
+        return self._call({"op": "stats"})[0]
+
+    def decode(
+        self,
+        data: Optional[bytes] = None,
+        path: Optional[str] = None,
+        output_format: str = "json",
+        schema: Optional[str] = None,
+    ) -> str:
+        """
+        The rendered log, from its bytes or from a path the daemon can read
+        """
+        header: Dict[str, Any] = {"op": "decode", "format": output_format}
+        if schema is not None:
+            header["schema"] = schema
+        if path is not None:
+            header["path"] = os.path.abspath(path)
+        return self._call(header, data or b"")[1].decode("utf-8")
@@ -1,7 +1,10 @@
+import io
+import sys
 from abc import ABC, abstractmethod
-from enum import *
+from enum import IntEnum, IntFlag
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type, TypeVar, Union
 
-from . import *
+from . import ManifestError, Tag, decode_tag, decode_tags, to_complete_tag
 
 
 class PropertyFlags(IntFlag):
@@ -24,6 +27,16 @@ class IntegerFormat(IntEnum):
     SAMPLE_TIMESTAMP = 0x1F
 
 
+# Integer formats whose value is milliseconds since the unix epoch
+TIMESTAMP_FORMATS = frozenset(
+    [
+        IntegerFormat.TIMESTAMP,
+        IntegerFormat.SAMPLE_TIMESTAMP,
+        IntegerFormat.ASSOCIATED_TIME,
+    ]
+)
+
+
 class StringFormat(IntEnum):
     UNKNOWN = 0x00
     UUID = 0x01
@@ -51,6 +64,14 @@ class PropertyType(IntEnum):
     OBJECT = 0x1B
 
 
+# Varints are two's complement, these types are read back as signed integers of this many bits
+SIGNED_TYPES = {
+    PropertyType.INTEGER: 64,
+    PropertyType.INTEGER_64: 64,
+    PropertyType.INTEGER_32: 32,
+}
+
+
 class PropertyExtensionType(IntEnum):
     NONE = 0x00
     ADD_PROPERTY = 0x01
@@ -113,7 +134,46 @@ def to_type_descriptor(target: Union[None, int, "ManifestDefinition"]) -> Option
     return None
 
 
-class ManifestProperty:
+class Freezable:
+    """
+    Schema objects are mutable while manifests are parsed and bound, `Metadata.resolve` freezes them once
+    complete so that a resolved schema can't be changed from under the decoder
+    """
+
+    __slots__ = ("_frozen",)
+
+    def __setattr__(self, name: str, value: Any):
+        if getattr(self, "_frozen", False):
+            raise ManifestError(
+                f"Cannot set {name} on {type(self).__name__}, it is frozen"
+            )
+        object.__setattr__(self, name, value)
+
+    @property
+    def frozen(self) -> bool:
+        return getattr(self, "_frozen", False)
+
+    def freeze(self):
+        object.__setattr__(self, "_frozen", True)
+
+
+class ManifestProperty(Freezable):
+    __slots__ = (
+        "parent",
+        "index",
+        "name",
+        "type",
+        "flags",
+        "pii",
+        "integer_format",
+        "string_format",
+        "object_type",
+        "enum_type",
+        "extends",
+        "extension_scope",
+        "extension_type",
+    )
+
     index: int
     name: Optional[str]
     type: PropertyType
@@ -126,14 +186,11 @@ class ManifestProperty:
     object_type: Union[None, int, "ManifestObjectDefinition"]
     enum_type: Union[None, int, "ManifestTypeDefinition"]
 
-    target: Union[None, int, "ManifestDefinition"]
-
     extension_type: Optional[PropertyExtensionType]
     extension_scope: Optional[ManifestExtensionScopeType]
     extends: Union[None, int, "ManifestDefinition"]
 
     def __init__(self, parent):
-        self.content = []
         self.parent = parent
 
         self.type = PropertyType.UNKNOWN
@@ -149,7 +206,7 @@ class ManifestProperty:
 
         self.extends = None
         self.extension_scope = None
-        self.extension_flags = None
+        self.extension_type = None
 
     def __str__(self):
         name = "anonymous" if self.name is None else self.name
@@ -175,9 +232,7 @@ class ManifestProperty:
         )
 
     def parse(self, content: bytes):
-        self.content = decode_tags(content, ManifestPropertyTag)
-
-        for tag in self.content:
+        for tag in decode_tags(content, ManifestPropertyTag):
             if tag.index == ManifestPropertyTag.TYPE:
                 self.type = PropertyType(tag.value)
 
@@ -208,7 +263,7 @@ class ManifestProperty:
                 self.string_format = StringFormat(tag.value)
 
             elif tag.index == ManifestPropertyTag.DISPLAY_NAME:
-                self.name = tag.value.decode("utf-8")
+                self.name = sys.intern(tag.value.decode("utf-8"))
 
             elif tag.index == ManifestPropertyTag.EXTENSION_TAG:
                 self.extends = tag.value
@@ -249,7 +304,7 @@ class ManifestProperty:
                 self.extends = types[extend_id]
                 return
 
-            if self.extends not in objects:
+            if extend_id not in objects:
                 print(f"Invalid Tag?")
             else:
                 self.extends = objects[extend_id]
@@ -269,24 +324,33 @@ class ManifestProperty:
 
     def extend(self):
         if self.extends and isinstance(self.extends, ManifestObjectDefinition):
-            if self.extension_type == PropertyExtensionType.REPLACE_PROPERTY:
-                for existing_prop in list(self.extends.properties):
-                    if existing_prop.index == self.index:
-                        self.extends.properties.remove(existing_prop)
+            self.extend_into(self.extends.properties)
+
+    def extend_into(self, properties: List["ManifestProperty"]):
+        if self.extension_type == PropertyExtensionType.REPLACE_PROPERTY:
+            for existing_prop in list(properties):
+                if existing_prop.index == self.index:
+                    properties.remove(existing_prop)
 
-            self.extends.properties.append(self)
+        properties.append(self)
+
+    def rebind_extension(self, target: "ManifestObjectDefinition"):
+        """
+        Points a frozen extension property at the reloaded definition it extends, see `Metadata.refresh`
+        """
+        object.__setattr__(self, "extends", target)
 
 
 T = TypeVar("T", bound="ManifestDefinition")
 
 
-class ManifestDefinition(ABC):
+class ManifestDefinition(Freezable, ABC):
+    __slots__ = ("category", "index", "name")
+
     TAG = 0
 
-    content: List[Tag]
     category: int
     index: int
-    tag: int
     name: Optional[str]
 
     def __init__(self, category: int, index: int):
@@ -324,20 +388,22 @@ class ManifestDefinition(ABC):
         pass
 
 
-class ManifestEnumMember:
+class ManifestEnumMember(Freezable):
+    __slots__ = ("index", "name", "value")
+
     name: str | int
-    value: int
-    display: str
+    value: Optional[int]
 
     def __init__(self, index: int, data: bytes):
         self.index = index
-        self.data = data
+        self.name = None
+        self.value = None
         reader = io.BytesIO(data)
 
         while tag := decode_tag(reader, ManifestEnumMemberTag):
             if tag.index == ManifestEnumMemberTag.DISPLAY_NAME:
-                if tag.value is str:
-                    self.name = tag.value.decode("utf-8")
+                if isinstance(tag.value, bytes):
+                    self.name = sys.intern(tag.value.decode("utf-8"))
                 else:
                     self.name = tag.value
 
@@ -357,29 +423,34 @@ class ManifestEnumMember:
                 )
 
     def __str__(self):
-        return f"<ManifestEnumMember {self.name} = {hex(self.value)}>"
+        value = hex(self.value) if self.value is not None else "?"
+        return f"<ManifestEnumMember {self.name} = {value}>"
 
 
 class ManifestTypeDefinition(ManifestDefinition):
+    __slots__ = ("entries", "members_by_value", "is_flags", "_flag_labels")
+
     TAG = 2
+    FLAG_LABEL_CACHE_SIZE = 4096
 
-    entries: List[ManifestEnumMember]
-    extend: Union[None, int, "ManifestDefinition"]
+    entries: Sequence[ManifestEnumMember]
+    members_by_value: Dict[int, ManifestEnumMember]
+    is_flags: bool
 
     def __init__(self, category, index):
         super().__init__(category, index)
-        self.content = []
         self.entries = []
+        self.members_by_value = {}
+        self.is_flags = False
+        self._flag_labels = {}
 
     def __str__(self):
         return f"<ManifestTypeDefinition {self.name} value_count:{len(self.entries)}>"
 
     def parse(self, data: bytes):
-        self.content = decode_tags(data, ManifestTypeDefinitionTag)
-
-        for index, tag in enumerate(self.content):
+        for index, tag in enumerate(decode_tags(data, ManifestTypeDefinitionTag)):
             if tag.index == ManifestTypeDefinitionTag.DISPLAY_NAME:
-                self.name = tag.value.decode("utf-8")
+                self.name = sys.intern(tag.value.decode("utf-8"))
 
             elif tag.index == ManifestTypeDefinitionTag.ENUM_MEMBER:
                 self.entries.append(ManifestEnumMember(index, tag.value))
@@ -389,17 +460,87 @@ class ManifestTypeDefinition(ManifestDefinition):
                     f"Unknown property in type {self.name} - {tag.index} ({tag.value})"
                 )
 
+        self._index_members()
+
+    def _index_members(self):
+        self.members_by_value = {}
+        for member in self.entries:
+            value = getattr(member, "value", None)
+            if value is not None:
+                self.members_by_value.setdefault(value, member)
+
+        # Flag style enums are single bit values plus combinations of them (e.g. READ|WRITE), and use more bits
+        # than a plain counting enum would
+        non_zero = [value for value in self.members_by_value if value != 0]
+        bits = [value for value in non_zero if value & (value - 1) == 0]
+        covered = 0
+        for bit in bits:
+            covered |= bit
+        self.is_flags = (
+            len(bits) > 1
+            and all(value & ~covered == 0 for value in non_zero)
+            and max(bits) > len(non_zero)
+        )
+        self._flag_labels = {}
+
+    def freeze(self):
+        for member in self.entries:
+            member.freeze()
+        self.entries = tuple(self.entries)
+        super().freeze()
+
+    def member_for_value(self, value: int) -> Optional[ManifestEnumMember]:
+        return self.members_by_value.get(value)
+
+    def labels_for_value(self, value: int) -> Tuple[Union[str, int], ...]:
+        """
+        Labels of the member(s) making up `value`.  Flag style enums decompose combined values bit by bit, any
+        bits without a member are reported as a hex string.  Decompositions are memoized per enum
+        """
+        member = self.members_by_value.get(value)
+        if member is not None:
+            return (member.name,)
+
+        if not self.is_flags or value < 0:
+            return (hex(value),)
+
+        labels = self._flag_labels.get(value)
+        if labels is None:
+            result = []
+            remaining = value
+            while remaining:
+                bit = remaining & -remaining
+                member = self.members_by_value.get(bit)
+                if member is None:
+                    result.append(hex(bit))
+                else:
+                    result.append(member.name)
+                remaining ^= bit
+
+            labels = tuple(result)
+            # The only write after freezing, threads racing here store equal tuples so it needs no lock
+            if len(self._flag_labels) < ManifestTypeDefinition.FLAG_LABEL_CACHE_SIZE:
+                self._flag_labels[value] = labels
+
+        return labels
+
+    def label_for_value(self, value: int) -> str:
+        return "|".join(str(label) for label in self.labels_for_value(value))
+
 
 class ManifestObjectDefinition(ManifestDefinition):
+    __slots__ = ("properties", "own_properties")
+
     TAG = 1
 
-    properties: List[ManifestProperty]
+    properties: Sequence[ManifestProperty]
+    own_properties: Tuple[ManifestProperty, ...]
 
     def __init__(self, category, index):
         super().__init__(category, index)
 
         self.properties = []
-        self.content = []
+        self.own_properties = ()
 
     def __str__(self):
         if self.name is not None:
@@ -410,22 +551,24 @@ class ManifestObjectDefinition(ManifestDefinition):
             )
 
     def parse(self, content: bytes):
-        self.content = decode_tags(content, ManifestObjectDefinitionTag)
-
-        for tag in self.content:
+        for tag in decode_tags(content, ManifestObjectDefinitionTag):
             if tag.index == ManifestObjectDefinitionTag.PROPERTY_DEFINITION:
                 prop = ManifestProperty(self)
                 prop.parse(tag.value)
                 self.properties.append(prop)
 
             elif tag.index == ManifestObjectDefinitionTag.DISPLAY_NAME:
-                self.name = tag.value.decode("utf-8")
+                self.name = sys.intern(tag.value.decode("utf-8"))
 
             else:
                 raise ManifestError(
                     f"Unknown tag {hex(tag.index)} in object {self.name}"
                 )
 
+        # Extensions from other manifests are appended to (or replace entries in) `properties`, keep what was
+        # declared here so that the extensions can be re-applied when a manifest is reloaded
+        self.own_properties = tuple(self.properties)
+
     def property_for_tag(self, tag: int) -> Optional[ManifestProperty]:
         for prop in self.properties:
             if prop.index == tag:
@@ -438,10 +581,22 @@ class ManifestObjectDefinition(ManifestDefinition):
         enums: Dict[int, "ManifestTypeDefinition"],
         objects: Dict[int, "ManifestObjectDefinition"],
     ):
-        for prop in self.properties:
+        for prop in self.own_properties:
             prop.bind(types, enums, objects)
 
     def extend(self):
-        for prop in list(self.properties):
+        for prop in self.own_properties:
             if prop.extends:
                 prop.extend()
+
+    def freeze(self):
+        for prop in self.own_properties:
+            prop.freeze()
+        self.properties = tuple(self.properties)
+        super().freeze()
+
+    def replace_properties(self, properties: Sequence[ManifestProperty]):
+        """
+        Swaps in a new property list on a frozen definition in a single assignment, see `Metadata.refresh`
+        """
+        object.__setattr__(self, "properties", tuple(properties))
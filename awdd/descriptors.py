@@ -0,0 +1,299 @@
+from typing import Any, Dict, Optional, Union
+
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory, unknown_fields
+from google.protobuf.message import DecodeError as ProtobufDecodeError, Message
+
+from . import DecodeError
+from .codegen import identifier
+from .definition import (
+    ManifestObjectDefinition,
+    ManifestProperty,
+    ManifestTypeDefinition,
+    PropertyFlags,
+    PropertyType,
+)
+from .metadata import Metadata
+from .object import DiagnosticObject, DiagnosticTree, object_from_tree
+
+FieldDescriptorProto = descriptor_pb2.FieldDescriptorProto
+
+DEFAULT_PACKAGE = "awdd"
+DEFAULT_FILE_NAME = "awdd.proto"
+
+# Field numbers protobuf does not allow, tags in these ranges are left to the unknown fields
+MAX_FIELD_NUMBER = (1 << 29) - 1
+RESERVED_FIELD_NUMBERS = range(19000, 20000)
+
+INT32_RANGE = range(-(1 << 31), 1 << 31)
+
+# Field types when values should read back as the library's own decoder returns them: every varint unsigned
+# and every length prefixed scalar as bytes
+RAW_FIELD_TYPES = {
+    PropertyType.DOUBLE: FieldDescriptorProto.TYPE_DOUBLE,
+    PropertyType.FLOAT: FieldDescriptorProto.TYPE_FLOAT,
+    PropertyType.STRING: FieldDescriptorProto.TYPE_BYTES,
+    PropertyType.BYTES: FieldDescriptorProto.TYPE_BYTES,
+    PropertyType.PACKED_UINT_32: FieldDescriptorProto.TYPE_BYTES,
+    PropertyType.PACKED_TIMES: FieldDescriptorProto.TYPE_BYTES,
+    PropertyType.PACKED_ERRORS: FieldDescriptorProto.TYPE_BYTES,
+    PropertyType.UNKNOWN: FieldDescriptorProto.TYPE_BYTES,
+}
+
+# Field types for consumers of the schema, with the signedness, strings and booleans the manifests describe
+TYPED_FIELD_TYPES = {
+    **RAW_FIELD_TYPES,
+    PropertyType.INTEGER_64: FieldDescriptorProto.TYPE_INT64,
+    PropertyType.INTEGER: FieldDescriptorProto.TYPE_INT64,
+    PropertyType.INTEGER_32: FieldDescriptorProto.TYPE_INT32,
+    PropertyType.ERROR_CODE: FieldDescriptorProto.TYPE_INT64,
+    PropertyType.BOOLEAN: FieldDescriptorProto.TYPE_BOOL,
+    PropertyType.STRING: FieldDescriptorProto.TYPE_STRING,
+    PropertyType.PACKED_UINT_32: FieldDescriptorProto.TYPE_UINT32,
+    PropertyType.PACKED_TIMES: FieldDescriptorProto.TYPE_UINT64,
+    PropertyType.PACKED_ERRORS: FieldDescriptorProto.TYPE_UINT32,
+}
+
+PACKED_TYPES = frozenset(
+    [PropertyType.PACKED_UINT_32, PropertyType.PACKED_TIMES, PropertyType.PACKED_ERRORS]
+)
+
+
+def is_valid_field_number(index: int) -> bool:
+    return 0 < index <= MAX_FIELD_NUMBER and index not in RESERVED_FIELD_NUMBERS
+
+
+def can_be_proto_enum(enum: ManifestTypeDefinition) -> bool:
+    # Flags are combined, and proto2 enums drop values they do not declare
+    values = [member.value for member in enum.entries if member.value is not None]
+    return not enum.is_flags and bool(values) and all(value in INT32_RANGE for value in values)
+
+
+class DescriptorNames:
+    """
+    Unique protobuf names for the classes and enums of a schema, by composite tag
+    """
+
+    messages: Dict[int, str]
+    enums: Dict[int, str]
+
+    def __init__(self, metadata: Metadata):
+        self.messages = {}
+        self.enums = {}
+        used = set()
+
+        for names, definitions, fallback in (
+            (self.messages, metadata.all_objects, "Object"),
+            (self.enums, metadata.all_enums, "Enum"),
+        ):
+            for tag, definition in sorted(definitions.items()):
+                name = identifier(definition.name, f"{fallback}_{tag:x}")
+                if name in used:
+                    name = f"{name}_{tag:x}"
+                used.add(name)
+                names[tag] = name
+
+
+def field_descriptor(
+    fields,
+    prop: ManifestProperty,
+    names: DescriptorNames,
+    package: str,
+    raw_values: bool,
+    used: set,
+    keep_duplicates: bool = False,
+) -> FieldDescriptorProto:
+    """
+    Adds the descriptor of `prop` to `fields`, the fields or extensions of a message.  With `keep_duplicates`
+    every field is repeated, so a tag written more than once keeps each occurrence as the generic decoder does
+    rather than only the last one (or the merge of all of them, for messages)
+    """
+    field = fields.add()
+    name = identifier(prop.name, f"field_{prop.index:x}")
+    while name in used:
+        name = f"{name}_{prop.index:x}"
+    used.add(name)
+
+    field.name = name
+    field.number = prop.index
+    field.json_name = name
+    repeated = keep_duplicates or bool(prop.flags & PropertyFlags.REPEATED)
+
+    if prop.type == PropertyType.OBJECT and isinstance(prop.object_type, ManifestObjectDefinition):
+        field.type = FieldDescriptorProto.TYPE_MESSAGE
+        field.type_name = f".{package}.{names.messages[prop.object_type.composite_tag()]}"
+    elif (
+        not raw_values
+        and prop.type == PropertyType.ENUM
+        and isinstance(prop.enum_type, ManifestTypeDefinition)
+        and can_be_proto_enum(prop.enum_type)
+    ):
+        field.type = FieldDescriptorProto.TYPE_ENUM
+        field.type_name = f".{package}.{names.enums[prop.enum_type.composite_tag()]}"
+    else:
+        types = RAW_FIELD_TYPES if raw_values else TYPED_FIELD_TYPES
+        field.type = types.get(prop.type, FieldDescriptorProto.TYPE_UINT64)
+        if not raw_values and prop.type in PACKED_TYPES:
+            repeated = True
+            field.options.packed = True
+
+    field.label = FieldDescriptorProto.LABEL_REPEATED if repeated else FieldDescriptorProto.LABEL_OPTIONAL
+    return field
+
+
+def enum_descriptor(
+    enums, enum: ManifestTypeDefinition, name: str
+) -> descriptor_pb2.EnumDescriptorProto:
+    descriptor = enums.add()
+    descriptor.name = name
+    prefix = name.upper()
+    seen = set()
+    used = set()
+    for member in enum.entries:
+        if member.value is None or member.value in seen:
+            continue
+        seen.add(member.value)
+        # Enum values share the package scope, prefix them so members of different enums cannot clash
+        value_name = f"{prefix}_{identifier(member.name, str(member.value)).upper()}"
+        if value_name in used:
+            value_name = f"{value_name}_{member.value}"
+        used.add(value_name)
+
+        value = descriptor.value.add()
+        value.name = value_name
+        value.number = member.value
+
+    return descriptor
+
+
+def file_descriptor(
+    metadata: Metadata,
+    package: str = DEFAULT_PACKAGE,
+    file_name: str = DEFAULT_FILE_NAME,
+    raw_values: bool = True,
+    keep_duplicates: bool = False,
+) -> descriptor_pb2.FileDescriptorProto:
+    """
+    A proto2 file describing every resolved object class as a message and every enum as an enum.  With
+    `raw_values` the fields read back exactly what the library's decoder returns (unsigned varints, bytes for
+    strings), otherwise they carry the signedness, strings, booleans and enums of the manifests.  Flag enums and
+    tags protobuf cannot number are left out, their values end up in the unknown fields.  `keep_duplicates`
+    makes every field repeated, see `field_descriptor`
+    """
+    metadata.resolve()
+    names = DescriptorNames(metadata)
+
+    result = descriptor_pb2.FileDescriptorProto()
+    result.name = file_name
+    result.package = package
+    result.syntax = "proto2"
+
+    for tag, enum in sorted(metadata.all_enums.items()):
+        if can_be_proto_enum(enum):
+            enum_descriptor(result.enum_type, enum, names.enums[tag])
+
+    for tag, klass in sorted(metadata.all_objects.items()):
+        message = result.message_type.add()
+        message.name = names.messages[tag]
+        used = set()
+        for prop in klass.properties:
+            if is_valid_field_number(prop.index):
+                field_descriptor(message.field, prop, names, package, raw_values, used, keep_duplicates)
+
+    return result
+
+
+def descriptor_set(
+    metadata: Metadata, package: str = DEFAULT_PACKAGE, raw_values: bool = True
+) -> descriptor_pb2.FileDescriptorSet:
+    result = descriptor_pb2.FileDescriptorSet()
+    result.file.append(file_descriptor(metadata, package, raw_values=raw_values))
+    return result
+
+
+def get_message_class(descriptor):
+    # `GetMessageClass` arrived in protobuf 4.22, older runtimes build classes through a `MessageFactory`
+    get_class = getattr(message_factory, "GetMessageClass", None)
+    if get_class is not None:
+        return get_class(descriptor)
+    return message_factory.MessageFactory(descriptor.file.pool).GetPrototype(descriptor)
+
+
+def _is_repeated(field) -> bool:
+    # `label` is gone from newer runtimes, older ones lack `is_repeated`
+    if hasattr(field, "is_repeated"):
+        return field.is_repeated
+    return field.label == FieldDescriptorProto.LABEL_REPEATED
+
+
+def message_to_tree(message: Message) -> DiagnosticTree:
+    """
+    A parsed message as a `DiagnosticTree`, known fields in field number order followed by the unknown ones
+    """
+    tree: DiagnosticTree = []
+
+    for field, value in message.ListFields():
+        if field.type == FieldDescriptorProto.TYPE_MESSAGE:
+            if _is_repeated(field):
+                tree.extend((field.number, message_to_tree(item)) for item in value)
+            else:
+                tree.append((field.number, message_to_tree(value)))
+        elif _is_repeated(field):
+            tree.extend((field.number, item) for item in value)
+        else:
+            tree.append((field.number, value))
+
+    for unknown in unknown_fields.UnknownFieldSet(message):
+        data = unknown.data
+        if isinstance(data, unknown_fields.UnknownFieldSet):
+            # Groups are not part of the format, keep the field rather than guess at its contents
+            continue
+        tree.append((unknown.field_number, data))
+
+    return tree
+
+
+class ProtobufDecoder:
+    """
+    Decodes logs with the protobuf runtime's native parser, using message classes built from the schema
+    instead of the pure Python tag loop.  `parse` returns the protobuf message itself, `decode` maps it back to
+    a `DiagnosticObject` with the same values the generic decoder produces, though nested tags come out in
+    field number order rather than the order they were written in.
+
+    Every field of these message classes is repeated, even those the manifests declare once, so that a tag
+    written twice decodes to both values as it does in the generic decoder.  Single fields of a parsed message
+    are therefore read as `message.header[0]`
+    """
+
+    metadata: Metadata
+    pool: descriptor_pool.DescriptorPool
+
+    def __init__(self, metadata: Metadata, package: str = DEFAULT_PACKAGE):
+        self.metadata = metadata
+        self.metadata.resolve()
+        self.pool = descriptor_pool.DescriptorPool()
+        self.pool.Add(file_descriptor(metadata, package, keep_duplicates=True))
+
+        names = DescriptorNames(metadata)
+        self._classes: Dict[int, Any] = {
+            tag: get_message_class(self.pool.FindMessageTypeByName(f"{package}.{name}"))
+            for tag, name in names.messages.items()
+        }
+
+    def message_class(self, klass: Optional[ManifestObjectDefinition] = None):
+        klass = klass if klass is not None else self.metadata.root()
+        return self._classes[klass.composite_tag()]
+
+    def parse(self, data: bytes, klass: Optional[ManifestObjectDefinition] = None) -> Message:
+        message = self.message_class(klass)()
+        try:
+            message.ParseFromString(data)
+        except ProtobufDecodeError as error:
+            raise DecodeError(str(error)) from error
+        return message
+
+    def decode(
+        self, data: Union[bytes, Message], klass: Optional[ManifestObjectDefinition] = None
+    ) -> DiagnosticObject:
+        klass = klass if klass is not None else self.metadata.root()
+        message = data if isinstance(data, Message) else self.parse(data, klass)
+        return object_from_tree(self.metadata, klass, message_to_tree(message))
@@ -0,0 +1,154 @@
+import io
+import os
+import sys
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, Generator, List, Optional, Union
+
+from . import Tag, TagType, TruncatedTagError
+from .instrumentation import DecodeStats
+from .metadata import Metadata
+from .object import DiagnosticValue
+from .stream import ChunkedTagReader
+
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+class LogFollower:
+    """
+    Decodes a metric log as it grows.  Each `poll` reads only the bytes appended since the last poll and decodes
+    the top level tags that are now complete, the start of a tag still being written stays buffered until the
+    rest of it arrives.  If the file shrinks (truncated or replaced) following starts over from the beginning
+    """
+
+    path: Path
+    metadata: Metadata
+    offset: int  # End of the last complete top level tag
+    stats: Optional[DecodeStats]
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        metadata: Metadata,
+        offset: int = 0,
+        stats: Optional[DecodeStats] = None,
+    ):
+        self.path = Path(path)
+        self.metadata = metadata
+        self.metadata.resolve()
+        self.offset = offset
+        self.stats = stats
+        self._stream: Optional[BinaryIO] = None
+        self._inode: Optional[int] = None
+        # The bytes from `offset` on that have been read but do not make up a complete tag yet
+        self._partial = bytearray()
+        # How many bytes `_partial` must hold before its first tag is complete, once its header was read
+        self._needed = 0
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        self._partial.clear()
+        self._needed = 0
+
+    def __enter__(self) -> "LogFollower":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open(self) -> Optional[BinaryIO]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self.close()
+            return None
+
+        read_to = self.offset + len(self._partial)
+        if self._stream is not None and (stat.st_ino != self._inode or stat.st_size < read_to):
+            # Rotated or truncated, the old offset means nothing in the new file
+            self.close()
+            self.offset = 0
+
+        if self._stream is None:
+            self._stream = open(self.path, "rb")
+            self._inode = stat.st_ino
+            if stat.st_size < self.offset:
+                self.offset = 0
+
+        return self._stream
+
+    def _complete_tags(self) -> Generator[Tag, None, None]:
+        """
+        The complete tags at the start of the buffered bytes, stopping at the first one that is cut off.  Each is
+        dropped from the buffer and counted into `offset` once the caller has taken it.  The end of a cut off
+        tag is kept in `_needed`, so that a large tag trickling in is not decoded again on every poll
+        """
+        reader = ChunkedTagReader(io.BytesIO(self._partial), max_payload=sys.maxsize)
+        consumed = 0
+        self._needed = 0
+        try:
+            while (header := reader.read_header()) is not None:
+                if header.end > len(self._partial):
+                    self._needed = header.end - consumed
+                    break
+                if header.tag_type & TagType.LENGTH_PREFIX:
+                    value = reader.read_payload(header)
+                else:
+                    value = header.value
+                yield Tag(
+                    index=header.index,
+                    tag_type=header.tag_type,
+                    length=header.header_length + header.length,
+                    value=value,
+                )
+                consumed = reader.offset
+        except TruncatedTagError:
+            pass
+        finally:
+            del self._partial[:consumed]
+            self.offset += consumed
+
+    def poll(self) -> List[DiagnosticValue]:
+        """
+        Decodes the top level tags completed since the last poll
+        """
+        stream = self._open()
+        if stream is None:
+            return []
+
+        stream.seek(self.offset + len(self._partial))
+        appended = stream.read()
+        if not appended:
+            return []
+        self._partial += appended
+        if len(self._partial) < self._needed:
+            return []
+
+        root = self.metadata.root()
+        stats = self.stats
+        values = []
+
+        for tag in self._complete_tags():
+            if stats is not None:
+                stats.record_tag(int(tag.tag_type))
+                stats.record_bytes(tag.length)
+            values.append(DiagnosticValue(self.metadata, root.property_for_tag(tag.index), tag, stats))
+
+        return values
+
+    def follow(
+        self,
+        interval: float = DEFAULT_POLL_INTERVAL,
+        stop: Optional[Callable[[], bool]] = None,
+    ) -> Generator[DiagnosticValue, None, None]:
+        """
+        Yields top level values as they are appended, polling every `interval` seconds until `stop` returns
+        True (forever by default)
+        """
+        while stop is None or not stop():
+            values = self.poll()
+            yield from values
+            if not values:
+                time.sleep(interval)
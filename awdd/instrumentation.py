@@ -0,0 +1,130 @@
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Generator, List, Optional
+
+
+class DecodeStats:
+    """
+    Opt-in counters for the decoder.  Pass an instance to `LogParser` (or directly to `decode_tag` /
+    `decode_tags`) to have it filled in, when no instance is passed the decoder skips all accounting.
+    """
+
+    bytes_read: int
+    tags_by_wire_type: Dict[int, int]
+    objects_by_class: Dict[str, int]
+    tags_by_class: Dict[str, int]  # Tags decoded inside objects of each class, nested objects' own not included
+    max_depth: int
+    timings: Dict[str, float]
+    entries_seen: int  # Metric log entries looked at by a `Sampler`
+    entries_sampled: int  # Of which decoded
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.bytes_read = 0
+        self.tags_by_wire_type = {}
+        self.objects_by_class = {}
+        self.tags_by_class = {}
+        self.max_depth = 0
+        self.timings = {}
+        self.entries_seen = 0
+        self.entries_sampled = 0
+
+    def record_tag(self, wire_type: int):
+        self.tags_by_wire_type[wire_type] = self.tags_by_wire_type.get(wire_type, 0) + 1
+
+    def record_object(self, class_name: Optional[str], depth: int, tag_count: int = 0):
+        name = class_name if class_name is not None else "__anonymous__"
+        self.objects_by_class[name] = self.objects_by_class.get(name, 0) + 1
+        self.tags_by_class[name] = self.tags_by_class.get(name, 0) + tag_count
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def record_sample(self, seen: int, sampled: int):
+        self.entries_seen += seen
+        self.entries_sampled += sampled
+
+    def record_bytes(self, count: int):
+        self.bytes_read += count
+
+    def record_time(self, phase: str, seconds: float):
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def timed(self, phase: str) -> Generator[None, None, None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_time(phase, time.perf_counter() - start)
+
+    @property
+    def tags_decoded(self) -> int:
+        return sum(self.tags_by_wire_type.values())
+
+    def merge(self, other: "DecodeStats"):
+        self.bytes_read += other.bytes_read
+        for wire_type, count in other.tags_by_wire_type.items():
+            self.tags_by_wire_type[wire_type] = (
+                self.tags_by_wire_type.get(wire_type, 0) + count
+            )
+        for name, count in other.objects_by_class.items():
+            self.objects_by_class[name] = self.objects_by_class.get(name, 0) + count
+        for name, count in other.tags_by_class.items():
+            self.tags_by_class[name] = self.tags_by_class.get(name, 0) + count
+        self.max_depth = max(self.max_depth, other.max_depth)
+        for phase, seconds in other.timings.items():
+            self.record_time(phase, seconds)
+        self.record_sample(other.entries_seen, other.entries_sampled)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns a plain dictionary copy of the counters, safe to hand to a metrics exporter while decoding
+        continues to update this instance
+        """
+        return {
+            "bytes_read": self.bytes_read,
+            "tags_decoded": self.tags_decoded,
+            "tags_by_wire_type": dict(self.tags_by_wire_type),
+            "objects_by_class": dict(self.objects_by_class),
+            "tags_by_class": dict(self.tags_by_class),
+            "max_depth": self.max_depth,
+            "timings": dict(self.timings),
+            "entries_seen": self.entries_seen,
+            "entries_sampled": self.entries_sampled,
+        }
+
+
+@dataclass
+class ManifestReport:
+    path: str
+    header_scan: float = 0.0
+    parse: float = 0.0
+    objects: int = 0
+    enums: int = 0
+
+
+@dataclass
+class ResolveReport:
+    """
+    Returned by `Metadata.resolve(report=True)`.  Phase times are wall seconds, `peak_memory` is the
+    tracemalloc peak in bytes over the resolve call above what was traced on entry (the header scan runs in
+    `Metadata.__init__` and is timed but not traced).  When the caller is already tracing, its peak is left
+    alone and an earlier, higher peak of its own shows in this figure
+    """
+
+    manifests: List[ManifestReport] = field(default_factory=list)
+    phases: Dict[str, float] = field(default_factory=dict)
+    object_count: int = 0
+    enum_count: int = 0
+    property_count: int = 0
+    peak_memory: int = 0
+
+    @property
+    def total_time(self) -> float:
+        return sum(self.phases.values())
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
@@ -1,8 +1,67 @@
-from . import WriterBase
-from .object import *
+import base64
+import json
 from io import IOBase
+from typing import Any, Dict, Optional
+
+from .definition import PropertyFlags
+from .object import DiagnosticObject, DiagnosticValue, WriterBase
+
+
+def value_to_json(value: DiagnosticValue) -> Any:
+    if isinstance(value.value, DiagnosticObject):
+        return object_to_json(value.value)
+
+    typed = value.typed
+    if isinstance(typed, (bytes, bytearray, memoryview)):
+        return base64.b64encode(typed).decode("ascii")
+
+    return typed
+
+
+def object_to_json(value: DiagnosticObject) -> Dict[str, Any]:
+    """
+    A decoded object as JSON compatible values keyed by property name.  Repeated properties are lists, scalars
+    converted as `DiagnosticValue.typed` converts them and other bytes base64.  Timestamps stay epoch milliseconds, tags the schema does
+    not know are keyed by their hex index
+    """
+    result: Dict[str, Any] = {}
+
+    for item in value.properties:
+        prop = item.property
+        key = prop.name if prop is not None else f"{item.index:#x}"
+        converted = value_to_json(item)
+
+        if prop is not None and prop.flags & PropertyFlags.REPEATED:
+            result.setdefault(key, []).append(converted)
+        elif key in result and prop is None:
+            # Unknown tags may repeat too, collect rather than overwrite
+            existing = result[key]
+            if isinstance(existing, list):
+                existing.append(converted)
+            else:
+                result[key] = [existing, converted]
+        else:
+            result[key] = converted
+
+    return result
 
 
 class JsonWriter(WriterBase):
+    """
+    Writes decoded objects as UTF-8 JSON, on a single line unless `indent` is given
+    """
+
+    indent: Optional[int]
+
+    def __init__(self, indent: Optional[int] = None):
+        self.indent = indent
+
+    def dumps(self, value: DiagnosticObject, **extra: Any) -> str:
+        document = object_to_json(value)
+        if extra:
+            document = {**extra, "log": document}
+        separators = (",", ":") if self.indent is None else None
+        return json.dumps(document, indent=self.indent, separators=separators)
+
     def write_to(self, value: DiagnosticObject, stream: IOBase) -> None:
-        pass
+        stream.write(self.dumps(value).encode("utf-8"))
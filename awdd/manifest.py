@@ -1,10 +1,12 @@
 import os
-from abc import *
+import struct
+from abc import ABC
+from datetime import datetime
+from enum import IntEnum
 from pathlib import Path
+from typing import BinaryIO, Dict, Generator, List, NamedTuple, Optional
 
-from .definition import *
-
-from . import *
+from . import ManifestError, apple_time_to_datetime, decode_tags
 from .definition import *
 
 ROOT_MANIFEST_PATH = "/System/Library/PrivateFrameworks/WirelessDiagnostics.framework/Support/AWDMetadata.bin"
@@ -163,6 +165,9 @@ class Manifest:
         self.display_tables = {}
         self.types_region = None
         self.extension_region = None
+        self.identity = None
+        self.types = []
+        self.extensions = None
         self.path = Path(path)
         if self.path.exists() is False:
             raise ManifestError("Path does not exist")
@@ -236,7 +241,7 @@ class Manifest:
             Manifest.HEADER_SECTION_AND_COUNT, tag_bytes
         )
 
-        if header_tag is 0 and field_count is 0:
+        if header_tag == 0 and field_count == 0:
             return False
 
         parsed_tag = ManifestRegionType(header_tag)
@@ -297,6 +302,9 @@ class Manifest:
                 elif element.index == ExtensionPointTag.TAG:
                     self.extensions[element.value] = name
 
+    def close(self):
+        self.file.close()
+
     @property
     def tags(self):
         return set(self.structure_tables.keys()).union(self.display_tables.keys())
@@ -1,32 +1,255 @@
+import os
+import threading
+from types import MappingProxyType
+
 from .manifest import *
 from typing import *
 from glob import glob
+from time import perf_counter
+from pathlib import Path
+from dataclasses import dataclass, field
 
 from awdd import *
+from .instrumentation import ManifestReport, ResolveReport
+
+
+class FileSignature(NamedTuple):
+    """
+    What a file looked like when it was read, compared to notice that it changed since
+    """
+
+    mtime_ns: int
+    size: int
+
+
+@dataclass
+class RefreshResult:
+    added: List[Path] = field(default_factory=list)
+    changed: List[Path] = field(default_factory=list)
+    removed: List[Path] = field(default_factory=list)
+    full_reload: bool = False
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed or self.full_reload)
+
+
+def file_signature(path: Union[str, os.PathLike]) -> FileSignature:
+    stat = os.stat(path)
+    return FileSignature(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+
+
+def identity_hash(manifest: Manifest) -> Optional[bytes]:
+    if manifest.identity is None:
+        return None
+    if not hasattr(manifest.identity, "hash"):
+        manifest.identity.parse()
+    return getattr(manifest.identity, "hash", None)
 
 
 class Metadata:
+    """
+    The schema from a root manifest and its extension manifests.
+
+    Thread safety: `resolve` and `refresh` serialize on a per-instance lock, so any number of threads may call
+    them (or construct a `LogParser`) at once and the manifests are resolved a single time.  Once resolved the
+    schema is frozen, the definitions reject attribute writes and `all_objects` / `all_enums` are read-only
+    mappings, so decoding from many threads needs no locking.  `refresh` never mutates what a running decode
+    can see, it builds new property lists and tables and swaps each in with a single assignment
+    """
+
     root_manifest: Manifest
     extension_manifests: List[Manifest]
-    all_enums: Dict[int, ManifestTypeDefinition]
-    all_objects: Dict[int, ManifestObjectDefinition]
+    all_enums: Mapping[int, ManifestTypeDefinition]
+    all_objects: Mapping[int, ManifestObjectDefinition]
+    resolved: bool
 
-    def __init__(self):
-        self.root_manifest = Manifest(ROOT_MANIFEST_PATH)
+    def __init__(
+        self,
+        root_path: str = ROOT_MANIFEST_PATH,
+        extension_pattern: str = EXTENSION_MANIFEST_PATH,
+    ):
+        self.root_path = root_path
+        self.extension_pattern = extension_pattern
+        self.header_scan_times = {}
+        self.signatures = {}
+
+        self.root_manifest = self._open_manifest(root_path)
 
         self.extension_manifests = [
-            Manifest(path) for path in glob(EXTENSION_MANIFEST_PATH)
+            self._open_manifest(path) for path in sorted(glob(extension_pattern))
         ]
 
         self.all_enums = {}
         self.all_objects = {}
+        self.resolved = False
+        self._identity = None
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_definitions(
+        cls,
+        all_objects: Dict[int, ManifestObjectDefinition],
+        all_enums: Dict[int, ManifestTypeDefinition],
+        root_tag: int = ROOT_OBJECT_TAG,
+    ) -> "Metadata":
+        """
+        A resolved metadata that is not backed by manifest files, used when restoring a `MetadataSnapshot`.
+        The definitions must already be bound and extended, they are frozen here
+        """
+        metadata = cls.__new__(cls)
+        metadata.root_path = None
+        metadata.extension_pattern = None
+        metadata.header_scan_times = {}
+        metadata.signatures = {}
+        metadata.root_manifest = None
+        metadata.extension_manifests = []
+        metadata.all_objects = all_objects
+        metadata.all_enums = all_enums
+        metadata.root_tag = root_tag
+        metadata._identity = None
+        metadata._lock = threading.RLock()
+        metadata._freeze()
+        metadata.resolved = True
+        return metadata
+
+    def snapshot(self) -> "MetadataSnapshot":
+        from .snapshot import MetadataSnapshot
+
+        self.resolve()
+        return MetadataSnapshot.from_metadata(self)
+
+    def identity(self) -> bytes:
+        """
+        SHA-256 over the resolved schema, equal for equal schemas whether loaded from manifests or restored
+        from a snapshot.  Computed once per resolve / refresh
+        """
+        if self._identity is None:
+            import hashlib
+
+            self._identity = hashlib.sha256(self.snapshot().to_bytes()).digest()
+
+        return self._identity
+
+    def decoders(self) -> "CompiledDecoders":
+        """
+        Decoders generated for this schema, faster than the generic `DiagnosticObject` path for bulk decoding.
+        Shared between every `Metadata` with the same `identity()`
+        """
+        from .codegen import compile_decoders
+
+        return compile_decoders(self)
+
+    def descriptor_set(self, raw_values: bool = True) -> "FileDescriptorSet":
+        """
+        The schema as protobuf descriptors, one message per object class and one enum per enum type
+        """
+        from .descriptors import descriptor_set
+
+        return descriptor_set(self, raw_values=raw_values)
+
+    def __reduce__(self):
+        # Manifests hold open files and the bound definitions are cyclic, pickle the flat snapshot instead
+        from .snapshot import restore_metadata
+
+        return restore_metadata, (self.snapshot().to_bytes(),)
+
+    def _open_manifest(self, path: str) -> Manifest:
+        start = perf_counter()
+        manifest = Manifest(path)
+        self.header_scan_times[manifest.path] = perf_counter() - start
+        self.signatures[manifest.path] = file_signature(manifest.path)
+        return manifest
+
+    def resolve(self, report: bool = False) -> Optional[ResolveReport]:
+        """
+        Parses every manifest and binds the definitions into a single schema.  With `report=True` each phase is
+        timed and memory is traced, and a `ResolveReport` is returned (`None` otherwise, or when the metadata
+        was already resolved)
+        """
+        if self.resolved:
+            return None
+
+        with self._lock:
+            if self.resolved:
+                return None
+            return self._resolve(report)
+
+    def _resolve(self, report: bool) -> Optional[ResolveReport]:
+        if not report:
+            self._parse()
+            self._merge()
+            self._bind()
+            self._extend()
+            self._freeze()
+            self.resolved = True
+            return None
+
+        manifests = [self.root_manifest] + self.extension_manifests
+        result = ResolveReport(
+            manifests=[
+                ManifestReport(
+                    path=str(manifest.path),
+                    header_scan=self.header_scan_times.get(manifest.path, 0.0),
+                )
+                for manifest in manifests
+            ]
+        )
+        result.phases["header_scan"] = sum(m.header_scan for m in result.manifests)
+
+        import tracemalloc
+
+        # A caller already tracing keeps its own peak, ours is measured from what was allocated on entry
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+
+        try:
+            start = perf_counter()
+            for manifest, manifest_report in zip(manifests, result.manifests):
+                manifest_start = perf_counter()
+                manifest.parse()
+                manifest_report.parse = perf_counter() - manifest_start
+
+                for entry in manifest.definitions():
+                    if entry.type == ManifestDefinitionTag.DEFINE_TYPE:
+                        manifest_report.enums += 1
+                    else:
+                        manifest_report.objects += 1
+            result.phases["parse"] = perf_counter() - start
+
+            for phase, step in [
+                ("merge", self._merge),
+                ("bind", self._bind),
+                ("extend", self._extend),
+            ]:
+                start = perf_counter()
+                step()
+                result.phases[phase] = perf_counter() - start
+
+            current, peak = tracemalloc.get_traced_memory()
+            result.peak_memory = max(peak, current) - baseline
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+        result.object_count = len(self.all_objects)
+        result.enum_count = len(self.all_enums)
+        result.property_count = sum(
+            len(definition.properties) for definition in self.all_objects.values()
+        )
 
-    def resolve(self):
+        self._freeze()
+        self.resolved = True
+        return result
+
+    def _parse(self):
         self.root_manifest.parse()
 
         for manifest in self.extension_manifests:
             manifest.parse()
 
+    def _merge(self):
         for entry in self.root_manifest.definitions():
             if entry.type == ManifestDefinitionTag.DEFINE_TYPE:
                 self.all_enums[entry.tag] = entry.definition
@@ -44,6 +267,7 @@ class Metadata:
                 else:
                     raise ManifestError(f"Unknown defintion type")
 
+    def _bind(self):
         for tag in self.all_enums:
             self.all_enums[tag].bind(
                 self.root_manifest.types, self.all_enums, self.all_objects
@@ -54,8 +278,179 @@ class Metadata:
                 self.root_manifest.types, self.all_enums, self.all_objects
             )
 
+    def _extend(self):
         for tag in list(self.all_objects):
             self.all_objects[tag].extend()
 
+    def _freeze(self):
+        for definition in self.all_enums.values():
+            definition.freeze()
+
+        for definition in self.all_objects.values():
+            definition.freeze()
+
+        self.all_enums = MappingProxyType(self.all_enums)
+        self.all_objects = MappingProxyType(self.all_objects)
+
+    def refresh(self) -> RefreshResult:
+        """
+        Picks up extension manifests that were added, removed or rewritten since the metadata was resolved.
+        Files whose size and mtime are unchanged are not opened, files that were touched but carry the same
+        identity hash are not re-parsed.  Only definitions from the affected manifests are parsed and bound, the
+        updated property lists and definition tables are all built before any is swapped in, so parses starting
+        afterwards see the new schema and a refresh that fails keeps the old one.  A change to the root manifest
+        reloads everything
+        """
+        if self.root_manifest is None:
+            raise ManifestError("Metadata is not backed by manifest files")
+
+        with self._lock:
+            signatures = dict(self.signatures)
+            try:
+                return self._refresh()
+            except BaseException:
+                # Nothing was published, the changed manifests must still look changed to the next refresh
+                self.signatures = signatures
+                raise
+
+    def _refresh(self) -> RefreshResult:
+        if not self.resolved:
+            self.resolve()
+            return RefreshResult()
+
+        if self._reopen_if_changed(self.root_manifest) is not None:
+            return self._reload()
+
+        result = RefreshResult()
+        current = {Path(path) for path in glob(self.extension_pattern)}
+        retained: List[Manifest] = []
+        stale: List[Manifest] = []
+        fresh: List[Manifest] = []
+
+        for manifest in self.extension_manifests:
+            if manifest.path not in current:
+                result.removed.append(manifest.path)
+                stale.append(manifest)
+                continue
+
+            replacement = self._reopen_if_changed(manifest)
+            if replacement is None:
+                retained.append(manifest)
+                continue
+
+            result.changed.append(manifest.path)
+            stale.append(manifest)
+            fresh.append(replacement)
+
+        known = {manifest.path for manifest in self.extension_manifests}
+        for path in sorted(current - known):
+            result.added.append(path)
+            fresh.append(self._open_manifest(str(path)))
+
+        if not result:
+            return result
+
+        for manifest in fresh:
+            manifest.parse()
+
+        stale_categories = {tag for manifest in stale for tag in manifest.tags}
+        all_enums = {
+            tag: definition
+            for tag, definition in self.all_enums.items()
+            if tag >> 16 not in stale_categories
+        }
+        all_objects = {
+            tag: definition
+            for tag, definition in self.all_objects.items()
+            if tag >> 16 not in stale_categories
+        }
+
+        fresh_definitions = []
+        for manifest in fresh:
+            for entry in manifest.definitions():
+                if entry.type == ManifestDefinitionTag.DEFINE_TYPE:
+                    all_enums[entry.tag] = entry.definition
+                else:
+                    all_objects[entry.tag] = entry.definition
+                fresh_definitions.append(entry.definition)
+
+        for definition in fresh_definitions:
+            definition.bind(self.root_manifest.types, all_enums, all_objects)
+
+        # Re-apply every extension onto copies of the declared properties.  Nothing that is already published is
+        # touched until everything is built, so a failure part way leaves the current schema as it was
+        properties = {
+            tag: list(definition.own_properties)
+            for tag, definition in all_objects.items()
+        }
+        rebound = []
+        for definition in all_objects.values():
+            for prop in definition.own_properties:
+                if prop.extends and isinstance(prop.extends, ManifestObjectDefinition):
+                    target = all_objects.get(prop.extends.composite_tag())
+                    if target is None:
+                        continue
+
+                    if target is not prop.extends:
+                        rebound.append((prop, target))
+                    prop.extend_into(properties[target.composite_tag()])
+
+        replaced = [
+            (definition, tuple(properties[tag]))
+            for tag, definition in all_objects.items()
+            if tuple(properties[tag]) != tuple(definition.properties)
+        ]
+
+        for definition in fresh_definitions:
+            definition.freeze()
+
+        # Publish: the kept definitions take their new extensions and the tables are swapped right after, only
+        # single assignments that can not fail
+        for prop, target in rebound:
+            prop.rebind_extension(target)
+        for definition, definition_properties in replaced:
+            definition.replace_properties(definition_properties)
+        self.all_enums, self.all_objects, self.extension_manifests = (
+            MappingProxyType(all_enums),
+            MappingProxyType(all_objects),
+            retained + fresh,
+        )
+        self._identity = None
+
+        for manifest in stale:
+            manifest.close()
+        for path in result.removed:
+            self.signatures.pop(path, None)
+
+        return result
+
+    def _reopen_if_changed(self, manifest: Manifest) -> Optional[Manifest]:
+        if file_signature(manifest.path) == self.signatures[manifest.path]:
+            return None
+
+        replacement = self._open_manifest(str(manifest.path))
+        previous_hash = identity_hash(manifest)
+        if previous_hash is not None and identity_hash(replacement) == previous_hash:
+            replacement.close()
+            return None
+
+        return replacement
+
+    def _reload(self) -> RefreshResult:
+        replacement = Metadata(self.root_path, self.extension_pattern)
+        replacement.resolve()
+
+        previous = [self.root_manifest] + self.extension_manifests
+        state = dict(replacement.__dict__)
+        del state["_lock"]  # Held by the caller, keep it
+        self.__dict__.update(state)
+        for manifest in previous:
+            manifest.close()
+
+        return RefreshResult(full_reload=True)
+
     def root(self) -> ManifestObjectDefinition:
+        if self.root_manifest is None:
+            return self.all_objects[self.root_tag]
+
         return self.root_manifest.display_tables[0].objects[0]
@@ -8,21 +8,116 @@ from typing import *
 from io import *
 
 from .metadata import Metadata
+from .instrumentation import DecodeStats
 
 ROOT_OBJECT = None
 
 
 @dataclass
 class DiagnosticValue:
-    property: "ManifestDefinition"
+    property: Optional["ManifestProperty"]
     value: Union[Any, "DiagnosticObject"]
+    index: int
 
-    def __init__(self, metadata: Metadata, prop: ManifestProperty, tag: Tag):
+    def __init__(
+        self,
+        metadata: Metadata,
+        prop: Optional[ManifestProperty],
+        tag: Tag,
+        stats: Optional["DecodeStats"] = None,
+        depth: int = 0,
+    ):
         self.property = prop
-        if prop.type == PropertyType.OBJECT:
-            self.value = DiagnosticObject(metadata, prop.object_type, ta)
+        self.index = tag.index
+        if (
+            prop is not None
+            and prop.type == PropertyType.OBJECT
+            and isinstance(prop.object_type, ManifestObjectDefinition)
+        ):
+            self.value = DiagnosticObject(
+                metadata,
+                prop.object_type,
+                decode_tags(tag.value, stats=stats),
+                stats,
+                depth + 1,
+            )
         else:
-            self.value = value
+            self.value = tag.value
+
+    @classmethod
+    def unparsed(
+        cls, index: int, prop: Optional[ManifestProperty], value: Any
+    ) -> "DiagnosticValue":
+        """
+        A value that is handed through as is, e.g. an oversized payload streamed by a `ChunkedTagReader`
+        """
+        result = cls.__new__(cls)
+        result.property = prop
+        result.value = value
+        result.index = index
+        return result
+
+    @property
+    def is_timestamp(self) -> bool:
+        return (
+            self.property is not None
+            and self.property.integer_format in TIMESTAMP_FORMATS
+            and isinstance(self.value, int)
+        )
+
+    @property
+    def datetime(self) -> Optional[datetime]:
+        """
+        Timestamps are kept as the raw epoch milliseconds, this converts on access (`None` for other values)
+        """
+        if self.is_timestamp:
+            return apple_time_to_datetime(self.value)
+
+        return None
+
+    @property
+    def label(self) -> Optional[str]:
+        """
+        The enum member label(s) for ENUM properties with a resolved type, `None` for anything else
+        """
+        if (
+            self.property is not None
+            and self.property.type == PropertyType.ENUM
+            and isinstance(self.property.enum_type, ManifestTypeDefinition)
+            and isinstance(self.value, int)
+        ):
+            return self.property.enum_type.label_for_value(self.value)
+
+        return None
+
+    @property
+    def typed(self) -> Any:
+        """
+        The value as its property's type describes it: enums as their labels, strings as text, booleans as bool
+        and signed integers sign extended.  Anything else, including values of unknown tags, is returned as is
+        """
+        value = self.value
+        prop = self.property
+        if prop is None:
+            return value
+
+        if isinstance(value, int):
+            label = self.label
+            if label is not None:
+                return label
+            if prop.type == PropertyType.BOOLEAN:
+                return bool(value)
+            bits = SIGNED_TYPES.get(prop.type)
+            if bits is not None:
+                value &= (1 << bits) - 1
+                if value >> (bits - 1):
+                    value -= 1 << bits
+            return value
+
+        if prop.type == PropertyType.STRING and isinstance(value, (bytes, memoryview)):
+            return str(value, "utf-8", "replace")
+
+        return value
 
 
 @dataclass
@@ -32,14 +127,57 @@ class DiagnosticObject:
     properties: List[DiagnosticValue]
 
     def __init__(
-        self, metadata: Metadata, klass: "ManifestObjectDefinition", values: List[Tag]
+        self,
+        metadata: Metadata,
+        klass: "ManifestObjectDefinition",
+        values: List[Tag],
+        stats: Optional["DecodeStats"] = None,
+        depth: int = 0,
     ):
         self.metadata = metadata
         self.object_class = klass
         self.properties = []
+
+        if stats is not None:
+            stats.record_object(klass.name, depth, len(values))
+
         for tag in values:
             prop = self.object_class.property_for_tag(tag.index)
-            self.properties.append(DiagnosticValue(metadata, prop, tag.value))
+            self.properties.append(DiagnosticValue(metadata, prop, tag, stats, depth))
+
+
+# A decoded object as plain nested lists of (tag index, value) pairs, nested objects are lists themselves.
+# Cheap to marshal and to turn back into a DiagnosticObject without decoding again
+DiagnosticTree = List[Tuple[int, Any]]
+
+
+def object_to_tree(value: DiagnosticObject) -> DiagnosticTree:
+    return [
+        (
+            prop.index,
+            object_to_tree(prop.value)
+            if isinstance(prop.value, DiagnosticObject)
+            else prop.value,
+        )
+        for prop in value.properties
+    ]
+
+
+def object_from_tree(
+    metadata: Metadata, klass: ManifestObjectDefinition, tree: DiagnosticTree
+) -> DiagnosticObject:
+    result = DiagnosticObject.__new__(DiagnosticObject)
+    result.metadata = metadata
+    result.object_class = klass
+    result.properties = []
+
+    for index, value in tree:
+        prop = klass.property_for_tag(index)
+        if isinstance(value, list):
+            value = object_from_tree(metadata, prop.object_type, value)
+        result.properties.append(DiagnosticValue.unparsed(index, prop, value))
+
+    return result
 
 
 class WriterBase(ABC):
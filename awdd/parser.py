@@ -1,23 +1,236 @@
 import io
+import os
+import threading
 from typing import *
 from awdd.manifest import *
 from awdd.metadata import Metadata
 from awdd.object import *
+from awdd.instrumentation import DecodeStats
+from awdd.stream import (
+    DEFAULT_MAX_PAYLOAD,
+    DEFAULT_WINDOW_SIZE,
+    ChunkedTagReader,
+    PayloadStream,
+)
 from awdd import decode_variable_length_int
 
+if TYPE_CHECKING:
+    # Both pull in heavier dependencies (hashlib / zlib, protobuf) that only some runs use
+    from awdd.cache import DecodeCache
+    from awdd.descriptors import ProtobufDecoder
+    from awdd.registry import MetadataRegistry
+    from awdd.sampling import Sampler
+
 
 class LogParser:
+    """
+    Decodes metric logs against a resolved `Metadata`.  A parser can be shared between threads as long as it
+    has no `stats` (counters are not synchronized), `parse_many` gives each of its threads its own
+    """
+
     metadata: Metadata
+    stats: Optional[DecodeStats]
+    cache: Optional["DecodeCache"]
+    protobuf: Optional["ProtobufDecoder"]
+    registry: Optional["MetadataRegistry"]
+    sampler: Optional["Sampler"]
+
+    def __init__(
+        self,
+        metadata: Optional[Metadata] = None,
+        stats: Optional[DecodeStats] = None,
+        cache: Optional["DecodeCache"] = None,
+        use_protobuf: bool = False,
+        registry: Optional["MetadataRegistry"] = None,
+        sampler: Optional["Sampler"] = None,
+    ):
+        """
+        With `use_protobuf` logs are parsed by the protobuf runtime's native parser rather than tag by tag in
+        Python, nested values then come out in tag order rather than the order they were written in.
+
+        With a `registry` each log passed to `parse` is decoded with the schema of the build named in its
+        header, `metadata` (the registry's default schema if not given) is used for everything else
+
+        With a `sampler` only a sample of each log's metric log entries is decoded, the cache and the protobuf
+        runtime are not used for those logs
+        """
+        self.stats = stats
+        self.cache = cache
+        self.registry = registry
+        self.sampler = sampler if sampler is not None and sampler.samples_entries else None
+        # Child parsers by `id` of their schema, which they keep alive so the id cannot be reused
+        self._schema_parsers: Dict[int, LogParser] = {}
+        self._lock = threading.Lock()
+
+        if metadata is None:
+            metadata = registry.metadata() if registry is not None else Metadata()
+        self.metadata = metadata
+
+        if self.stats is not None:
+            with self.stats.timed("resolve"):
+                self.metadata.resolve()
+        else:
+            self.metadata.resolve()
+
+        self.protobuf = None
+        if use_protobuf:
+            from awdd.descriptors import ProtobufDecoder
+
+            self.protobuf = ProtobufDecoder(self.metadata)
+
+    def parse(self, data: Union[io.RawIOBase, bytes]) -> DiagnosticObject:
+        return self._parse_with_stats(data, self.stats)
+
+    def parse_many(
+        self,
+        inputs: Iterable[Union[bytes, str, os.PathLike, io.RawIOBase]],
+        max_workers: Optional[int] = None,
+    ) -> List[DiagnosticObject]:
+        """
+        Parses logs (their bytes, open streams or paths) on a thread pool, returning the results in input order.
+        Each log is counted into its own `DecodeStats`, merged into this parser's once all are done.  The first
+        exception raised by a parse is raised here.
+
+        Worthwhile where decoding can run in parallel, on free-threaded CPython or with the protobuf runtime
+        which releases the GIL, and where reading the files dominates.  Unlike a process pool nothing is pickled
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        inputs = list(inputs)
+        task_stats = [DecodeStats() for _ in inputs] if self.stats is not None else [None] * len(inputs)
+
+        with ThreadPoolExecutor(max_workers) as pool:
+            results = list(pool.map(self._parse_input, inputs, task_stats))
+
+        if self.stats is not None:
+            for stats in task_stats:
+                self.stats.merge(stats)
+
+        return results
+
+    def _parse_input(
+        self, data: Union[bytes, str, os.PathLike, io.RawIOBase], stats: Optional[DecodeStats]
+    ) -> DiagnosticObject:
+        if isinstance(data, (str, os.PathLike)):
+            with open(data, "rb") as stream:
+                data = stream.read()
+        return self._parse_with_stats(data, stats)
+
+    def _parse_with_stats(self, data: Union[io.RawIOBase, bytes], stats: Optional[DecodeStats]) -> DiagnosticObject:
+        if self.registry is not None:
+            raw = data if isinstance(data, bytes) else data.read()
+            return self.parser_for(raw)._parse_with_stats(raw, stats)
+
+        if self.sampler is not None:
+            return self._parse_sampled(data, stats)
 
-    def __init__(self, metadata: Optional[Metadata] = None):
-        self.metadata = metadata if metadata is not None else Metadata()
-        self.metadata.resolve()
+        if self.cache is not None:
+            return self._parse_cached(data, stats)
 
-    def parse(self, data: io.RawIOBase) -> DiagnosticObject:
+        if isinstance(data, bytes):
+            data = io.BytesIO(data)
+
+        if stats is not None:
+            with stats.timed("decode"):
+                return self._parse(data, stats)
+
+        return self._parse(data, None)
+
+    def parser_for(self, data: bytes) -> "LogParser":
+        """
+        The parser for the schema of the build that wrote `data`, sharing this parser's stats and cache.  Parsers
+        are only kept for the schemas the registry still holds, so its size bound also bounds this parser
+        """
+        metadata = self.registry.metadata_for_log(data)
+        with self._lock:
+            parser = self._schema_parsers.get(id(metadata))
+            if parser is None:
+                resident = {id(schema) for schema in self.registry.resident()}
+                self._schema_parsers = {
+                    key: child for key, child in self._schema_parsers.items() if key in resident
+                }
+                parser = LogParser(
+                    metadata, self.stats, self.cache, self.protobuf is not None, sampler=self.sampler
+                )
+                self._schema_parsers[id(metadata)] = parser
+        return parser
+
+    def _parse(self, data: io.RawIOBase, stats: Optional[DecodeStats]) -> DiagnosticObject:
         root_object: ManifestObjectDefinition = self.metadata.root()
-        tags = decode_tags(data)
+
+        if self.protobuf is not None:
+            raw = data.read()
+            if stats is not None:
+                stats.record_bytes(len(raw))
+            return self.protobuf.decode(raw, root_object)
+        tags = decode_tags(data, stats=stats)
+
+        if stats is not None:
+            stats.record_bytes(sum(tag.length for tag in tags))
+
         result_object: DiagnosticObject = DiagnosticObject(
-            self.metadata, root_object, tags
+            self.metadata, root_object, tags, stats
         )
 
         return result_object
+
+    def _parse_sampled(self, data: Union[io.RawIOBase, bytes], stats: Optional[DecodeStats]) -> DiagnosticObject:
+        if isinstance(data, bytes):
+            data = io.BytesIO(data)
+
+        if stats is None:
+            tags = self.sampler.sample(data, self.metadata)
+            return DiagnosticObject(self.metadata, self.metadata.root(), tags)
+
+        with stats.timed("decode"):
+            tags = self.sampler.sample(data, self.metadata, stats)
+            stats.record_bytes(sum(tag.length for tag in tags))
+            return DiagnosticObject(self.metadata, self.metadata.root(), tags, stats)
+
+    def _parse_cached(self, data: Union[io.RawIOBase, bytes], stats: Optional[DecodeStats]) -> DiagnosticObject:
+        raw = data if isinstance(data, bytes) else data.read()
+        key = self.cache.key(raw, self.metadata.identity())
+
+        tree = self.cache.get(key)
+        if tree is not None:
+            return object_from_tree(self.metadata, self.metadata.root(), tree)
+
+        if stats is not None:
+            with stats.timed("decode"):
+                result = self._parse(io.BytesIO(raw), stats)
+        else:
+            result = self._parse(io.BytesIO(raw), None)
+
+        self.cache.put(key, object_to_tree(result))
+        return result
+
+    def parse_chunked(
+        self,
+        data: BinaryIO,
+        window_size: int = DEFAULT_WINDOW_SIZE,
+        max_payload: int = DEFAULT_MAX_PAYLOAD,
+    ) -> Generator[DiagnosticValue, None, None]:
+        """
+        Decodes the top level properties of a log one at a time through a bounded window, for logs too large to
+        hold in memory or arriving over a pipe.  Payloads larger than `max_payload` are not decoded, their value
+        is a `PayloadStream` that must be consumed before the next value is requested
+        """
+        root_object: ManifestObjectDefinition = self.metadata.root()
+        reader = ChunkedTagReader(data, window_size, max_payload)
+        stats = self.stats
+
+        for tag in reader:
+            prop = root_object.property_for_tag(tag.index)
+
+            if stats is not None:
+                stats.record_tag(int(tag.tag_type))
+                stats.record_bytes(tag.length)
+
+            if isinstance(tag.value, PayloadStream):
+                yield DiagnosticValue.unparsed(tag.index, prop, tag.value)
+            elif stats is not None:
+                with stats.timed("decode"):
+                    value = DiagnosticValue(self.metadata, prop, tag, stats, 0)
+                yield value
+            else:
+                yield DiagnosticValue(self.metadata, prop, tag)
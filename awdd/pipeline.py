@@ -0,0 +1,309 @@
+import glob
+import heapq
+import os
+import queue
+import sys
+import threading
+from collections import deque
+from typing import Any, Callable, Generator, Iterable, List, NamedTuple, Optional
+
+from .object import DiagnosticObject
+from .parser import LogParser
+
+LOG_PATTERN = "*.metriclog"
+STDIN = "-"
+
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+ZIP_SUFFIXES = (".zip",)
+
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_READERS = 4
+
+# Stage names, a failed `LogItem` records which one it failed in
+READ = "read"
+DECODE = "decode"
+RENDER = "render"
+WRITE = "write"
+
+
+class LogSource(NamedTuple):
+    name: str  # Path, `archive:member` or `-`
+    path: Optional[str] = None  # Read by the read stage
+    data: Optional[bytes] = None  # Already in memory (archive members, stdin)
+    relative: Optional[str] = None  # Path below the directory or archive it was found in
+
+
+def relative_name(source: LogSource) -> str:
+    """
+    A relative path to write output for `source` under: its path below the directory or archive (as a directory
+    of its own) it was found in, the file name of a log given directly.  Never leads out of the directory it is
+    joined to, whatever an archive's member names say
+    """
+    name = source.relative if source.relative is not None else os.path.basename(source.name)
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    return os.path.join(*parts) if parts else STDIN
+
+
+def iter_sources(inputs: Iterable[str], pattern: str = LOG_PATTERN) -> Generator[LogSource, None, None]:
+    """
+    Files as given, directories searched recursively for metric logs, tar and zip archives expanded to their
+    members, `-` for a log on stdin, anything else treated as a glob
+    """
+    for item in inputs:
+        if item == STDIN:
+            yield LogSource(STDIN, data=sys.stdin.buffer.read())
+        elif os.path.isdir(item):
+            for path in sorted(glob.glob(os.path.join(item, "**", pattern), recursive=True)):
+                yield LogSource(path, path, relative=os.path.relpath(path, item))
+        elif item.endswith(TAR_SUFFIXES) and os.path.isfile(item):
+            yield from _tar_members(item)
+        elif item.endswith(ZIP_SUFFIXES) and os.path.isfile(item):
+            yield from _zip_members(item)
+        elif os.path.exists(item) or not glob.has_magic(item):
+            yield LogSource(item, item)
+        else:
+            yield from iter_sources(sorted(glob.glob(item, recursive=True)), pattern)
+
+
+def _tar_members(path: str) -> Generator[LogSource, None, None]:
+    import tarfile
+
+    # Streamed in member order, compressed archives cannot be read out of order cheaply
+    with tarfile.open(path, "r|*") as archive:
+        for member in archive:
+            if member.isfile():
+                yield LogSource(
+                    f"{path}:{member.name}",
+                    data=archive.extractfile(member).read(),
+                    relative=f"{os.path.basename(path)}/{member.name}",
+                )
+
+
+def _zip_members(path: str) -> Generator[LogSource, None, None]:
+    import zipfile
+
+    with zipfile.ZipFile(path) as archive:
+        for member in archive.infolist():
+            if not member.is_dir():
+                yield LogSource(
+                    f"{path}:{member.filename}",
+                    data=archive.read(member),
+                    relative=f"{os.path.basename(path)}/{member.filename}",
+                )
+
+
+def bounded_map(executor, function: Callable, *iterables: Iterable, window: int) -> Generator[Any, None, None]:
+    """
+    `Executor.map` that takes its inputs lazily, with at most `window` calls submitted and not yet yielded, so a
+    long or generated input is never held in memory whole.  Results come in input order, calls still pending
+    when the iteration stops are cancelled
+    """
+    pending = deque()
+    try:
+        for arguments in zip(*iterables):
+            if len(pending) >= window:
+                yield pending.popleft().result()
+            pending.append(executor.submit(function, *arguments))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def read_source(source: LogSource) -> bytes:
+    if source.data is not None:
+        return source.data
+    with open(source.path, "rb") as stream:
+        return stream.read()
+
+
+class LogItem:
+    """
+    One log on its way through a `LogPipeline`.  Stages fill in `data`, `result` and `output` in turn, which
+    are dropped again once written.  A stage that raises sets `error` and `stage`, the later stages then pass
+    the item along untouched
+    """
+
+    __slots__ = ("sequence", "source", "size", "data", "result", "output", "error", "stage")
+
+    def __init__(self, sequence: int, source: LogSource):
+        self.sequence = sequence
+        self.source = source
+        self.size = 0
+        self.data: Optional[bytes] = None
+        self.result: Optional[DiagnosticObject] = None
+        self.output: Any = None
+        self.error: Optional[BaseException] = None
+        self.stage: Optional[str] = None
+
+    def __lt__(self, other: "LogItem") -> bool:
+        return self.sequence < other.sequence
+
+
+class _Stage(NamedTuple):
+    name: str
+    function: Callable[[LogItem], None]
+    workers: int
+    ordered: bool = False
+
+
+_DONE = None
+
+
+class LogPipeline:
+    """
+    Reads, decodes, renders and writes logs as four stages on their own threads, joined by queues holding at
+    most `queue_size` items so a slow stage holds the ones before it back rather than letting memory grow.  At
+    most `max_in_flight` logs (by default as many as the queues hold) are between being read and being yielded,
+    which also bounds those the write stage holds back while it waits for an earlier, slower log.
+    Each stage has its own worker count: several readers keep slow storage busy, more decoders only pay off
+    where decoding releases the GIL (the protobuf runtime, free-threaded builds).  Writing is a single worker
+    that sees the logs in input order.
+
+    `render(result, source)` turns a decoded log into what `write(item)` writes, typically a string from one of
+    the writers
+    """
+
+    def __init__(
+        self,
+        parser: LogParser,
+        render: Callable[[DiagnosticObject, LogSource], Any],
+        write: Callable[[LogItem], None],
+        readers: int = DEFAULT_READERS,
+        decoders: int = 1,
+        renderers: int = 1,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        max_in_flight: Optional[int] = None,
+    ):
+        self.parser = parser
+        self.render = render
+        self.write = write
+        self.queue_size = queue_size
+        self.stages = [
+            _Stage(READ, self._read, readers),
+            _Stage(DECODE, self._decode, decoders),
+            _Stage(RENDER, self._render, renderers),
+            _Stage(WRITE, self._write, 1, ordered=True),
+        ]
+        self.max_in_flight = max_in_flight or queue_size * (len(self.stages) + 1)
+
+    @staticmethod
+    def _read(item: LogItem):
+        item.data = read_source(item.source)
+        item.size = len(item.data)
+
+    def _decode(self, item: LogItem):
+        item.result = self.parser.parse(item.data)
+        item.data = None
+
+    def _render(self, item: LogItem):
+        item.output = self.render(item.result, item.source)
+        item.result = None
+
+    def _write(self, item: LogItem):
+        self.write(item)
+        item.output = None
+
+    def run(self, sources: Iterable[LogSource]) -> Generator[LogItem, None, None]:
+        """
+        Pushes `sources` through the stages, yielding each item in input order once written (or failed).
+        Stopping the iteration early cancels the logs still in flight
+        """
+        queues: List["queue.Queue[Optional[LogItem]]"] = [
+            queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)
+        ]
+        cancelled = threading.Event()
+        in_flight = threading.Semaphore(self.max_in_flight)
+        failure: List[BaseException] = []
+
+        def feed():
+            try:
+                for sequence, source in enumerate(sources):
+                    in_flight.acquire()
+                    if cancelled.is_set():
+                        break
+                    queues[0].put(LogItem(sequence, source))
+            except BaseException as error:
+                failure.append(error)
+            finally:
+                for _ in range(self.stages[0].workers):
+                    queues[0].put(_DONE)
+
+        threads = [threading.Thread(target=feed, name="awdd-sources", daemon=True)]
+        for position, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            lock = threading.Lock()
+            for number in range(stage.workers):
+                threads.append(
+                    threading.Thread(
+                        target=self._work,
+                        args=(stage, queues[position], queues[position + 1], remaining, lock, cancelled),
+                        name=f"awdd-{stage.name}-{number}",
+                        daemon=True,
+                    )
+                )
+
+        for thread in threads:
+            thread.start()
+
+        output = queues[-1]
+        try:
+            while (item := output.get()) is not _DONE:
+                in_flight.release()
+                yield item
+        finally:
+            if item is not _DONE:
+                # Let everything in flight drain through so no thread stays blocked on a full queue
+                cancelled.set()
+                in_flight.release()
+                while output.get() is not _DONE:
+                    in_flight.release()
+            for thread in threads:
+                thread.join()
+
+        if failure:
+            raise failure[0]
+
+    def _work(
+        self,
+        stage: _Stage,
+        inbox: "queue.Queue[Optional[LogItem]]",
+        outbox: "queue.Queue[Optional[LogItem]]",
+        remaining: List[int],
+        lock: threading.Lock,
+        cancelled: threading.Event,
+    ):
+        # Ordered stages have a single worker that holds early arrivals back until their turn
+        pending: List[LogItem] = []
+        expected = 0
+
+        while (item := inbox.get()) is not _DONE:
+            ready = [item]
+            if stage.ordered:
+                heapq.heappush(pending, item)
+                ready = []
+                while pending and pending[0].sequence == expected:
+                    ready.append(heapq.heappop(pending))
+                    expected += 1
+
+            for item in ready:
+                if item.error is None and not cancelled.is_set():
+                    try:
+                        stage.function(item)
+                    except Exception as error:
+                        item.error = error
+                        item.stage = stage.name
+                        item.data = item.result = item.output = None
+                outbox.put(item)
+
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+
+        if last:
+            # One marker per worker of the next stage, or one for `run` after the last stage
+            position = self.stages.index(stage)
+            following = self.stages[position + 1].workers if position + 1 < len(self.stages) else 1
+            for _ in range(following):
+                outbox.put(_DONE)
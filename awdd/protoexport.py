@@ -0,0 +1,268 @@
+import os
+from pathlib import Path
+from typing import Dict, List, Set, Union
+
+from google.protobuf import descriptor_pb2
+
+from .definition import (
+    ManifestObjectDefinition,
+    ManifestProperty,
+    PropertyExtensionType,
+)
+from .descriptors import (
+    DEFAULT_PACKAGE,
+    DescriptorNames,
+    FieldDescriptorProto,
+    can_be_proto_enum,
+    enum_descriptor,
+    field_descriptor,
+    is_valid_field_number,
+)
+from .metadata import Metadata
+
+DESCRIPTOR_SET_NAME = "descriptors.pb"
+
+PROTO_TYPES = {
+    FieldDescriptorProto.TYPE_DOUBLE: "double",
+    FieldDescriptorProto.TYPE_FLOAT: "float",
+    FieldDescriptorProto.TYPE_INT64: "int64",
+    FieldDescriptorProto.TYPE_UINT64: "uint64",
+    FieldDescriptorProto.TYPE_INT32: "int32",
+    FieldDescriptorProto.TYPE_UINT32: "uint32",
+    FieldDescriptorProto.TYPE_BOOL: "bool",
+    FieldDescriptorProto.TYPE_STRING: "string",
+    FieldDescriptorProto.TYPE_BYTES: "bytes",
+}
+
+LABELS = {
+    FieldDescriptorProto.LABEL_OPTIONAL: "optional",
+    FieldDescriptorProto.LABEL_REQUIRED: "required",
+    FieldDescriptorProto.LABEL_REPEATED: "repeated",
+}
+
+
+def _is_extension(prop: ManifestProperty) -> bool:
+    return bool(prop.extends) and isinstance(prop.extends, ManifestObjectDefinition)
+
+
+def _category_files(metadata: Metadata, package: str) -> Dict[int, str]:
+    categories = {klass.category for klass in metadata.all_objects.values()}
+    categories.update(enum.category for enum in metadata.all_enums.values())
+    root_category = metadata.root().category
+    return {
+        category: f"{package}.proto" if category == root_category else f"{package}_{category:04x}.proto"
+        for category in categories
+    }
+
+
+def _has_cycle(dependencies: Dict[str, Set[str]]) -> bool:
+    visiting: Set[str] = set()
+    done: Set[str] = set()
+
+    def visit(name: str) -> bool:
+        if name in done:
+            return False
+        if name in visiting:
+            return True
+        visiting.add(name)
+        if any(visit(dependency) for dependency in dependencies.get(name, ())):
+            return True
+        visiting.discard(name)
+        done.add(name)
+        return False
+
+    return any(visit(name) for name in dependencies)
+
+
+def export_descriptor_set(
+    metadata: Metadata, package: str = DEFAULT_PACKAGE, raw_values: bool = False
+) -> descriptor_pb2.FileDescriptorSet:
+    """
+    The schema as it is laid out in the manifests, for protobuf toolchains: a file per manifest category, with
+    the root category in `<package>.proto`.  Properties that extend another class become proto2 extensions
+    declared inside the class that defines them, and their targets reserve the field numbers with `extensions`.
+    Replacing extensions become ordinary fields of their target.  If the categories reference each other in a
+    cycle everything goes into a single file
+    """
+    metadata.resolve()
+    names = DescriptorNames(metadata)
+    file_names = _category_files(metadata, package)
+
+    files: Dict[str, descriptor_pb2.FileDescriptorProto] = {}
+    dependencies: Dict[str, Set[str]] = {}
+    owners: Dict[str, str] = {}  # Fully qualified type name to the file that declares it
+
+    def file_for(category: int) -> descriptor_pb2.FileDescriptorProto:
+        name = file_names[category]
+        if name not in files:
+            files[name] = descriptor_pb2.FileDescriptorProto(name=name, package=package, syntax="proto2")
+            dependencies[name] = set()
+        return files[name]
+
+    for tag, enum in sorted(metadata.all_enums.items()):
+        if can_be_proto_enum(enum):
+            enum_descriptor(file_for(enum.category).enum_type, enum, names.enums[tag])
+            owners[f".{package}.{names.enums[tag]}"] = file_names[enum.category]
+
+    extension_numbers: Dict[int, List[int]] = {}
+    messages: Dict[int, descriptor_pb2.DescriptorProto] = {}
+
+    for tag, klass in sorted(metadata.all_objects.items()):
+        message = file_for(klass.category).message_type.add()
+        message.name = names.messages[tag]
+        messages[tag] = message
+        owners[f".{package}.{message.name}"] = file_names[klass.category]
+
+    for tag, klass in sorted(metadata.all_objects.items()):
+        message = messages[tag]
+        used: Set[str] = set()
+        file_name = file_names[klass.category]
+
+        for prop in klass.properties:
+            if not is_valid_field_number(prop.index):
+                continue
+
+            if not _is_extension(prop):
+                added = [field_descriptor(message.field, prop, names, package, raw_values, used)]
+            elif prop.extension_type == PropertyExtensionType.REPLACE_PROPERTY:
+                if prop.parent is klass:
+                    continue
+                added = [field_descriptor(message.field, prop, names, package, raw_values, used)]
+            elif prop.parent is klass:
+                # Declared here, extends another class
+                field = field_descriptor(message.extension, prop, names, package, raw_values, used)
+                field.extendee = f".{package}.{names.messages[prop.extends.composite_tag()]}"
+                added = [field]
+            else:
+                extension_numbers.setdefault(tag, []).append(prop.index)
+                continue
+
+            for field in added:
+                for reference in (field.type_name, field.extendee):
+                    if reference and owners[reference] != file_name:
+                        dependencies[file_name].add(owners[reference])
+
+    for tag, numbers in extension_numbers.items():
+        for number in sorted(set(numbers)):
+            messages[tag].extension_range.add(start=number, end=number + 1)
+
+    ordered = sorted(files, key=lambda name: (name != f"{package}.proto", name))
+    root_name = f"{package}.proto"
+
+    if _has_cycle(dependencies) or (root_name in dependencies and dependencies[root_name]):
+        single = descriptor_pb2.FileDescriptorProto(name=root_name, package=package, syntax="proto2")
+        for name in ordered:
+            single.enum_type.extend(files[name].enum_type)
+            single.message_type.extend(files[name].message_type)
+        result = descriptor_pb2.FileDescriptorSet()
+        result.file.append(single)
+        return result
+
+    # Dependencies before the files that import them
+    result = descriptor_pb2.FileDescriptorSet()
+    written: Set[str] = set()
+
+    def add(name: str):
+        if name in written:
+            return
+        written.add(name)
+        for dependency in sorted(dependencies[name]):
+            add(dependency)
+        files[name].dependency.extend(sorted(dependencies[name]))
+        result.file.append(files[name])
+
+    for name in ordered:
+        add(name)
+
+    return result
+
+
+def _field_source(field: FieldDescriptorProto) -> str:
+    if field.type_name:
+        kind = field.type_name
+    else:
+        kind = PROTO_TYPES[field.type]
+
+    options = " [packed = true]" if field.options.packed else ""
+    return f"{LABELS[field.label]} {kind} {field.name} = {field.number}{options};"
+
+
+def _message_source(message: descriptor_pb2.DescriptorProto, lines: List[str]):
+    lines.append(f"message {message.name} {{")
+    for field in message.field:
+        lines.append(f"  {_field_source(field)}")
+
+    if message.extension_range:
+        numbers = ", ".join(
+            str(extension.start)
+            if extension.end == extension.start + 1
+            else f"{extension.start} to {extension.end - 1}"
+            for extension in message.extension_range
+        )
+        lines.append(f"  extensions {numbers};")
+
+    extendees: Dict[str, List[FieldDescriptorProto]] = {}
+    for field in message.extension:
+        extendees.setdefault(field.extendee, []).append(field)
+    for extendee, fields in extendees.items():
+        lines.append(f"  extend {extendee} {{")
+        for field in fields:
+            lines.append(f"    {_field_source(field)}")
+        lines.append("  }")
+
+    lines.append("}")
+
+
+def proto_source(file: descriptor_pb2.FileDescriptorProto, comment: str = "") -> str:
+    """
+    The .proto source of a file descriptor, as written by `export_proto`
+    """
+    lines = []
+    if comment:
+        lines.extend(f"// {line}" for line in comment.splitlines())
+    lines.append(f'syntax = "{file.syntax or "proto2"}";')
+    lines.append("")
+    lines.append(f"package {file.package};")
+
+    if file.dependency:
+        lines.append("")
+        lines.extend(f'import "{dependency}";' for dependency in file.dependency)
+
+    for enum in file.enum_type:
+        lines.append("")
+        lines.append(f"enum {enum.name} {{")
+        lines.extend(f"  {value.name} = {value.number};" for value in enum.value)
+        lines.append("}")
+
+    for message in file.message_type:
+        lines.append("")
+        _message_source(message, lines)
+
+    return "\n".join(lines) + "\n"
+
+
+def export_proto(
+    metadata: Metadata,
+    directory: Union[str, Path],
+    package: str = DEFAULT_PACKAGE,
+    raw_values: bool = False,
+) -> List[Path]:
+    """
+    Writes the schema as .proto files and a serialized `FileDescriptorSet` (`descriptors.pb`) to `directory`,
+    returning the paths written
+    """
+    directory = Path(directory)
+    os.makedirs(directory, exist_ok=True)
+    descriptors = export_descriptor_set(metadata, package, raw_values)
+    comment = f"Generated from the AWD manifests, schema {metadata.identity().hex()[:16]}"
+
+    written = []
+    for file in descriptors.file:
+        path = directory / file.name
+        path.write_text(proto_source(file, comment))
+        written.append(path)
+
+    path = directory / DESCRIPTOR_SET_NAME
+    path.write_bytes(descriptors.SerializeToString())
+    written.append(path)
+    return written
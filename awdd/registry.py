@@ -0,0 +1,223 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from . import DecodeError, ManifestError
+from .definition import ManifestObjectDefinition, PropertyType
+from .metadata import Metadata, file_signature, identity_hash
+from .stream import iter_fields
+
+# A manifest set on disk mirrors the system layout, `<directory>/AWDMetadata.bin` and `<directory>/Metadata/*.bin`
+ROOT_MANIFEST_NAME = "AWDMetadata.bin"
+EXTENSION_MANIFEST_GLOB = os.path.join("Metadata", "*.bin")
+
+BUILD_PROPERTY = "softwareBuild"
+
+DEFAULT_REGISTRY_SIZE = 512 * 1024 * 1024
+
+# A resolved schema's objects take about five times the bytes of its snapshot, which is cheap to measure where
+# tracing the resolve is not
+RESOLVED_SIZE_FACTOR = 5
+
+# One entry per manifest in the set, its identity hash or, without an identity region, its path and signature
+SchemaKey = Tuple[Union[bytes, Tuple[str, int, int]], ...]
+
+
+class SchemaSource(NamedTuple):
+    root_path: str
+    extension_pattern: str
+
+
+def schema_key(metadata: Metadata) -> SchemaKey:
+    key = []
+    for manifest in [metadata.root_manifest] + metadata.extension_manifests:
+        digest = identity_hash(manifest)
+        if digest is None:
+            signature = file_signature(manifest.path)
+            key.append((str(manifest.path), signature.mtime_ns, signature.size))
+        else:
+            key.append(digest)
+    return tuple(key)
+
+
+def _close_manifests(metadata: Metadata):
+    for manifest in [metadata.root_manifest] + metadata.extension_manifests:
+        manifest.close()
+
+
+class MetadataRegistry:
+    """
+    Schemas for many OS builds in one process.  Manifest sets are registered per build, resolved on first use
+    and kept in a least recently used cache bounded by `max_bytes` (estimated from each schema's snapshot size,
+    the most recently used schema is always kept).  Builds whose manifests carry the
+    same identities share one resolved `Metadata`.  Thread safe
+    """
+
+    sources: Dict[str, SchemaSource]
+    default_build: Optional[str]
+    max_bytes: int
+    resident_bytes: int
+    loads: int
+    hits: int
+
+    def __init__(self, max_bytes: int = DEFAULT_REGISTRY_SIZE, default_build: Optional[str] = None):
+        self.sources = {}
+        self.default_build = default_build
+        self.max_bytes = max_bytes
+        self.resident_bytes = 0
+        self.loads = 0
+        self.hits = 0
+        self.unknown_builds: Dict[str, int] = {}
+
+        self._keys: Dict[SchemaSource, SchemaKey] = {}
+        self._resident: "OrderedDict[SchemaKey, Tuple[Metadata, int]]" = OrderedDict()
+        self._build_path: Optional[Tuple[int, int]] = None
+        self._lock = threading.RLock()
+
+    def add(
+        self,
+        builds: Union[str, Iterable[str]],
+        root_path: str,
+        extension_pattern: Optional[str] = None,
+    ):
+        """
+        Registers the manifests for one or more builds, the first build registered is the default unless one
+        was given.  `extension_pattern` defaults to the `Metadata/*.bin` next to the root manifest
+        """
+        if not os.path.exists(root_path):
+            raise ManifestError(f"No root manifest at {root_path}")
+        if extension_pattern is None:
+            extension_pattern = os.path.join(os.path.dirname(root_path), EXTENSION_MANIFEST_GLOB)
+
+        source = SchemaSource(root_path, extension_pattern)
+        for build in [builds] if isinstance(builds, str) else builds:
+            self.sources[build] = source
+            if self.default_build is None:
+                self.default_build = build
+
+    def add_directory(self, directory: Union[str, Path]) -> List[str]:
+        """
+        Registers every manifest set below `directory`, one per subdirectory named after its build (the
+        directory itself counts when it holds a manifest set).  Returns the builds found
+        """
+        directory = Path(directory)
+        candidates = [directory] + sorted(path for path in directory.iterdir() if path.is_dir())
+
+        builds = []
+        for candidate in candidates:
+            root_path = candidate / ROOT_MANIFEST_NAME
+            if root_path.exists():
+                self.add(candidate.name, str(root_path))
+                builds.append(candidate.name)
+        return builds
+
+    @property
+    def builds(self) -> List[str]:
+        return list(self.sources)
+
+    def __contains__(self, build: str) -> bool:
+        return build in self.sources
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def metadata(self, build: Optional[str] = None) -> Metadata:
+        """
+        The resolved schema for `build`, the default build's for None or a build that is not registered
+        """
+        with self._lock:
+            source = self.sources.get(build) if build is not None else None
+            if source is None:
+                if build is not None:
+                    self.unknown_builds[build] = self.unknown_builds.get(build, 0) + 1
+                if self.default_build is None:
+                    raise ManifestError("No schemas registered")
+                source = self.sources[self.default_build]
+
+            key = self._keys.get(source)
+            if key is not None and key in self._resident:
+                self._resident.move_to_end(key)
+                self.hits += 1
+                return self._resident[key][0]
+
+            return self._load(source)
+
+    def _load(self, source: SchemaSource) -> Metadata:
+        metadata = Metadata(*source)
+        key = self._keys[source] = schema_key(metadata)
+
+        resident = self._resident.get(key)
+        if resident is not None:
+            # Another build with the same manifests is already resolved
+            _close_manifests(metadata)
+            self._resident.move_to_end(key)
+            self.hits += 1
+            return resident[0]
+
+        metadata.resolve()
+        size = len(metadata.snapshot().to_bytes()) * RESOLVED_SIZE_FACTOR
+        self.loads += 1
+        self._resident[key] = (metadata, size)
+        self.resident_bytes += size
+
+        while self.resident_bytes > self.max_bytes and len(self._resident) > 1:
+            _, (_, size) = self._resident.popitem(last=False)
+            self.resident_bytes -= size
+
+        return metadata
+
+    def resident(self) -> List[Metadata]:
+        """
+        The schemas currently held, least recently used first
+        """
+        with self._lock:
+            return [metadata for metadata, _ in self._resident.values()]
+
+    def _software_build_path(self) -> Optional[Tuple[int, int]]:
+        """
+        Tag indexes of the header object in the root and of `softwareBuild` in the header, taken from the
+        default schema.  The log header's layout is the same across builds, which is what lets it be read
+        before the schema is known
+        """
+        if self._build_path is None:
+            root: ManifestObjectDefinition = self.metadata().root()
+            for prop in root.properties:
+                if prop.type != PropertyType.OBJECT or not isinstance(prop.object_type, ManifestObjectDefinition):
+                    continue
+                for child in prop.object_type.properties:
+                    if child.name == BUILD_PROPERTY:
+                        self._build_path = (prop.index, child.index)
+                        return self._build_path
+
+        return self._build_path
+
+    def software_build(self, data: Union[bytes, memoryview]) -> Optional[str]:
+        """
+        The `softwareBuild` in a log's header, read without decoding the rest of the log
+        """
+        path = self._software_build_path()
+        if path is None:
+            return None
+
+        header_index, build_index = path
+        try:
+            for index, length_prefixed, value in iter_fields(data):
+                if index != header_index or not length_prefixed:
+                    continue
+                for child_index, child_prefixed, child in iter_fields(value):
+                    if child_index == build_index and child_prefixed:
+                        return bytes(child).decode("utf-8", errors="replace")
+                return None
+        except DecodeError:
+            return None
+
+        return None
+
+    def metadata_for_log(self, data: Union[bytes, memoryview]) -> Metadata:
+        """
+        The schema for the build that wrote the log, the default schema when the log has no header or its build
+        is not registered
+        """
+        return self.metadata(self.software_build(data))
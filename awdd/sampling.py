@@ -0,0 +1,163 @@
+import random
+import sys
+from typing import BinaryIO, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from . import Tag, TagType
+from .definition import ManifestObjectDefinition
+from .instrumentation import DecodeStats
+from .metadata import Metadata
+from .stream import ChunkedTagReader
+from .timeindex import entry_metric, metric_id_tags, metric_logs_property
+
+
+class _EntryLayout(NamedTuple):
+    tag: int  # Root tag of the metric log entries
+    metric_tags: FrozenSet[int]  # Entry fields holding the metric id
+
+
+def _entry_layout(metadata: Metadata) -> _EntryLayout:
+    prop = metric_logs_property(metadata)
+    entry_class: ManifestObjectDefinition = prop.object_type
+    return _EntryLayout(prop.index, metric_id_tags(entry_class))
+
+
+class Sampler:
+    """
+    Deterministic sampling of metric log entries for approximate statistics over large corpora.  Entries left
+    out are skipped by their length prefix and never decoded, every other top level field is kept.
+
+    - `every`: keep one entry in `every`, the `seed`th (mod `every`) of each log onwards
+    - `per_class`: keep at most this many entries of each metric class per log, a uniform reservoir sample
+      seeded from `seed`, applied after `every`
+    - `file_fraction`: `keep_file` selects this fraction of files by a hash of their name
+
+    The same seed gives the same sample on every run and in every process.  The counts of entries seen and kept
+    go to the parser's `DecodeStats`, their ratio scales sampled counts back up.  Immutable, so one sampler can
+    be shared between threads and pickled to worker processes
+    """
+
+    __slots__ = ("every", "per_class", "file_fraction", "seed")
+
+    def __init__(
+        self,
+        every: int = 1,
+        per_class: Optional[int] = None,
+        file_fraction: float = 1.0,
+        seed: int = 0,
+    ):
+        if every < 1:
+            raise ValueError("every must be at least 1")
+        if per_class is not None and per_class < 1:
+            raise ValueError("per_class must be at least 1")
+        if not 0.0 <= file_fraction <= 1.0:
+            raise ValueError("file_fraction must be between 0 and 1")
+
+        self.every = every
+        self.per_class = per_class
+        self.file_fraction = file_fraction
+        self.seed = seed
+
+    def __repr__(self) -> str:
+        return (
+            f"Sampler(every={self.every}, per_class={self.per_class}, file_fraction={self.file_fraction}, "
+            f"seed={self.seed})"
+        )
+
+    def __reduce__(self):
+        return Sampler, (self.every, self.per_class, self.file_fraction, self.seed)
+
+    @property
+    def samples_entries(self) -> bool:
+        return self.every > 1 or self.per_class is not None
+
+    def keep_file(self, name: str) -> bool:
+        if self.file_fraction >= 1.0:
+            return True
+
+        import hashlib
+
+        digest = hashlib.blake2b(f"{self.seed}:{name}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big") < self.file_fraction * (1 << 64)
+
+    def sample(self, stream: BinaryIO, metadata: Metadata, stats: Optional[DecodeStats] = None) -> List[Tag]:
+        """
+        The top level tags of one log with the unsampled metric log entries left out, in their original order
+        """
+        layout = _entry_layout(metadata)
+        reader = ChunkedTagReader(stream, max_payload=sys.maxsize)
+        rng = random.Random(self.seed)
+
+        tags: List[Tuple[int, Tag]] = []
+        reservoirs: Dict[int, List[Tuple[int, Tag]]] = {}
+        seen_by_class: Dict[int, int] = {}
+        seen = 0
+
+        while (header := reader.read_header()) is not None:
+            position = header.offset
+            is_entry = header.index == layout.tag and header.tag_type & TagType.LENGTH_PREFIX
+
+            if is_entry:
+                seen += 1
+                if (seen - 1 - self.seed) % self.every:
+                    reader.skip_payload(header)
+                    continue
+
+            if header.tag_type & TagType.LENGTH_PREFIX:
+                value = reader.read_payload(header)
+            else:
+                value = header.value
+            tag = Tag(
+                index=header.index,
+                tag_type=header.tag_type,
+                length=header.header_length + header.length,
+                value=value,
+            )
+
+            if not is_entry or self.per_class is None:
+                tags.append((position, tag))
+                continue
+
+            # Algorithm R, one reservoir per metric class
+            metric = entry_metric(value, layout.metric_tags)
+            count = seen_by_class[metric] = seen_by_class.get(metric, 0) + 1
+            reservoir = reservoirs.setdefault(metric, [])
+            if len(reservoir) < self.per_class:
+                reservoir.append((position, tag))
+            else:
+                slot = rng.randrange(count)
+                if slot < self.per_class:
+                    reservoir[slot] = (position, tag)
+
+        for reservoir in reservoirs.values():
+            tags.extend(reservoir)
+        tags.sort(key=lambda item: item[0])
+
+        if stats is not None:
+            kept = sum(1 for _, tag in tags if tag.index == layout.tag and tag.tag_type & TagType.LENGTH_PREFIX)
+            stats.record_sample(seen, kept)
+            for _, tag in tags:
+                stats.record_tag(int(tag.tag_type))
+
+        return [tag for _, tag in tags]
+
+
+def add_sampling_arguments(parser):
+    """
+    The sampling options shared by the command line tools, read back with `sampler_from_arguments`
+    """
+    group = parser.add_argument_group("sampling", "decode a deterministic sample for quick corpus statistics")
+    group.add_argument("--sample-every", type=int, default=1, metavar="N", help="decode every Nth metric log entry")
+    group.add_argument(
+        "--sample-per-class", type=int, default=None, metavar="K", help="decode at most K entries per metric class"
+    )
+    group.add_argument(
+        "--sample-files", type=float, default=1.0, metavar="FRACTION", help="decode this fraction of the files"
+    )
+    group.add_argument("--seed", type=int, default=0, help="sampling seed, the same seed picks the same sample")
+
+
+def sampler_from_arguments(args) -> Optional[Sampler]:
+    sampler = Sampler(args.sample_every, args.sample_per_class, args.sample_files, args.seed)
+    if not sampler.samples_entries and sampler.file_fraction >= 1.0:
+        return None
+    return sampler
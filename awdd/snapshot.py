@@ -0,0 +1,411 @@
+import struct
+from array import array
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Union
+
+from . import ManifestError
+from .definition import (
+    IntegerFormat,
+    ManifestEnumMember,
+    ManifestExtensionScopeType,
+    ManifestObjectDefinition,
+    ManifestProperty,
+    ManifestTypeDefinition,
+    PropertyExtensionType,
+    PropertyFlags,
+    PropertyType,
+    StringFormat,
+)
+from .metadata import Metadata
+
+# Rows of the flat tables, every cell is a signed 64 bit integer and NONE marks an absent value
+NONE = -1
+# Marks the key of an object outside `Metadata.all_objects`, i.e. an ambient type of the root manifest that a
+# CONFIGURATION_SCOPE extension points into.  Composite tags are 32 bits, so the key never clashes with one
+AMBIENT = 1 << 32
+
+# Value kinds of enum members.  Values are stored signed, unsigned varints past the int64 range (the raw form of
+# negative signed members) are stored as their two's complement and marked as WRAPPED
+NO_VALUE = 0
+VALUE = 1
+WRAPPED = 2
+
+OBJECT_ROW = 4  # tag, name, first property slot, property count
+ENUM_ROW = 4  # tag, name, first member, member count
+MEMBER_ROW = 3  # index, name, value kind
+PROPERTY_ROW = 13
+# parent tag, index, name, type, flags, pii, integer format, string format, object type, enum type, extends,
+# extension scope, extension type
+
+SNAPSHOT_MAGIC = b"AWDS"
+SNAPSHOT_VERSION = 3
+SNAPSHOT_HEADER = b"<4sIq8Q"
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def _optional(value) -> int:
+    return NONE if value is None else int(value)
+
+
+def _reference(target, keys: Dict[int, int]) -> int:
+    if target is None:
+        return NONE
+    if isinstance(target, int):
+        # Left unresolved by bind, keep the raw tag so that the value round trips
+        return -(target + 3)
+    if id(target) not in keys:
+        raise ManifestError(f"{target.name} is not part of the metadata being snapshot")
+    return keys[id(target)]
+
+
+def _dereference(value: int, table: Dict[int, object]):
+    if value == NONE:
+        return None
+    if value < NONE:
+        return -value - 3
+    return table.get(value)
+
+
+def _ambient_objects(metadata: Metadata) -> Dict[int, ManifestObjectDefinition]:
+    # Objects reachable from the schema that are not in all_objects, keyed by their composite tag and AMBIENT
+    ambient: Dict[int, ManifestObjectDefinition] = {}
+    pending = list(metadata.all_objects.values())
+    while pending:
+        for prop in pending.pop().properties:
+            for target in (prop.object_type, prop.extends):
+                if not isinstance(target, ManifestObjectDefinition):
+                    continue
+                tag = target.composite_tag()
+                if metadata.all_objects.get(tag) is target or ambient.get(tag | AMBIENT) is target:
+                    continue
+                if tag | AMBIENT in ambient:
+                    raise ManifestError(f"Two ambient types share the tag {tag:#x}")
+                ambient[tag | AMBIENT] = target
+                pending.append(target)
+    return ambient
+
+
+class MetadataSnapshot:
+    """
+    An immutable, flat form of a resolved `Metadata`.  Every definition is a row in an array of 64 bit integers
+    and every name an offset into a single string blob, so a snapshot pickles as a handful of buffers, has no
+    cycles for the garbage collector to walk and - when placed in shared memory - is mapped by every worker
+    instead of copied.  Ambient types that CONFIGURATION_SCOPE extensions point into are kept alongside the
+    objects, under their tag marked as AMBIENT.  `restore()` rebuilds a frozen `Metadata` from it without opening or parsing a manifest,
+    but it still builds the whole object graph in every process that calls it: only the flat tables are shared,
+    the restored definitions are per process
+    """
+
+    root_tag: int
+    objects: Sequence[int]
+    object_properties: Sequence[int]
+    properties: Sequence[int]
+    enums: Sequence[int]
+    members: Sequence[int]
+    member_values: Sequence[int]
+    string_offsets: Sequence[int]
+    strings: memoryview
+
+    def __init__(
+        self,
+        root_tag: int,
+        objects: Sequence[int],
+        object_properties: Sequence[int],
+        properties: Sequence[int],
+        enums: Sequence[int],
+        members: Sequence[int],
+        member_values: Sequence[int],
+        string_offsets: Sequence[int],
+        strings: Buffer,
+        shared: Optional[shared_memory.SharedMemory] = None,
+    ):
+        self.root_tag = root_tag
+        self.objects = objects
+        self.object_properties = object_properties
+        self.properties = properties
+        self.enums = enums
+        self.members = members
+        self.member_values = member_values
+        self.string_offsets = string_offsets
+        self.strings = memoryview(strings)
+        self._shared = shared
+
+    @classmethod
+    def from_metadata(cls, metadata: Metadata) -> "MetadataSnapshot":
+        if not metadata.resolved:
+            raise ManifestError("Metadata must be resolved before taking a snapshot")
+
+        strings: List[bytes] = []
+        string_ids: Dict[str, int] = {}
+
+        def string_id(value: Optional[str]) -> int:
+            if value is None:
+                return NONE
+            if value not in string_ids:
+                string_ids[value] = len(strings)
+                strings.append(str(value).encode("utf-8"))
+            return string_ids[value]
+
+        all_objects = {**metadata.all_objects, **_ambient_objects(metadata)}
+        object_keys = {id(definition): tag for tag, definition in all_objects.items()}
+        enum_keys = {id(definition): tag for tag, definition in metadata.all_enums.items()}
+
+        property_rows: Dict[int, int] = {}
+        properties = array("q")
+        objects = array("q")
+        object_properties = array("q")
+
+        def property_row(prop: ManifestProperty) -> int:
+            if id(prop) not in property_rows:
+                property_rows[id(prop)] = len(properties) // PROPERTY_ROW
+                properties.extend(
+                    [
+                        _reference(prop.parent, object_keys),
+                        prop.index,
+                        string_id(prop.name),
+                        prop.type,
+                        prop.flags,
+                        int(prop.pii),
+                        _optional(prop.integer_format),
+                        _optional(prop.string_format),
+                        _reference(prop.object_type, object_keys),
+                        _reference(prop.enum_type, enum_keys),
+                        _reference(prop.extends, object_keys),
+                        _optional(prop.extension_scope),
+                        _optional(prop.extension_type),
+                    ]
+                )
+            return property_rows[id(prop)]
+
+        for tag, definition in all_objects.items():
+            objects.extend(
+                [
+                    tag,
+                    string_id(definition.name),
+                    len(object_properties),
+                    len(definition.properties),
+                ]
+            )
+            object_properties.extend(
+                property_row(prop) for prop in definition.properties
+            )
+
+        enums = array("q")
+        members = array("q")
+        member_values = array("q")
+        for tag, definition in metadata.all_enums.items():
+            enums.extend(
+                [
+                    tag,
+                    string_id(definition.name),
+                    len(members) // MEMBER_ROW,
+                    len(definition.entries),
+                ]
+            )
+            for member in definition.entries:
+                value = member.value or 0
+                kind = VALUE if member.value is not None else NO_VALUE
+                if value >= 1 << 63:
+                    value -= 1 << 64
+                    kind = WRAPPED
+                members.extend([member.index, string_id(member.name), kind])
+                member_values.append(value)
+
+        string_offsets = array("q", [0])
+        for value in strings:
+            string_offsets.append(string_offsets[-1] + len(value))
+
+        return cls(
+            metadata.root().composite_tag(),
+            objects,
+            object_properties,
+            properties,
+            enums,
+            members,
+            member_values,
+            string_offsets,
+            b"".join(strings),
+        )
+
+    def _tables(self) -> List[memoryview]:
+        return [
+            memoryview(table).cast("B")
+            for table in [
+                self.objects,
+                self.object_properties,
+                self.properties,
+                self.enums,
+                self.members,
+                self.member_values,
+                self.string_offsets,
+            ]
+        ] + [self.strings]
+
+    def to_bytes(self) -> bytes:
+        tables = self._tables()
+        header = struct.pack(
+            SNAPSHOT_HEADER,
+            SNAPSHOT_MAGIC,
+            SNAPSHOT_VERSION,
+            self.root_tag,
+            *[len(table) for table in tables],
+        )
+        return header + b"".join(tables)
+
+    @classmethod
+    def from_bytes(
+        cls, data: Buffer, shared: Optional[shared_memory.SharedMemory] = None
+    ) -> "MetadataSnapshot":
+        """
+        Maps the tables over `data` without copying them, `data` must outlive the snapshot
+        """
+        view = memoryview(data)
+        magic, version, root_tag, *sizes = struct.unpack_from(SNAPSHOT_HEADER, view)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ManifestError(f"Not a metadata snapshot (got {magic} v{version})")
+
+        offset = struct.calcsize(SNAPSHOT_HEADER)
+        tables = []
+        for size, kind in zip(sizes, ["q", "q", "q", "q", "q", "q", "q", "B"]):
+            tables.append(view[offset : offset + size].cast(kind))
+            offset += size
+
+        return cls(root_tag, *tables, shared=shared)
+
+    def __reduce__(self):
+        return MetadataSnapshot.from_bytes, (self.to_bytes(),)
+
+    def share(self, name: Optional[str] = None) -> shared_memory.SharedMemory:
+        """
+        Copies the snapshot into a new shared memory segment and returns it, workers `attach` by its name.  The
+        caller owns the segment and must `unlink` it once the workers are done
+        """
+        data = self.to_bytes()
+        segment = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+        segment.buf[: len(data)] = data
+        return segment
+
+    @classmethod
+    def attach(cls, name: str) -> "MetadataSnapshot":
+        segment = shared_memory.SharedMemory(name=name)
+        return cls.from_bytes(segment.buf, shared=segment)
+
+    def close(self):
+        """
+        Releases the views onto the backing buffer, and detaches from the shared memory segment if attached
+        """
+        for name in [
+            "objects",
+            "object_properties",
+            "properties",
+            "enums",
+            "members",
+            "member_values",
+            "string_offsets",
+            "strings",
+        ]:
+            table = getattr(self, name)
+            if isinstance(table, memoryview):
+                table.release()
+
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
+
+    def string(self, string_id: int) -> Optional[str]:
+        if string_id == NONE:
+            return None
+        start = self.string_offsets[string_id]
+        end = self.string_offsets[string_id + 1]
+        return str(self.strings[start:end], "utf-8")
+
+    def __len__(self):
+        return len(self.objects) // OBJECT_ROW
+
+    def restore(self) -> Metadata:
+        all_enums: Dict[int, ManifestTypeDefinition] = {}
+        for row in range(0, len(self.enums), ENUM_ROW):
+            tag, name, first, count = self.enums[row : row + ENUM_ROW]
+            definition = ManifestTypeDefinition(tag >> 16, tag & 0xFFFF)
+            definition.name = self.string(name)
+            for member_row in range(first, first + count):
+                index, member_name, kind = self.members[
+                    member_row * MEMBER_ROW : (member_row + 1) * MEMBER_ROW
+                ]
+                member = ManifestEnumMember.__new__(ManifestEnumMember)
+                member.index = index
+                member.name = self.string(member_name)
+                if kind == NO_VALUE:
+                    member.value = None
+                else:
+                    member.value = self.member_values[member_row]
+                    if kind == WRAPPED:
+                        member.value += 1 << 64
+                definition.entries.append(member)
+            definition._index_members()
+            all_enums[tag] = definition
+
+        all_objects: Dict[int, ManifestObjectDefinition] = {}
+        for row in range(0, len(self.objects), OBJECT_ROW):
+            tag, name, _, _ = self.objects[row : row + OBJECT_ROW]
+            definition = ManifestObjectDefinition((tag & ~AMBIENT) >> 16, tag & 0xFFFF)
+            definition.name = self.string(name)
+            all_objects[tag] = definition
+
+        restored: List[ManifestProperty] = []
+        declared: Dict[int, List[ManifestProperty]] = {}
+        for row in range(0, len(self.properties), PROPERTY_ROW):
+            (
+                parent,
+                index,
+                name,
+                kind,
+                flags,
+                pii,
+                integer_format,
+                string_format,
+                object_type,
+                enum_type,
+                extends,
+                extension_scope,
+                extension_type,
+            ) = self.properties[row : row + PROPERTY_ROW]
+
+            prop = ManifestProperty(all_objects[parent])
+            prop.index = index
+            prop.name = self.string(name)
+            prop.type = PropertyType(kind)
+            prop.flags = PropertyFlags(flags)
+            prop.pii = bool(pii)
+            if integer_format != NONE:
+                prop.integer_format = IntegerFormat(integer_format)
+            if string_format != NONE:
+                prop.string_format = StringFormat(string_format)
+            prop.object_type = _dereference(object_type, all_objects)
+            prop.enum_type = _dereference(enum_type, all_enums)
+            prop.extends = _dereference(extends, all_objects)
+            if extension_scope != NONE:
+                prop.extension_scope = ManifestExtensionScopeType(extension_scope)
+            if extension_type != NONE:
+                prop.extension_type = PropertyExtensionType(extension_type)
+            restored.append(prop)
+            declared.setdefault(parent, []).append(prop)
+
+        for row in range(0, len(self.objects), OBJECT_ROW):
+            tag, _, first, count = self.objects[row : row + OBJECT_ROW]
+            definition = all_objects[tag]
+            definition.properties = [
+                restored[slot] for slot in self.object_properties[first : first + count]
+            ]
+            definition.own_properties = tuple(declared.get(tag, ()))
+
+        return Metadata.from_definitions(
+            {tag: definition for tag, definition in all_objects.items() if not tag & AMBIENT},
+            all_enums,
+            self.root_tag,
+        )
+
+
+def restore_metadata(data: Buffer) -> Metadata:
+    return MetadataSnapshot.from_bytes(data).restore()
@@ -0,0 +1,331 @@
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from .definition import (
+    ManifestObjectDefinition,
+    ManifestProperty,
+    ManifestTypeDefinition,
+    PropertyFlags,
+    PropertyType,
+)
+from .metadata import Metadata
+from .object import DiagnosticObject
+from .parser import LogParser
+
+DEFAULT_BATCH_SIZE = 50_000
+
+INSERT_FILE = "INSERT INTO files VALUES (?, ?)"
+INSERT_OBJECT = "INSERT INTO objects VALUES (?, ?, ?, ?)"
+
+# Columns every class table starts with, fields of the same name are prefixed to keep them apart
+RESERVED_COLUMNS = ("id", "parent_id", "parent_field")
+
+COLUMN_TYPES = {
+    PropertyType.DOUBLE: "NUMERIC",
+    PropertyType.FLOAT: "NUMERIC",
+    PropertyType.STRING: "TEXT",
+    PropertyType.BYTES: "BLOB",
+    PropertyType.PACKED_UINT_32: "BLOB",
+    PropertyType.PACKED_TIMES: "BLOB",
+    PropertyType.PACKED_ERRORS: "BLOB",
+    PropertyType.UNKNOWN: "BLOB",
+}
+
+INT64_SIGN = 1 << 63
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _column_value(value: Any, text: bool = False) -> Any:
+    # SQLite integers are signed 64 bit, larger varints are stored as their two's complement
+    if isinstance(value, int) and value >= INT64_SIGN:
+        return value - (INT64_SIGN << 1)
+    if text and isinstance(value, (bytes, memoryview)):
+        return bytes(value).decode("utf-8", errors="replace")
+    if isinstance(value, memoryview):
+        return bytes(value)
+    return value
+
+
+class _ClassTable:
+    # How one object class maps onto its table and the child tables of its repeated scalar fields
+    name: str
+    columns: Dict[int, int]  # Property index to position in the row
+    repeated: Dict[int, str]  # Property index to the insert statement of its child table
+    nested: Dict[int, str]  # Property index to the field name recorded on the child object's row
+    text: Set[int]  # Property indices of STRING fields, stored as TEXT rather than BLOB
+    insert: str
+    width: int
+
+    def __init__(self, name: str):
+        self.name = name
+        self.columns = {}
+        self.repeated = {}
+        self.nested = {}
+        self.text = set()
+
+
+class SqliteExporter:
+    """
+    Loads decoded logs into SQLite with tables generated from the resolved manifests.  Every decoded object gets a
+    row in `objects` and one in its class table sharing the same id, nested objects point back at their owner
+    through `parent_id`.  Repeated scalar fields go to `<class>_<field>` child tables and enums to `enum_<name>`
+    lookup tables.  Rows are buffered and written with `executemany`, committing every `batch_size` rows
+    """
+
+    connection: sqlite3.Connection
+    metadata: Metadata
+    batch_size: int
+
+    def __init__(
+        self,
+        database: Union[str, Path, sqlite3.Connection],
+        metadata: Metadata,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ):
+        if isinstance(database, sqlite3.Connection):
+            self.connection = database
+        else:
+            self.connection = sqlite3.connect(database)
+
+        self.metadata = metadata
+        self.metadata.resolve()
+        self.batch_size = batch_size
+
+        self._tables: Dict[int, _ClassTable] = {}
+        self._pending: Dict[str, List[tuple]] = {}
+        self._pending_rows = 0
+
+        self.create_schema()
+        self._next_id = self._scalar("SELECT COALESCE(MAX(id), 0) + 1 FROM objects")
+        self._next_file_id = self._scalar("SELECT COALESCE(MAX(id), 0) + 1 FROM files")
+
+    def _scalar(self, query: str, *parameters: Any) -> Any:
+        return self.connection.execute(query, parameters).fetchone()[0]
+
+    @staticmethod
+    def _unique_name(name: str, suffix: int, seen: Set[str]) -> str:
+        # SQLite identifiers are case insensitive, so are the collisions
+        if name.lower() in seen:
+            name = f"{name}_{suffix:x}"
+        seen.add(name.lower())
+        return name
+
+    @staticmethod
+    def _unique_names(names: Dict[int, str], seen: Set[str]) -> Dict[int, str]:
+        return {tag: SqliteExporter._unique_name(name, tag, seen) for tag, name in sorted(names.items())}
+
+    def _class_names(self, seen: Optional[Set[str]] = None) -> Dict[int, str]:
+        names = {
+            tag: klass.name if isinstance(klass.name, str) else f"object_{tag:x}"
+            for tag, klass in self.metadata.all_objects.items()
+        }
+        return self._unique_names(names, set() if seen is None else seen)
+
+    def _enum_names(self, seen: Optional[Set[str]] = None) -> Dict[int, str]:
+        names = {
+            tag: f"enum_{enum.name if isinstance(enum.name, str) else tag}"
+            for tag, enum in self.metadata.all_enums.items()
+        }
+        return self._unique_names(names, set() if seen is None else seen)
+
+    def _column_type(self, prop: ManifestProperty) -> str:
+        return COLUMN_TYPES.get(prop.type, "INTEGER")
+
+    def create_schema(self):
+        statements = [
+            "CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT)",
+            "CREATE TABLE IF NOT EXISTS objects ("
+            "id INTEGER PRIMARY KEY, class TEXT NOT NULL, "
+            "parent_id INTEGER REFERENCES objects(id), file_id INTEGER REFERENCES files(id))",
+            "CREATE INDEX IF NOT EXISTS objects_parent ON objects(parent_id)",
+        ]
+
+        # Class, enum and child tables as well as indexes share SQLite's namespace, class tables are named first
+        seen: Set[str] = {"files", "objects", "objects_parent"}
+        class_names = self._class_names(seen)
+
+        enum_tables: Dict[int, str] = {}
+        for tag, name in self._enum_names(seen).items():
+            enum = self.metadata.all_enums[tag]
+            table = quote(name)
+            enum_tables[id(enum)] = table
+            statements.append(
+                f"CREATE TABLE IF NOT EXISTS {table} (value INTEGER PRIMARY KEY, name TEXT NOT NULL)"
+            )
+
+        self._enum_rows: Dict[str, List[Tuple[int, str]]] = {
+            enum_tables[id(enum)]: [
+                (_column_value(member.value), member.name)
+                for member in enum.entries
+                if member.value is not None
+            ]
+            for enum in self.metadata.all_enums.values()
+        }
+
+        for tag, name in class_names.items():
+            klass = self.metadata.all_objects[tag]
+            table = _ClassTable(name)
+            columns = [
+                "id INTEGER PRIMARY KEY REFERENCES objects(id)",
+                "parent_id INTEGER REFERENCES objects(id)",
+                "parent_field TEXT",
+            ]
+            column_names = list(RESERVED_COLUMNS)
+            lowered = {column.lower() for column in column_names}
+
+            for prop in klass.properties:
+                field = prop.name if isinstance(prop.name, str) else f"field_{prop.index:x}"
+                if prop.type == PropertyType.OBJECT and isinstance(
+                    prop.object_type, ManifestObjectDefinition
+                ):
+                    table.nested[prop.index] = field
+                    continue
+
+                column_type = self._column_type(prop)
+                if prop.type == PropertyType.STRING:
+                    table.text.add(prop.index)
+                reference = ""
+                if (
+                    prop.type == PropertyType.ENUM
+                    and isinstance(prop.enum_type, ManifestTypeDefinition)
+                    and not prop.enum_type.is_flags
+                ):
+                    reference = f" REFERENCES {enum_tables[id(prop.enum_type)]}(value)"
+
+                if prop.flags & PropertyFlags.REPEATED:
+                    child = quote(self._unique_name(f"{name}_{field}", prop.index, seen))
+                    statements.append(
+                        f"CREATE TABLE IF NOT EXISTS {child} ("
+                        f"owner_id INTEGER NOT NULL REFERENCES {quote(name)}(id), "
+                        f"position INTEGER NOT NULL, value {column_type}{reference}, "
+                        f"PRIMARY KEY (owner_id, position))"
+                    )
+                    table.repeated[prop.index] = f"INSERT INTO {child} VALUES (?, ?, ?)"
+                    continue
+
+                while field.lower() in lowered:
+                    field = "field_" + field
+                table.columns[prop.index] = len(column_names)
+                column_names.append(field)
+                lowered.add(field.lower())
+                columns.append(f"{quote(field)} {column_type}{reference}")
+
+            statements.append(f"CREATE TABLE IF NOT EXISTS {quote(name)} ({', '.join(columns)})")
+            index = quote(self._unique_name(f"{name}_parent", tag, seen))
+            statements.append(f"CREATE INDEX IF NOT EXISTS {index} ON {quote(name)}(parent_id)")
+            table.width = len(column_names)
+            table.insert = (
+                f"INSERT INTO {quote(name)} ({', '.join(map(quote, column_names))}) "
+                f"VALUES ({', '.join('?' * table.width)})"
+            )
+            self._tables[id(klass)] = table
+
+        with self.connection:
+            for statement in statements:
+                self.connection.execute(statement)
+            for table, rows in self._enum_rows.items():
+                self.connection.executemany(f"INSERT OR IGNORE INTO {table} VALUES (?, ?)", rows)
+
+    def _queue(self, statement: str, row: tuple):
+        rows = self._pending.get(statement)
+        if rows is None:
+            rows = self._pending[statement] = []
+        rows.append(row)
+        self._pending_rows += 1
+
+    def _export_object(
+        self,
+        value: DiagnosticObject,
+        parent_id: Optional[int],
+        parent_field: Optional[str],
+        file_id: Optional[int],
+    ) -> int:
+        table = self._tables[id(value.object_class)]
+        object_id = self._next_id
+        self._next_id += 1
+
+        row: List[Any] = [None] * table.width
+        row[0], row[1], row[2] = object_id, parent_id, parent_field
+        positions: Dict[int, int] = {}
+
+        for item in value.properties:
+            index = item.index
+            if isinstance(item.value, DiagnosticObject):
+                self._export_object(item.value, object_id, table.nested.get(index), file_id)
+            elif index in table.columns:
+                row[table.columns[index]] = _column_value(item.value, index in table.text)
+            elif index in table.repeated:
+                position = positions.get(index, 0)
+                positions[index] = position + 1
+                self._queue(
+                    table.repeated[index],
+                    (object_id, position, _column_value(item.value, index in table.text)),
+                )
+
+        self._queue(INSERT_OBJECT, (object_id, table.name, parent_id, file_id))
+        self._queue(table.insert, tuple(row))
+        return object_id
+
+    def export(self, value: DiagnosticObject, path: Optional[Union[str, Path]] = None) -> int:
+        """
+        Queues a decoded log for loading, returning the id of its root object
+        """
+        file_id = None
+        if path is not None:
+            file_id = self._next_file_id
+            self._next_file_id += 1
+            self._queue(INSERT_FILE, (file_id, str(path)))
+
+        object_id = self._export_object(value, None, None, file_id)
+        if self._pending_rows >= self.batch_size:
+            self.flush()
+        return object_id
+
+    def export_files(
+        self, paths: Iterable[Union[str, Path]], parser: Optional[LogParser] = None
+    ) -> int:
+        """
+        Decodes and loads logs from disk, returning the number loaded
+        """
+        parser = parser if parser is not None else LogParser(self.metadata)
+        count = 0
+        for path in paths:
+            with open(path, "rb") as stream:
+                self.export(parser.parse(stream), path)
+            count += 1
+
+        self.flush()
+        return count
+
+    def flush(self):
+        """
+        Writes all queued rows in a single transaction
+        """
+        if not self._pending:
+            return
+
+        with self.connection:
+            # Referenced rows first, an object is queued after its children and its class table row
+            for statement in (INSERT_FILE, INSERT_OBJECT):
+                rows = self._pending.pop(statement, None)
+                if rows:
+                    self.connection.executemany(statement, rows)
+            for statement, rows in self._pending.items():
+                self.connection.executemany(statement, rows)
+
+        self._pending = {}
+        self._pending_rows = 0
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self) -> "SqliteExporter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,290 @@
+import io
+import os
+from typing import BinaryIO, Generator, NamedTuple, Optional, Tuple, Union
+
+from . import DecodeError, Tag, TagType, TruncatedTagError
+
+DEFAULT_WINDOW_SIZE = 64 * 1024
+DEFAULT_MAX_PAYLOAD = 16 * 1024 * 1024
+
+
+def varint_at(buffer: Union[bytes, bytearray, memoryview], position: int) -> Tuple[int, int]:
+    """
+    Decodes the variable length integer starting at `position`, returning the value and the position after it.
+    Raises IndexError if the buffer ends inside the integer
+    """
+    result = 0
+    shift = 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, position
+        shift += 7
+
+
+def iter_fields(
+    buffer: Union[bytes, memoryview]
+) -> Generator[Tuple[int, bool, Union[int, memoryview]], None, None]:
+    """
+    Walks the tags of an in-memory payload without building `Tag`s.  Yields the index, whether the tag is length
+    prefixed, and either the integer value or a zero-copy view of the payload (which can be walked in turn)
+    """
+    view = buffer if isinstance(buffer, memoryview) else memoryview(buffer)
+    position = 0
+    end = len(view)
+
+    while position < end:
+        try:
+            key, next_position = varint_at(view, position)
+            value, next_position = varint_at(view, next_position)
+        except IndexError:
+            raise TruncatedTagError(position) from None
+        position = next_position
+
+        if key & TagType.LENGTH_PREFIX:
+            if position + value > end:
+                raise TruncatedTagError(position)
+            yield key >> 3, True, view[position : position + value]
+            position += value
+        else:
+            yield key >> 3, False, value
+
+
+class TagHeader(NamedTuple):
+    offset: int  # Absolute offset of the tag in the stream
+    index: int
+    tag_type: TagType
+    header_length: int  # Bytes used by the tag, and the length for length prefixed tags
+    length: int  # Payload length, zero for varint tags
+    value: Optional[int]  # The value of varint tags
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.header_length + self.length
+
+
+class PayloadStream(io.RawIOBase):
+    """
+    Read-only view of an oversized length prefixed payload, reads are served from the underlying stream.  Only
+    valid until the next tag is read from the `ChunkedTagReader`, which skips whatever was left unread
+    """
+
+    def __init__(self, reader: "ChunkedTagReader", length: int):
+        super().__init__()
+        self.reader = reader
+        self.length = length
+        self.remaining = length
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        count = min(len(buffer), self.remaining)
+        if count == 0:
+            return 0
+
+        data = self.reader._take(count)
+        if not data:
+            # The stream ended inside the payload, an empty read would look like its end instead
+            raise TruncatedTagError(self.reader.offset)
+        buffer[: len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+    def skip_remaining(self):
+        if self.remaining:
+            self.reader._skip(self.remaining)
+            self.remaining = 0
+
+
+class ChunkedTagReader:
+    """
+    Decodes a stream of tags through a fixed size window rather than reading whole payloads, so that memory is
+    bounded by `window_size` plus `max_payload` whatever the size of the input.  Works on pipes and other
+    unseekable streams, skipped payloads are seeked over when the stream allows it.
+
+    Iterating yields `Tag`s, payloads up to `max_payload` bytes are read into memory and larger ones are yielded
+    as a `PayloadStream` to be consumed before advancing
+    """
+
+    def __init__(
+        self,
+        stream: BinaryIO,
+        window_size: int = DEFAULT_WINDOW_SIZE,
+        max_payload: int = DEFAULT_MAX_PAYLOAD,
+    ):
+        self.stream = stream
+        self.window_size = window_size
+        self.max_payload = max_payload
+        self.offset = 0
+
+        self._buffer = bytearray()
+        self._position = 0
+        self._eof = False
+        self._pending: Optional[PayloadStream] = None
+        # Seeking past the end of a file does not fail, a skip that did so shows at the next header
+        self._seeked = False
+
+        try:
+            self._seekable = stream.seekable()
+        except (AttributeError, ValueError):
+            self._seekable = False
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffer) - self._position
+
+    def _fill(self, count: int) -> bool:
+        if self.buffered >= count:
+            return True
+
+        if self._position:
+            del self._buffer[: self._position]
+            self._position = 0
+
+        while len(self._buffer) < count and not self._eof:
+            data = self.stream.read(max(self.window_size, count - len(self._buffer)))
+            if not data:
+                self._eof = True
+            else:
+                self._buffer += data
+
+        return len(self._buffer) >= count
+
+    def _take(self, count: int) -> bytes:
+        if self.buffered == 0 and count >= self.window_size:
+            # Large reads bypass the window
+            data = self.stream.read(count) or b""
+        else:
+            self._fill(min(count, self.window_size))
+            end = self._position + min(count, self.buffered)
+            data = bytes(self._buffer[self._position : end])
+            self._position = end
+
+        self.offset += len(data)
+        return data
+
+    def _skip(self, count: int):
+        buffered = min(count, self.buffered)
+        self._position += buffered
+        self.offset += buffered
+        remaining = count - buffered
+
+        if remaining and self._seekable:
+            self.stream.seek(remaining, os.SEEK_CUR)
+            self.offset += remaining
+            self._seeked = True
+            return
+
+        while remaining:
+            data = self.stream.read(min(remaining, self.window_size))
+            if not data:
+                raise TruncatedTagError(self.offset)
+            remaining -= len(data)
+            self.offset += len(data)
+
+    def _varint(self) -> Optional[Tuple[int, int]]:
+        while True:
+            try:
+                value, end = varint_at(self._buffer, self._position)
+            except IndexError:
+                if not self._fill(self.buffered + 1):
+                    return None
+                continue
+
+            size = end - self._position
+            self._position = end
+            self.offset += size
+            return value, size
+
+    def read_header(self) -> Optional[TagHeader]:
+        """
+        Reads the next tag header, leaving the payload of length prefixed tags unread.  Returns None at the end
+        of the stream and raises `TruncatedTagError` if the stream ends inside the tag, or inside a payload
+        skipped before it
+        """
+        if self._pending is not None:
+            self._pending.skip_remaining()
+            self._pending = None
+
+        start = self.offset
+        if not self._fill(1):
+            if self._seeked and self.stream.tell() > self.stream.seek(0, os.SEEK_END):
+                raise TruncatedTagError(start)
+            return None
+        self._seeked = False
+
+        key = self._varint()
+        if key is None:
+            raise TruncatedTagError(start)
+
+        encoded_tag, _ = key
+        tag_type = TagType(encoded_tag & 0b111)
+
+        value = self._varint()
+        if value is None:
+            raise TruncatedTagError(start)
+
+        if tag_type & TagType.LENGTH_PREFIX:
+            return TagHeader(
+                start, encoded_tag >> 3, tag_type, self.offset - start, value[0], None
+            )
+
+        return TagHeader(
+            start, encoded_tag >> 3, tag_type, self.offset - start, 0, value[0]
+        )
+
+    def read_payload(self, header: TagHeader) -> bytes:
+        if header.length > self.max_payload:
+            raise DecodeError(
+                f"Payload of {header.length} bytes at {header.offset} exceeds the {self.max_payload} byte budget"
+            )
+
+        chunks = []
+        remaining = header.length
+        while remaining:
+            data = self._take(remaining)
+            if not data:
+                raise TruncatedTagError(header.offset)
+            chunks.append(data)
+            remaining -= len(data)
+
+        return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+    def skip_payload(self, header: TagHeader):
+        self._skip(header.length)
+
+    def skip_to(self, offset: int):
+        """
+        Skips ahead to the absolute `offset`, e.g. to the end of a payload whose tags were walked only in part
+        """
+        self._skip(offset - self.offset)
+
+    def stream_payload(self, header: TagHeader) -> PayloadStream:
+        self._pending = PayloadStream(self, header.length)
+        return self._pending
+
+    def read_tag(self) -> Optional[Tag]:
+        header = self.read_header()
+        if header is None:
+            return None
+
+        if not header.tag_type & TagType.LENGTH_PREFIX:
+            value = header.value
+        elif header.length > self.max_payload:
+            value = self.stream_payload(header)
+        else:
+            value = self.read_payload(header)
+
+        return Tag(
+            index=header.index,
+            tag_type=header.tag_type,
+            length=header.header_length + header.length,
+            value=value,
+        )
+
+    def __iter__(self) -> Generator[Tag, None, None]:
+        while tag := self.read_tag():
+            yield tag
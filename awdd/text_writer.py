@@ -1,18 +1,46 @@
-from . import WriterBase
-from .object import *
-from io import IOBase
+from io import IOBase, StringIO
+from typing import Any
 
+from .object import DiagnosticObject, DiagnosticValue, WriterBase
+
+
+class TextWriter(WriterBase):
+    """
+    Writes decoded objects as indented `name: value` lines with nested objects in braces, enums as their labels
+    and timestamps as ISO 8601
+    """
 
-class TextWriter:
     def write_to(self, value: DiagnosticObject, stream: IOBase) -> None:
-        pass
+        stream.write(self.format(value).encode("utf-8"))
+
+    def format(self, value: DiagnosticObject) -> str:
+        output = StringIO()
+        self._write_to_internal(value, output, 0)
+        return output.getvalue()
+
+    def format_value(self, value: DiagnosticValue) -> str:
+        output = StringIO()
+        self._write_value(value, output, 0)
+        return output.getvalue()
 
-    def _write_to_internal(self, value: DiagnosticObject):
+    @staticmethod
+    def _scalar(value: DiagnosticValue) -> Any:
+        if value.is_timestamp:
+            return value.datetime.isoformat(timespec="milliseconds")
+
+        return value.typed
+
+    def _write_value(self, prop: DiagnosticValue, stream: StringIO, indent: int):
         indent_space = indent * "\t"
+        name = prop.property.name if prop.property is not None else f"{prop.index:#x}"
+
+        if isinstance(prop.value, DiagnosticObject):
+            stream.write(indent_space + name + " {\n")
+            self._write_to_internal(prop.value, stream, indent + 1)
+            stream.write(indent_space + "}\n")
+        else:
+            stream.write(f"{indent_space}{name}: {self._scalar(prop)}\n")
+
+    def _write_to_internal(self, value: DiagnosticObject, stream: StringIO, indent: int):
         for prop in value.properties:
-            if prop.property.type != PropertyType.OBJECT:
-                stream.write(f"{indent_space}{prop.property.name}: {prop.value}\n")
-            else:
-                stream.write(indent_space + prop.property.name + " {\n")
-                self.write_to(prop.value, stream, indent + 1)
-                stream.write(indent_space + "}\n")
+            self._write_value(prop, stream, indent)
@@ -0,0 +1,304 @@
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, Dict, FrozenSet, Generator, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from . import UNIX_EPOCH, DecodeError, TagType, decode_tags
+from .definition import IntegerFormat, ManifestObjectDefinition, ManifestProperty, PropertyType
+from .metadata import FileSignature, Metadata, file_signature
+from .object import DiagnosticObject
+from .stream import ChunkedTagReader, iter_fields
+
+INDEX_MAGIC = b"AWDT"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sIQQ")  # magic, version, entry count, file count
+INDEX_ENTRY = struct.Struct("<qQIII4x")  # time, offset, length, file, class
+INDEX_FILE = struct.Struct("<qQI")  # mtime, size, path length, followed by the UTF-8 path
+
+METRIC_LOGS_NAME = "metriclogs"
+METRIC_LOGS_TAG = 0x0F
+NO_METRIC = 0  # Metric id of entries without one
+DEFAULT_TIME_FIELDS = ("timestamp", "triggerTime")
+
+TimeValue = Union[int, datetime]
+
+
+class IndexEntry(NamedTuple):
+    time: int  # Epoch milliseconds
+    offset: int  # Absolute offset of the entry's payload in its file
+    length: int  # Payload length
+    file: int  # Position in the index's file table
+    metric: int  # The entry's metric id, zero when it has none
+
+
+def _milliseconds(value: TimeValue) -> int:
+    if isinstance(value, datetime):
+        return (value - UNIX_EPOCH) // timedelta(milliseconds=1)
+    return value
+
+
+def metric_logs_property(metadata: Metadata) -> ManifestProperty:
+    """
+    The root property holding the metric log entries, found by name and falling back to its usual tag
+    """
+    root = metadata.root()
+    for prop in root.properties:
+        if prop.name == METRIC_LOGS_NAME:
+            return prop
+
+    prop = root.property_for_tag(METRIC_LOGS_TAG)
+    if prop is None or not isinstance(prop.object_type, ManifestObjectDefinition):
+        raise DecodeError(f"{root.name} has no {METRIC_LOGS_NAME} property")
+    return prop
+
+
+def metric_id_tags(klass: ManifestObjectDefinition) -> FrozenSet[int]:
+    """
+    The tags of the varint fields of `klass` holding a metric id
+    """
+    return frozenset(
+        prop.index
+        for prop in klass.properties
+        if prop.integer_format == IntegerFormat.METRIC_ID
+        and prop.type != PropertyType.OBJECT
+    )
+
+
+def entry_metric(payload: bytes, metric_tags: FrozenSet[int]) -> int:
+    """
+    The metric id of an encoded metric log entry, the first of its `metric_id_tags` fields, or `NO_METRIC`
+    """
+    for index, length_prefixed, value in iter_fields(payload):
+        if not length_prefixed and index in metric_tags:
+            return value
+    return NO_METRIC
+
+
+class TimeIndexBuilder:
+    """
+    Scans logs for their metric log entries and writes a `TimeIndex`.  Only the varint fields of each entry are
+    looked at, nested payloads are skipped by their length and everything outside the entries is never read
+    into memory
+    """
+
+    metadata: Metadata
+    files: List[Tuple[str, FileSignature]]
+    entries: List[IndexEntry]
+
+    def __init__(self, metadata: Metadata, time_fields: Iterable[str] = DEFAULT_TIME_FIELDS):
+        self.metadata = metadata
+        self.metadata.resolve()
+        self.files = []
+        self.entries = []
+
+        self._property = metric_logs_property(metadata)
+        entry_class: ManifestObjectDefinition = self._property.object_type
+
+        indices = {prop.name: prop.index for prop in entry_class.properties}
+        # Earlier names in time_fields take precedence, the tag order of the entry does not matter
+        self._time_tags = {
+            indices[name]: rank for rank, name in enumerate(time_fields) if name in indices
+        }
+        self._metric_tags = metric_id_tags(entry_class)
+
+        if not self._time_tags:
+            raise DecodeError(f"{entry_class.name} has none of the fields {', '.join(time_fields)}")
+
+    def _scan_entry(self, payload: bytes) -> Optional[Tuple[int, int]]:
+        time = rank = None
+        metric = NO_METRIC
+
+        for index, length_prefixed, value in iter_fields(payload):
+            if length_prefixed:
+                continue
+            field_rank = self._time_tags.get(index)
+            if field_rank is not None and (rank is None or field_rank < rank):
+                time, rank = value, field_rank
+            elif index in self._metric_tags:
+                metric = value
+
+        if time is None:
+            return None
+        return time, metric
+
+    def add_stream(self, stream: BinaryIO, file: int) -> int:
+        """
+        Indexes the entries of one log, returning how many were added
+        """
+        reader = ChunkedTagReader(stream)
+        tag = self._property.index
+        added = 0
+
+        while (header := reader.read_header()) is not None:
+            if header.index != tag or not header.tag_type & TagType.LENGTH_PREFIX:
+                reader.skip_payload(header)
+                continue
+
+            offset = header.offset + header.header_length
+            scanned = self._scan_entry(reader.read_payload(header))
+            if scanned is not None:
+                self.entries.append(IndexEntry(scanned[0], offset, header.length, file, scanned[1]))
+                added += 1
+
+        return added
+
+    def add_file(self, path: Union[str, Path]) -> int:
+        path = os.path.abspath(path)
+        file = len(self.files)
+        self.files.append((path, file_signature(path)))
+
+        with open(path, "rb") as stream:
+            return self.add_stream(stream, file)
+
+    def write(self, path: Union[str, Path]):
+        self.entries.sort()
+
+        with open(path, "wb") as output:
+            output.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(self.entries), len(self.files)))
+            for entry in self.entries:
+                output.write(INDEX_ENTRY.pack(*entry))
+            for file, signature in self.files:
+                encoded = file.encode("utf-8")
+                output.write(INDEX_FILE.pack(signature.mtime_ns, signature.size, len(encoded)))
+                output.write(encoded)
+
+
+def build_time_index(
+    metadata: Metadata, paths: Iterable[Union[str, Path]], index_path: Union[str, Path]
+) -> "TimeIndex":
+    builder = TimeIndexBuilder(metadata)
+    for path in paths:
+        builder.add_file(path)
+    builder.write(index_path)
+    return TimeIndex(index_path)
+
+
+class _Times:
+    # A sequence view of the sorted entry times, for bisect
+    def __init__(self, index: "TimeIndex"):
+        self._index = index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __getitem__(self, position: int) -> int:
+        return struct.unpack_from("<q", self._index._map, INDEX_HEADER.size + position * INDEX_ENTRY.size)[0]
+
+
+class TimeIndex:
+    """
+    A sorted index of metric log entries across many logs, memory mapped so opening it costs nothing whatever
+    its size.  Queries binary search the times and decode only the entries that fall in the window
+    """
+
+    path: Path
+    files: List[str]
+    signatures: List[FileSignature]
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with open(self.path, "rb") as source:
+            self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < INDEX_HEADER.size:
+            self._map.close()
+            raise DecodeError(f"{path} is not a time index")
+        magic, version, self._count, file_count = INDEX_HEADER.unpack_from(self._map)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            self._map.close()
+            raise DecodeError(f"{path} is not a version {INDEX_VERSION} time index")
+
+        self.files = []
+        self.signatures = []
+        position = INDEX_HEADER.size + self._count * INDEX_ENTRY.size
+        for _ in range(file_count):
+            mtime_ns, size, length = INDEX_FILE.unpack_from(self._map, position)
+            position += INDEX_FILE.size
+            self.files.append(self._map[position : position + length].decode("utf-8"))
+            self.signatures.append(FileSignature(mtime_ns, size))
+            position += length
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self) -> "TimeIndex":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position: int) -> IndexEntry:
+        if not 0 <= position < self._count:
+            raise IndexError(position)
+        return IndexEntry._make(
+            INDEX_ENTRY.unpack_from(self._map, INDEX_HEADER.size + position * INDEX_ENTRY.size)
+        )
+
+    def stale_files(self) -> List[str]:
+        """
+        Indexed files that have since changed or disappeared
+        """
+        stale = []
+        for file, signature in zip(self.files, self.signatures):
+            try:
+                if file_signature(file) != signature:
+                    stale.append(file)
+            except FileNotFoundError:
+                stale.append(file)
+        return stale
+
+    def query(
+        self, start: TimeValue, end: TimeValue, metric: Optional[int] = None
+    ) -> Generator[IndexEntry, None, None]:
+        """
+        Entries with `start <= time < end` in time order, optionally only those of one metric
+        """
+        times = _Times(self)
+        end = _milliseconds(end)
+
+        for position in range(bisect_left(times, _milliseconds(start)), self._count):
+            entry = self[position]
+            if entry.time >= end:
+                break
+            if metric is None or entry.metric == metric:
+                yield entry
+
+    def records(
+        self,
+        metadata: Metadata,
+        start: TimeValue,
+        end: TimeValue,
+        metric: Optional[int] = None,
+    ) -> Generator[Tuple[IndexEntry, DiagnosticObject], None, None]:
+        """
+        Decodes the entries in a time window, reading each from its log by offset.  A log that changed since it
+        was indexed raises a `DecodeError` rather than yielding whatever now sits at the indexed offsets
+        """
+        metadata.resolve()
+        entry_class = metric_logs_property(metadata).object_type
+        handles: Dict[int, BinaryIO] = {}
+
+        try:
+            for entry in self.query(start, end, metric):
+                handle = handles.get(entry.file)
+                if handle is None:
+                    file = self.files[entry.file]
+                    if file_signature(file) != self.signatures[entry.file]:
+                        raise DecodeError(f"{file} changed since it was indexed")
+                    handle = handles[entry.file] = open(file, "rb")
+
+                handle.seek(entry.offset)
+                payload = handle.read(entry.length)
+                if len(payload) != entry.length:
+                    raise DecodeError(f"{self.files[entry.file]} is shorter than its index entry")
+
+                yield entry, DiagnosticObject(metadata, entry_class, decode_tags(payload))
+        finally:
+            for handle in handles.values():
+                handle.close()
@@ -0,0 +1,44 @@
+from typing import Iterable, List, Sequence
+
+from . import apple_time_to_datetime
+
+# Metric logs store time as integer milliseconds since the unix epoch, the decoder leaves them as plain integers
+# so that nothing is spent on datetime construction unless a value is rendered.  These helpers convert whole
+# columns at once when numpy is installed (`pip install awdd[numpy]`)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as error:
+        raise ImportError(
+            "numpy is required for vectorized timestamp conversion, install awdd[numpy]"
+        ) from error
+
+    return numpy
+
+
+def timestamps_to_datetime64(epoch_milliseconds: Iterable[int]) -> "numpy.ndarray":
+    numpy = _numpy()
+    return numpy.asarray(list(epoch_milliseconds), dtype="int64").astype(
+        "datetime64[ms]"
+    )
+
+
+def timestamps_to_isoformat(epoch_milliseconds: Sequence[int]) -> List[str]:
+    """
+    ISO 8601 strings (UTC, millisecond precision, no offset) for a column of timestamps, vectorized when numpy
+    is available
+    """
+    try:
+        numpy = _numpy()
+    except ImportError:
+        return [
+            apple_time_to_datetime(value).isoformat(timespec="milliseconds")
+            for value in epoch_milliseconds
+        ]
+
+    values = numpy.asarray(list(epoch_milliseconds), dtype="int64").astype(
+        "datetime64[ms]"
+    )
+    return numpy.datetime_as_string(values, unit="ms").tolist()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, islice, repeat
+from time import perf_counter
+from typing import Iterable, List, NamedTuple, Optional
+
+from awdd.daemon import DAEMON_ENVIRONMENT, READ_ERROR, DaemonClient, DaemonError, daemon_socket
+from awdd.json_writer import JsonWriter
+from awdd.manifest import EXTENSION_MANIFEST_PATH, ROOT_MANIFEST_PATH
+from awdd.metadata import Metadata
+from awdd.parser import LogParser
+from awdd.pipeline import (
+    DEFAULT_READERS,
+    READ,
+    LogItem,
+    LogPipeline,
+    LogSource,
+    bounded_map,
+    iter_sources,
+    read_source,
+    relative_name,
+)
+from awdd.registry import MetadataRegistry
+from awdd.sampling import Sampler, add_sampling_arguments, sampler_from_arguments
+from awdd.snapshot import restore_metadata
+
+# Converts metric logs to JSON, either one NDJSON stream or a .json file per log, decoding in a pool of worker
+# processes that each restore the resolved schema once, or with --daemon through a running awdd_daemon.py.  With
+# a single process reading, decoding and writing overlap as the stages of a `LogPipeline`
+
+# Exit status bits, combined when several kinds of failure happen in one run
+EXIT_OK = 0
+EXIT_DECODE_FAILED = 1
+EXIT_USAGE = 2
+EXIT_READ_FAILED = 4
+EXIT_WRITE_FAILED = 8
+
+
+class Converted(NamedTuple):
+    path: str
+    size: int
+    output: Optional[str]  # JSON text, or the file written in per-file mode
+    status: int
+    error: Optional[str]
+
+
+_parser: Optional[LogParser] = None
+_writer: Optional[JsonWriter] = None
+
+
+def initialize_worker(
+    snapshot: Optional[bytes],
+    indent: Optional[int],
+    schemas: Optional[str] = None,
+    sampler: Optional[Sampler] = None,
+):
+    """
+    Restores the resolved schema, or with `schemas` registers the manifest sets for every build so each log is
+    decoded with its own build's schema
+    """
+    global _parser, _writer
+    if schemas is not None:
+        registry = MetadataRegistry()
+        registry.add_directory(schemas)
+        _parser = LogParser(registry=registry, sampler=sampler)
+    else:
+        _parser = LogParser(restore_metadata(snapshot), sampler=sampler)
+    _writer = JsonWriter(indent)
+
+
+def convert(source: LogSource, output_directory: Optional[str]) -> Converted:
+    path = source.name
+    try:
+        data = read_source(source)
+    except OSError as error:
+        return Converted(path, 0, None, EXIT_READ_FAILED, str(error))
+
+    try:
+        result = _parser.parse(data)
+    except Exception as error:
+        return Converted(path, len(data), None, EXIT_DECODE_FAILED, f"{type(error).__name__}: {error}")
+
+    if output_directory is None:
+        return Converted(path, len(data), _writer.dumps(result, file=path), EXIT_OK, None)
+
+    return _write_output(source, len(data), _writer.dumps(result), output_directory)
+
+
+def _write_output(source: LogSource, size: int, text: str, output_directory: Optional[str]) -> Converted:
+    """
+    Writes the JSON for `source` to the same relative path below `output_directory` as the log has below the
+    directory or archive it was found in, so logs of the same name in different places do not overwrite each
+    other
+    """
+    path = source.name
+    if output_directory is None:
+        return Converted(path, size, text, EXIT_OK, None)
+
+    output = os.path.join(output_directory, relative_name(source) + ".json")
+    try:
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, "w") as stream:
+            stream.write(text)
+            stream.write("\n")
+    except OSError as error:
+        return Converted(path, size, None, EXIT_WRITE_FAILED, str(error))
+
+    return Converted(path, size, output, EXIT_OK, None)
+
+
+_clients = threading.local()
+
+
+def convert_remote(
+    socket_path: str, source: LogSource, output_directory: Optional[str], indent: Optional[int]
+) -> Converted:
+    """
+    Has a running daemon decode the file, the thin client mode
+    """
+    path = source.name
+    client = getattr(_clients, "client", None)
+    if client is None:
+        try:
+            client = _clients.client = DaemonClient(socket_path)
+        except OSError as error:
+            return Converted(path, 0, None, EXIT_DECODE_FAILED, f"Cannot connect to the daemon: {error}")
+
+    try:
+        if source.data is not None:
+            size = len(source.data)
+            text = client.decode(data=source.data)
+        else:
+            size = os.path.getsize(source.path)
+            text = client.decode(path=source.path)
+    except OSError as error:
+        return Converted(path, 0, None, EXIT_READ_FAILED, str(error))
+    except DaemonError as error:
+        # The daemon reads the file itself and says which of reading or decoding failed
+        status = EXIT_READ_FAILED if error.kind == READ_ERROR else EXIT_DECODE_FAILED
+        return Converted(path, 0, None, status, str(error))
+
+    if output_directory is None:
+        text = f'{{"file":{json.dumps(path)},"log":{text}}}'
+    elif indent is not None:
+        text = json.dumps(json.loads(text), indent=indent)
+
+    return _write_output(source, size, text, output_directory)
+
+
+def run_pipeline(sources: Iterable[LogSource], output_directory: Optional[str], output, readers: int):
+    """
+    Converts in this process, reading, decoding and rendering as pipeline stages.  Yields a `Converted` per log
+    once it is written
+    """
+
+    def render(result, source: LogSource) -> str:
+        if output_directory is None:
+            return _writer.dumps(result, file=source.name)
+        return _writer.dumps(result)
+
+    written = {}
+
+    def write(item: LogItem):
+        if output_directory is None:
+            output.write(item.output)
+            output.write("\n")
+        else:
+            written[item.sequence] = _write_output(item.source, item.size, item.output, output_directory)
+
+    for item in LogPipeline(_parser, render, write, readers=readers).run(sources):
+        if item.error is not None:
+            status = EXIT_READ_FAILED if item.stage == READ else EXIT_DECODE_FAILED
+            message = str(item.error) if item.stage == READ else f"{type(item.error).__name__}: {item.error}"
+            yield Converted(item.source.name, item.size, None, status, message)
+        elif output_directory is None:
+            yield Converted(item.source.name, item.size, None, EXIT_OK, None)
+        else:
+            yield written.pop(item.sequence)
+
+
+def resolve_snapshot(root: str, extensions: str) -> bytes:
+    metadata = Metadata(root, extensions)
+    metadata.resolve()
+    return metadata.snapshot().to_bytes()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert AWD metric logs to JSON")
+    parser.add_argument("inputs", nargs="+", help="log files, directories, tar / zip archives, globs or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON output file, stdout by default")
+    parser.add_argument(
+        "--per-file",
+        metavar="DIRECTORY",
+        help="write a .json file per log to DIRECTORY, laid out as the logs are below their input directories",
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes, one per CPU by default")
+    parser.add_argument(
+        "--readers", type=int, default=DEFAULT_READERS, help="reader threads when converting in a single process"
+    )
+    parser.add_argument("--indent", type=int, default=None, help="pretty print, per-file output only")
+    parser.add_argument("--root", default=ROOT_MANIFEST_PATH, help="root manifest")
+    parser.add_argument("--extensions", default=EXTENSION_MANIFEST_PATH, help="glob of extension manifests")
+    parser.add_argument(
+        "--schemas",
+        metavar="DIRECTORY",
+        help="manifest sets per build (DIRECTORY/<build>/AWDMetadata.bin), chosen by each log's softwareBuild",
+    )
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress or throughput on stderr")
+    parser.add_argument(
+        "--daemon",
+        metavar="SOCKET",
+        help=f"decode through a running awdd_daemon.py (${DAEMON_ENVIRONMENT} when one is listening there)",
+    )
+    add_sampling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        sampler = sampler_from_arguments(args)
+    except ValueError as error:
+        parser.error(str(error))
+    samples_entries = sampler is not None and sampler.samples_entries
+    if args.daemon and samples_entries:
+        parser.error("the daemon decodes whole logs, only --sample-files applies with --daemon")
+    schema_options = args.schemas or args.root != ROOT_MANIFEST_PATH or args.extensions != EXTENSION_MANIFEST_PATH
+    if args.daemon and schema_options:
+        parser.error("the daemon decodes with its own schemas, --root, --extensions and --schemas do not apply")
+
+    # The daemon from the environment is only a shortcut for the system schema, without it logs are decoded here
+    if args.daemon or not (samples_entries or schema_options):
+        try:
+            args.daemon = daemon_socket(args.daemon)
+        except DaemonError as error:
+            print(error, file=sys.stderr)
+            return EXIT_USAGE
+
+    # Only the first two are looked at up front, the rest are streamed so archives are never expanded whole
+    sources = iter_sources(args.inputs)
+    if sampler is not None:
+        sources = (source for source in sources if sampler.keep_file(source.name))
+    first = list(islice(sources, 2))
+    if not first:
+        print("No input files", file=sys.stderr)
+        return EXIT_USAGE
+    single_process = args.jobs == 1 or len(first) == 1
+    sources = chain(first, sources)
+
+    indent = args.indent if args.per_file else None
+    if args.per_file:
+        os.makedirs(args.per_file, exist_ok=True)
+
+    output = None
+    if args.per_file is None:
+        output = sys.stdout if args.output == "-" else open(args.output, "w")
+
+    status = EXIT_OK
+    total = 0
+    total_bytes = 0
+    converted = 0
+    start = perf_counter()
+
+    pool = None
+    try:
+        if args.daemon:
+            # The schema is already resolved in the daemon, a few threads keep its batches full
+            workers = args.jobs or 4
+            pool = ThreadPoolExecutor(workers)
+            results = bounded_map(
+                pool,
+                convert_remote,
+                repeat(args.daemon),
+                sources,
+                repeat(args.per_file),
+                repeat(indent),
+                window=workers * 4,
+            )
+        elif single_process:
+            snapshot = None if args.schemas else resolve_snapshot(args.root, args.extensions)
+            initialize_worker(snapshot, indent, args.schemas, sampler)
+            results = run_pipeline(sources, args.per_file, output, args.readers)
+        else:
+            snapshot = None if args.schemas else resolve_snapshot(args.root, args.extensions)
+            pool = ProcessPoolExecutor(
+                args.jobs, initializer=initialize_worker, initargs=(snapshot, indent, args.schemas, sampler)
+            )
+            window = (args.jobs or os.cpu_count() or 1) * 4
+            results = bounded_map(pool, convert, sources, repeat(args.per_file), window=window)
+
+        for result in results:
+            total += 1
+            total_bytes += result.size
+            status |= result.status
+
+            if result.error is not None:
+                print(f"{result.path}: {result.error}", file=sys.stderr)
+                continue
+
+            converted += 1
+            if output is not None and result.output is not None:
+                output.write(result.output)
+                output.write("\n")
+    finally:
+        if pool is not None:
+            # Whatever was still queued when the output failed is dropped rather than decoded for nothing
+            pool.shutdown(cancel_futures=True)
+        if output is not None and output is not sys.stdout:
+            output.close()
+
+    if not args.quiet:
+        elapsed = max(perf_counter() - start, 1e-9)
+        print(
+            f"{converted}/{total} files, {total_bytes / 1e6:.1f} MB in {elapsed:.2f}s "
+            f"({total / elapsed:.1f} files/s, {total_bytes / 1e6 / elapsed:.1f} MB/s)",
+            file=sys.stderr,
+        )
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+import argparse
+import sys
+
+from awdd.descriptors import DEFAULT_PACKAGE
+from awdd.metadata import Metadata
+from awdd.protoexport import export_proto
+from awdd.manifest import ROOT_MANIFEST_PATH, EXTENSION_MANIFEST_PATH
+
+# Writes the resolved manifests as .proto files and a FileDescriptorSet, so archived logs can be decoded by
+# any protobuf toolchain
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export the AWD manifests as protobuf definitions")
+    parser.add_argument("output", help="directory to write the .proto files and descriptors.pb to")
+    parser.add_argument("--package", default=DEFAULT_PACKAGE, help="protobuf package name")
+    parser.add_argument("--root", default=ROOT_MANIFEST_PATH, help="root manifest")
+    parser.add_argument("--extensions", default=EXTENSION_MANIFEST_PATH, help="glob of extension manifests")
+    parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="unsigned integers and bytes for strings, exactly as the library decodes them",
+    )
+    args = parser.parse_args(argv)
+
+    metadata = Metadata(args.root, args.extensions)
+    for path in export_proto(metadata, args.output, args.package, raw_values=args.raw):
+        print(path)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
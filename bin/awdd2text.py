@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+import argparse
+import os
+import sys
+from typing import Iterable, List, Optional
+
+from awdd.daemon import DAEMON_ENVIRONMENT, DaemonClient, DaemonError, daemon_socket
+from awdd.follow import DEFAULT_POLL_INTERVAL, LogFollower
+from awdd.manifest import EXTENSION_MANIFEST_PATH, ROOT_MANIFEST_PATH
+from awdd.metadata import Metadata
+from awdd.parser import LogParser
+from awdd.pipeline import READ, TAR_SUFFIXES, ZIP_SUFFIXES, LogItem, LogPipeline, LogSource, iter_sources
+from awdd.sampling import add_sampling_arguments, sampler_from_arguments
+from awdd.text_writer import TextWriter
+
+# Prints metric logs as indented text, or with --follow keeps printing a log's new entries as they are written.
+# With --daemon the logs are decoded by a running awdd_daemon.py rather than loading the schema here
+
+
+def print_remote(socket_path: str, sources: Iterable[LogSource], show_names: bool) -> int:
+    status = 0
+    try:
+        client = DaemonClient(socket_path)
+    except OSError as error:
+        print(f"Cannot connect to the daemon at {socket_path}: {error}", file=sys.stderr)
+        return 1
+
+    with client:
+        for source in sources:
+            try:
+                if source.data is not None:
+                    text = client.decode(data=source.data, output_format="text")
+                else:
+                    text = client.decode(path=source.path, output_format="text")
+            except DaemonError as error:
+                print(f"{source.name}: {error}", file=sys.stderr)
+                status = 1
+                continue
+
+            if show_names:
+                print(f"# {source.name}")
+            sys.stdout.write(text)
+
+    return status
+
+
+def print_logs(log_parser: LogParser, sources: Iterable[LogSource], show_names: bool) -> int:
+    writer = TextWriter()
+
+    def write(item: LogItem):
+        if show_names:
+            sys.stdout.write(f"# {item.source.name}\n")
+        sys.stdout.write(item.output)
+
+    status = 0
+    for item in LogPipeline(log_parser, lambda result, _: writer.format(result), write).run(sources):
+        if item.error is not None:
+            message = str(item.error) if item.stage == READ else f"{type(item.error).__name__}: {item.error}"
+            print(f"{item.source.name}: {message}", file=sys.stderr)
+            status = 1
+
+    return status
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Print AWD metric logs as text")
+    parser.add_argument("inputs", nargs="+", help="log files, directories, tar / zip archives or - for stdin")
+    parser.add_argument("-f", "--follow", action="store_true", help="keep printing entries appended to the log")
+    parser.add_argument(
+        "--interval", type=float, default=DEFAULT_POLL_INTERVAL, help="seconds between polls when following"
+    )
+    parser.add_argument("--root", default=ROOT_MANIFEST_PATH, help="root manifest")
+    parser.add_argument("--extensions", default=EXTENSION_MANIFEST_PATH, help="glob of extension manifests")
+    parser.add_argument(
+        "--daemon",
+        metavar="SOCKET",
+        help=f"decode through a running awdd_daemon.py (${DAEMON_ENVIRONMENT} when one is listening there)",
+    )
+    add_sampling_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.follow and len(args.inputs) != 1:
+        parser.error("--follow takes a single log")
+    try:
+        sampler = sampler_from_arguments(args)
+    except ValueError as error:
+        parser.error(str(error))
+    if sampler is not None and (args.follow or args.daemon):
+        parser.error("sampling does not apply with --follow or --daemon")
+    schema_options = args.root != ROOT_MANIFEST_PATH or args.extensions != EXTENSION_MANIFEST_PATH
+    if args.daemon and schema_options:
+        parser.error("the daemon decodes with its own schemas, --root and --extensions do not apply")
+
+    # The daemon from the environment is only a shortcut for the system schema, without it logs are decoded here
+    if args.daemon or (sampler is None and not args.follow and not schema_options):
+        try:
+            args.daemon = daemon_socket(args.daemon)
+        except DaemonError as error:
+            print(error, file=sys.stderr)
+            return 2
+
+    # Name each log unless a single file was asked for
+    single = args.inputs[0]
+    show_names = len(args.inputs) > 1 or os.path.isdir(single) or single.endswith(TAR_SUFFIXES + ZIP_SUFFIXES)
+
+    if args.daemon and not args.follow:
+        return print_remote(args.daemon, iter_sources(args.inputs), show_names)
+
+    metadata = Metadata(args.root, args.extensions)
+
+    if args.follow:
+        writer = TextWriter()
+        with LogFollower(args.inputs[0], metadata) as follower:
+            try:
+                for value in follower.follow(args.interval):
+                    sys.stdout.write(writer.format_value(value))
+                    sys.stdout.flush()
+            except KeyboardInterrupt:
+                pass
+        return 0
+
+    sources = iter_sources(args.inputs)
+    if sampler is not None:
+        sources = (source for source in sources if sampler.keep_file(source.name))
+    return print_logs(LogParser(metadata, sampler=sampler), sources, show_names)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+import argparse
+import json
+import sys
+from time import perf_counter
+from typing import List, Optional
+
+from awdd.census import scan_corpus
+from awdd.manifest import EXTENSION_MANIFEST_PATH, ROOT_MANIFEST_PATH
+from awdd.metadata import Metadata
+from awdd.pipeline import iter_sources
+
+# Counts the tags of metric logs and the bytes they take, per top level tag and per metric class, from the tag
+# headers alone.  Shows which metrics dominate storage (and so decode time) across a corpus without decoding it
+
+
+def print_rows(title: str, rows: List[dict], top: Optional[int]):
+    print(f"{title}:")
+    for row in rows[:top]:
+        print(f"{row['bytes']:>14,} {row['share']:>7.1%} {row['count']:>10,}  {row['name']}")
+    if top is not None and len(rows) > top:
+        print(f"{'':>14} {'':>7} {'':>10}  ... {len(rows) - top} more")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Count AWD metric log tags and their bytes without decoding")
+    parser.add_argument("inputs", nargs="+", help="log files, directories, tar / zip archives, globs or - for stdin")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes, one per CPU by default")
+    parser.add_argument("--top", type=int, default=None, help="only the N largest tags and metric classes")
+    parser.add_argument("--json", action="store_true", help="print the census as JSON")
+    parser.add_argument("--root", default=ROOT_MANIFEST_PATH, help="root manifest")
+    parser.add_argument("--extensions", default=EXTENSION_MANIFEST_PATH, help="glob of extension manifests")
+    args = parser.parse_args(argv)
+
+    metadata = Metadata(args.root, args.extensions)
+    inputs = [source.path if source.data is None else source.data for source in iter_sources(args.inputs)]
+
+    start = perf_counter()
+    census = scan_corpus(metadata, inputs, args.jobs)
+    elapsed = max(perf_counter() - start, 1e-9)
+    report = census.as_dict(metadata)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print(f"{census.files} files, {census.bytes:,} bytes in {elapsed:.2f}s ({census.failed} failed)")
+        print_rows("Top level tags", report["tags"], args.top)
+        print_rows("Metric classes", report["metrics"], args.top)
+
+    return 1 if census.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+import argparse
+import sys
+from typing import List, Optional
+
+from awdd.daemon import DEFAULT_MAX_BATCH, DEFAULT_SOCKET_PATH, DecodeDaemon
+from awdd.manifest import EXTENSION_MANIFEST_PATH, ROOT_MANIFEST_PATH
+from awdd.metadata import Metadata
+
+# Keeps resolved manifests warm and decodes logs for awdd2json / awdd2text --daemon, e.g.
+#
+#   awdd_daemon.py --schema ios16=ios16/AWDMetadata.bin:ios16/Metadata/*.bin --schema ios17=...
+#   AWDD_DAEMON=/tmp/awdd.sock awdd2json.py logs/
+
+
+def parse_schema(value: str):
+    name, _, paths = value.partition("=")
+    root, _, extensions = paths.partition(":")
+    if not name or not root:
+        raise argparse.ArgumentTypeError("expected NAME=ROOT_MANIFEST[:EXTENSION_GLOB]")
+    return name, root, extensions or EXTENSION_MANIFEST_PATH
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve warm AWD decoding over a Unix socket")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="socket path to listen on")
+    parser.add_argument(
+        "--schema",
+        action="append",
+        type=parse_schema,
+        default=[],
+        metavar="NAME=ROOT[:EXTENSIONS]",
+        help="a schema to keep loaded, the first is the default (the system manifests if none are given)",
+    )
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    args = parser.parse_args(argv)
+
+    schemas = args.schema or [("default", ROOT_MANIFEST_PATH, EXTENSION_MANIFEST_PATH)]
+    daemon = DecodeDaemon(
+        {name: Metadata(root, extensions) for name, root, extensions in schemas},
+        args.socket,
+        args.max_batch,
+    )
+
+    print(f"Serving {', '.join(daemon.parsers)} on {args.socket}", file=sys.stderr)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,11 @@
 #!/usr/bin/env python
-import io
+import argparse
+import hashlib
+import json
+import mmap
 import os.path
 import glob
+from concurrent.futures import ProcessPoolExecutor
 from enum import IntEnum
 from typing import *
 import struct
@@ -15,15 +19,42 @@ ROOT_MANIFEST_PATH = '/System/Library/PrivateFrameworks/WirelessDiagnostics.fram
 EXTENSION_MANIFEST_PATH = '/System/Library/AWD/Metadata/*.bin'
 
 
-def copy_io(io_from: BinaryIO, io_to: BinaryIO, count: int, buf_size=16384):
-    remaining = count
-    while remaining > 0:
-        chunk_size = min(remaining, buf_size)
-        buf = io_from.read(chunk_size)
-        if not buf:
-            break
-        io_to.write(buf)
-        remaining -= chunk_size
+def copy_region(source: int, destination: int, offset: int, count: int, source_map: Optional[mmap.mmap] = None):
+    """
+    Copies `count` bytes at `offset` between file descriptors inside the kernel where the platform allows it,
+    copy_file_range (Linux) then sendfile, falling back to writing straight out of a memory map
+    """
+    position = offset
+    end = offset + count
+
+    for kernel_copy in ("copy_file_range", "sendfile"):
+        if not hasattr(os, kernel_copy) or position >= end:
+            continue
+        try:
+            while position < end:
+                if kernel_copy == "copy_file_range":
+                    copied = os.copy_file_range(source, destination, end - position, position)
+                else:
+                    copied = os.sendfile(destination, source, position, end - position)
+                if copied == 0:
+                    break
+                position += copied
+        except OSError:
+            # Not supported between these files (e.g. across file systems on older kernels), try the next
+            continue
+
+    if position < end:
+        owned_map = source_map is None
+        if owned_map:
+            source_map = mmap.mmap(source, 0, access=mmap.ACCESS_READ)
+        try:
+            with memoryview(source_map)[position:end] as remaining:
+                written = 0
+                while written < len(remaining):
+                    written += os.write(destination, remaining[written:])
+        finally:
+            if owned_map:
+                source_map.close()
 
 
 class ManifestRegionType(IntEnum):
@@ -49,10 +80,24 @@ class ManifestRegion:
     def file_name(self):
         return f"{self.parser.file_name}_region_{self.type}.bin"
 
-    def write_out_to(self, output_dir: str):
-        with open(os.path.join(output_dir, os.path.basename(self.file_name())), "wb") as output:
-            self.parser.data.seek(self.offset, io.SEEK_SET)
-            copy_io(self.parser.data, output, self.size)
+    def write_out_to(self, output_dir: str) -> str:
+        path = os.path.join(output_dir, os.path.basename(self.file_name()))
+        with open(path, "wb") as output:
+            copy_region(self.parser.data.fileno(), output.fileno(), self.offset, self.size, self.parser.map)
+        return path
+
+    def catalog_entry(self, path: str) -> dict:
+        with memoryview(self.parser.map)[self.offset:self.offset + self.size] as content:
+            digest = hashlib.sha256(content).hexdigest()
+
+        return {
+            "manifest": self.parser.file_name,
+            "region": self.type.name,
+            "offset": self.offset,
+            "size": self.size,
+            "sha256": digest,
+            "path": path,
+        }
 
 
 class ManifestTable(ManifestRegion):
@@ -67,6 +112,12 @@ class ManifestTable(ManifestRegion):
     def file_name(self):
         return f"{self.parser.file_name}_region_{self.type}_tag_{self.tag}.bin"
 
+    def catalog_entry(self, path: str) -> dict:
+        entry = super().catalog_entry(path)
+        entry["tag"] = self.tag
+        entry["checksum"] = self.checksum
+        return entry
+
 
 class ManifestParser:
     MANIFEST_MAGIC = b'AWDM'
@@ -80,6 +131,7 @@ class ManifestParser:
     major: int
     minor: int
     data: BinaryIO
+    map: mmap.mmap
     regions: List[ManifestRegion]
 
     def __init__(self, path: str):
@@ -88,8 +140,13 @@ class ManifestParser:
 
         self.file_name = path
         self.data = open(self.file_name, "rb")
+        self.map = mmap.mmap(self.data.fileno(), 0, access=mmap.ACCESS_READ)
         self.regions = []
 
+    def close(self):
+        self.map.close()
+        self.data.close()
+
     def parse(self):
         magic, self.major, self.minor = struct.unpack(ManifestParser.HEADER_STRUCT,
                                                       self.data.read(struct.calcsize(ManifestParser.HEADER_STRUCT)))
@@ -136,16 +193,49 @@ class ManifestParser:
             self.regions.append(single_region)
 
 
-if len(sys.argv) != 2:
-    print("Usage: awdm2components.py OUTPUT_DIRECTORY")
-    exit(-1)
-
-
-# If we are called with no arguments, substitute root and all extension manifests
-files = [ROOT_MANIFEST_PATH] + glob.glob(EXTENSION_MANIFEST_PATH)
-for file in files:
-    manifest = ManifestParser(file)
-    manifest.parse()
-
-    for region in manifest.regions:
-        region.write_out_to(sys.argv[1])
+def extract_manifest(path: str, output_dir: str) -> List[dict]:
+    """
+    Writes out every region of one manifest, returning their catalog entries.  Runs in a worker process
+    """
+    manifest = ManifestParser(path)
+    try:
+        manifest.parse()
+        for region in manifest.regions:
+            if region.offset + region.size > len(manifest.map):
+                raise Exception(f"Region {region.type.name} of {path} runs past the end of the file")
+
+        return [region.catalog_entry(region.write_out_to(output_dir)) for region in manifest.regions]
+    finally:
+        manifest.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Split AWD manifests into their regions")
+    parser.add_argument("output", metavar="OUTPUT_DIRECTORY")
+    parser.add_argument("manifests", nargs="*", help="manifests to split, the system ones by default")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes, one per CPU by default")
+    parser.add_argument("--catalog", default=None, help="where to write the JSON catalog (OUTPUT/catalog.json)")
+    args = parser.parse_args(argv)
+
+    # If we are called with no manifests, substitute root and all extension manifests
+    files = args.manifests or [ROOT_MANIFEST_PATH] + sorted(glob.glob(EXTENSION_MANIFEST_PATH))
+    os.makedirs(args.output, exist_ok=True)
+
+    catalog = []
+    if args.jobs == 1 or len(files) == 1:
+        for file in files:
+            catalog.extend(extract_manifest(file, args.output))
+    else:
+        with ProcessPoolExecutor(args.jobs) as pool:
+            for entries in pool.map(extract_manifest, files, [args.output] * len(files)):
+                catalog.extend(entries)
+
+    catalog_path = args.catalog or os.path.join(args.output, "catalog.json")
+    with open(catalog_path, "w") as output:
+        json.dump(catalog, output, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,7 @@ from typing import *
 from glob import glob
 from pathlib import *
 import os
+import struct
 
 
 def for_each_log_file(function: Callable[[str, BinaryIO], None]) -> None:
@@ -15,3 +16,202 @@ def for_each_log_file(function: Callable[[str, BinaryIO], None]) -> None:
 
         with open(file, "rb") as stream:
             function(file, stream)
+
+
+# Synthetic manifests and logs, so that the decoder can be exercised without the
+# metadata from an iDevice root FS
+
+Field = Tuple[int, Union[int, bytes, str, "Message"]]
+Message = List[Field]
+
+SYNTHETIC_EXTENSION_CATEGORY = 0x2A
+SYNTHETIC_METRIC_ID = SYNTHETIC_EXTENSION_CATEGORY << 16
+
+
+def encode_varint(value: int) -> bytes:
+    result = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            result.append(byte | 0x80)
+        else:
+            result.append(byte)
+            return bytes(result)
+
+
+def encode_message(fields: Message) -> bytes:
+    result = bytearray()
+    for index, value in fields:
+        if isinstance(value, list):
+            value = encode_message(value)
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+
+        if isinstance(value, bytes):
+            result += encode_varint(index << 3 | 0b010)
+            result += encode_varint(len(value))
+            result += value
+        else:
+            result += encode_varint(index << 3)
+            result += encode_varint(value)
+
+    return bytes(result)
+
+
+def define_property(index: int, kind: int, name: str, **options: int) -> Field:
+    tags = {
+        "flags": 0x03,
+        "string_format": 0x06,
+        "object_type": 0x07,
+        "enum_type": 0x08,
+        "integer_format": 0x09,
+        "extension_tag": 0x0B,
+        "extension_scope": 0x0C,
+    }
+    fields = [(0x01, index), (0x02, kind), (0x04, name)]
+    fields += [(tags[option], value) for option, value in options.items()]
+    return 0x02, fields
+
+
+def define_object(name: str, *properties: Field) -> Field:
+    return 0x01, [(0x01, name), *properties]
+
+
+def define_enum(name: str, **members: int) -> Field:
+    return 0x02, [(0x01, name)] + [
+        (0x02, [(0x01, label), (0x02, value)]) for label, value in members.items()
+    ]
+
+
+def write_manifest(
+    path: str,
+    tables: Dict[int, Message],
+    is_root: bool = False,
+    identity: Tuple[str, str, int] = ("00" * 20, "synthetic", 1660000000000),
+    types: Message = (),
+) -> None:
+    regions = [
+        (0x03, tag, encode_message(definitions))
+        for tag, definitions in tables.items()
+    ]
+    git_hash, name, timestamp = identity
+    regions.append((0x04, None, encode_message([(1, git_hash), (2, name), (3, timestamp)])))
+    if is_root:
+        regions.append((0x05, None, encode_message(list(types))))
+
+    header = struct.pack(b"4sHHI", b"AWDM", 1, 1, 0 if is_root else 1)
+    header_size = len(header) + 4
+    for kind, tag, _ in regions:
+        header_size += 4 + (16 if tag is not None else 8)
+
+    offset = header_size
+    body = b""
+    for kind, tag, data in regions:
+        if tag is not None:
+            header += struct.pack(b"HH", kind, 4)
+            header += struct.pack(b"IIII", tag, offset, len(data), 0)
+        else:
+            header += struct.pack(b"HH", kind, 2)
+            header += struct.pack(b"II", offset, len(data))
+        offset += len(data)
+        body += data
+
+    with open(path, "wb") as output:
+        output.write(header + struct.pack(b"HH", 0, 0) + body)
+
+
+def write_synthetic_manifests(
+    directory: str,
+    wifi_name: str = "WifiStats",
+    extension_hash: str = "00" * 20,
+    root_hash: str = "00" * 20,
+) -> Tuple[str, str]:
+    """
+    Writes a root manifest describing a log with a header and repeated metric log entries, plus an extension
+    manifest that plugs a WiFi metric into each metric log entry.  Returns the root path and extension glob
+    """
+    root = [
+        define_object(
+            "Log",
+            define_property(0x01, 0x07, "timestamp", integer_format=0x01),
+            define_property(0x02, 0x1B, "header", object_type=0x01),
+            define_property(0x0F, 0x1B, "metriclogs", object_type=0x02, flags=0x01),
+        ),
+        define_object(
+            "Header",
+            define_property(0x01, 0x0D, "softwareBuild"),
+            define_property(0x02, 0x0B, "deviceType", enum_type=0x00),
+        ),
+        define_object(
+            "MetricLog",
+            define_property(0x01, 0x07, "timestamp", integer_format=0x01),
+            define_property(0x02, 0x07, "triggerTime", integer_format=0x01),
+            define_property(0x03, 0x07, "metricId", integer_format=0x02),
+            define_property(0x04, 0x1B, "sample", object_type=0x03),
+        ),
+        define_object(
+            "Sample",
+            define_property(0x01, 0x04, "count"),
+            define_property(0x02, 0x0B, "state", enum_type=0x01),
+            define_property(0x03, 0x0D, "name"),
+            define_property(0x04, 0x04, "values", flags=0x01),
+        ),
+        define_enum("DeviceType", phone=1, watch=2),
+        define_enum("StateFlags", none=0, active=1, charging=2, docked=4),
+    ]
+
+    extension = [
+        define_object(
+            wifi_name,
+            define_property(0x01, 0x04, "rssi"),
+            define_property(0x02, 0x0D, "ssid"),
+        ),
+        define_object(
+            "WifiExtensions",
+            define_property(
+                SYNTHETIC_METRIC_ID,
+                0x1B,
+                "wifiStats",
+                object_type=0x00,
+                extension_tag=0x02,
+                extension_scope=0x02,
+            ),
+        ),
+    ]
+
+    root_path = os.path.join(directory, "AWDMetadata.bin")
+    extension_directory = os.path.join(directory, "Metadata")
+    os.makedirs(extension_directory, exist_ok=True)
+
+    write_manifest(
+        root_path, {0x00: root}, is_root=True, identity=(root_hash, "root", 1660000000000)
+    )
+    write_manifest(
+        os.path.join(extension_directory, "wifi.bin"),
+        {SYNTHETIC_EXTENSION_CATEGORY: extension},
+        identity=(extension_hash, "wifi", 1660000000000),
+    )
+
+    return root_path, os.path.join(extension_directory, "*.bin")
+
+
+def synthetic_metric_log(
+    timestamp: int, rssi: int = -40, state: int = 3, values: Sequence[int] = (1, 2)
+) -> Field:
+    return 0x0F, [
+        (0x01, timestamp),
+        (0x02, timestamp + 5),
+        (0x03, SYNTHETIC_METRIC_ID),
+        (0x04, [(0x01, 5), (0x02, state), (0x03, "sample")] + [(0x04, v) for v in values]),
+        (SYNTHETIC_METRIC_ID, [(0x01, rssi & 0xFFFF_FFFF_FFFF_FFFF), (0x02, "network")]),
+    ]
+
+
+def synthetic_log(
+    timestamps: Sequence[int] = (1660000000000, 1660000060000), build: str = "20A362"
+) -> bytes:
+    return encode_message(
+        [(0x01, timestamps[0]), (0x02, [(0x01, build), (0x02, 1)])]
+        + [synthetic_metric_log(timestamp) for timestamp in timestamps]
+    )
@@ -1,2 +1,28 @@
-from awdd.manifest import *
+from awdd.census import Census, CensusScanner
+from awdd.metadata import Metadata
 
+from . import for_each_log_file
+
+# Prints a census of the log fixtures against the manifests of this machine, run with
+# `python -m tests.collect_all_tags`
+
+
+def main():
+    metadata = Metadata()
+    scanner = CensusScanner(metadata)
+    census = Census()
+
+    def collect(filename, stream):
+        scanner.scan(stream, census)
+
+    for_each_log_file(collect)
+
+    report = census.as_dict(metadata)
+    for title in ("tags", "metrics"):
+        print(f"\n{title}:")
+        for row in report[title]:
+            print(f"\t{row['name']}: {row['count']} x, {row['bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main()
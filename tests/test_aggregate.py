@@ -0,0 +1,89 @@
+import io
+import pickle
+
+from awdd.aggregate import OTHER_CATEGORY, Aggregation, Aggregator, CategoricalSummary
+from awdd.metadata import Metadata
+from tests import synthetic_log, write_synthetic_manifests
+
+
+def test_aggregate_synthetic_log(tmp_path):
+    aggregator = Aggregator(Metadata(*write_synthetic_manifests(str(tmp_path))))
+    result = aggregator.feed(synthetic_log())
+
+    assert result.records == {
+        "Log": 1,
+        "Header": 1,
+        "MetricLog": 2,
+        "Sample": 2,
+        "WifiStats": 2,
+    }
+
+    timestamps = result["MetricLog", "timestamp"]
+    assert (timestamps.count, timestamps.minimum, timestamps.maximum) == (
+        2,
+        1660000000000,
+        1660000060000,
+    )
+    assert timestamps.histogram is None
+
+    values = result["Sample", "values"]
+    assert (values.count, values.total, values.mean) == (4, 6, 1.5)
+    assert values.histogram == {1: 2, 2: 2}
+
+    assert result["Sample", "state"].counts == {"active|charging": 2}
+    assert result["Header", "deviceType"].counts == {"phone": 1}
+    assert result["WifiStats", "ssid"].counts == {"network": 2}
+    assert result.unknown_tags == 0
+
+
+def test_aggregate_stream_matches_bytes(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    data = synthetic_log()
+
+    from_bytes = Aggregator(metadata).feed(data)
+    from_stream = Aggregator(metadata).feed(io.BytesIO(data), window_size=8)
+    assert from_stream.as_dict() == from_bytes.as_dict()
+
+    skipped = Aggregator(metadata).feed(io.BytesIO(data), window_size=8, max_payload=16)
+    assert skipped.skipped_payloads == 2
+    assert "MetricLog" not in skipped.records
+
+
+def test_merged_aggregations_match_single_pass(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    first = synthetic_log((1, 2), build="A")
+    second = synthetic_log((3,), build="B")
+
+    combined = Aggregator(metadata)
+    combined.feed(first)
+    combined.feed(second)
+
+    partial = [Aggregator(metadata).feed(data) for data in (first, second)]
+    merged = Aggregation()
+    for aggregation in partial:
+        merged.merge(pickle.loads(pickle.dumps(aggregation)))
+
+    assert merged.as_dict() == combined.aggregation.as_dict()
+    assert merged["Header", "softwareBuild"].counts == {"A": 1, "B": 1}
+
+
+def test_categorical_summary_is_bounded():
+    summary = CategoricalSummary(limit=2)
+    for value in ["a", "b", "c", "a", "d"]:
+        summary.add(value)
+
+    assert summary.counts == {"a": 2, "b": 1, OTHER_CATEGORY: 2}
+    assert summary.count == 5
+
+
+def test_unnamed_classes_and_fields_sort_last():
+    aggregation = Aggregation()
+    aggregation.records.update({None: 1, "b": 2, "a": 3})
+    for key in [("b", None), (None, "x"), ("b", "y"), ("a", "z")]:
+        aggregation.fields[key] = CategoricalSummary()
+
+    result = aggregation.as_dict()
+
+    assert list(result) == ["a", "b", None]
+    assert list(result["b"]["fields"]) == ["y", None]
+    assert list(result[None]["fields"]) == ["x"]
@@ -0,0 +1,108 @@
+import hashlib
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from tests import write_synthetic_manifests
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+SCRIPT = os.path.join(PROJECT, "bin", "awdm2components.py")
+
+
+@pytest.fixture(scope="module")
+def components():
+    spec = importlib.util.spec_from_file_location("awdm2components", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def failing(*args):
+    raise OSError("not supported")
+
+
+@pytest.mark.parametrize(
+    "broken",
+    [(), ("copy_file_range",), ("copy_file_range", "sendfile")],
+    ids=["kernel", "sendfile", "mmap"],
+)
+def test_copy_region_fallback_chain(components, monkeypatch, tmp_path, broken):
+    data = bytes(range(256)) * 64
+    source = tmp_path / "source.bin"
+    source.write_bytes(data)
+    calls = []
+
+    for name in ("copy_file_range", "sendfile"):
+        if not hasattr(os, name):
+            continue
+        original = getattr(os, name)
+
+        def copy(*args, name=name, original=original):
+            calls.append(name)
+            return failing() if name in broken else original(*args)
+
+        monkeypatch.setattr(os, name, copy)
+
+    with open(source, "rb") as input, open(tmp_path / "region.bin", "wb") as output:
+        components.copy_region(input.fileno(), output.fileno(), 1000, 10000)
+
+    assert (tmp_path / "region.bin").read_bytes() == data[1000:11000]
+    # Each copy is tried once before falling back to the next, none after one succeeded
+    expected = [name for name in ("copy_file_range", "sendfile") if hasattr(os, name)][: len(broken) + 1]
+    assert list(dict.fromkeys(calls)) == expected
+
+
+def test_copy_region_without_kernel_copies(components, monkeypatch, tmp_path):
+    data = os.urandom(5000)
+    (tmp_path / "source.bin").write_bytes(data)
+    for name in ("copy_file_range", "sendfile"):
+        monkeypatch.delattr(os, name, raising=False)
+
+    with open(tmp_path / "source.bin", "rb") as input, open(tmp_path / "region.bin", "wb") as output:
+        components.copy_region(input.fileno(), output.fileno(), 17, 4000)
+
+    assert (tmp_path / "region.bin").read_bytes() == data[17:4017]
+
+
+def test_catalog_describes_every_region(components, tmp_path):
+    root, extensions = write_synthetic_manifests(str(tmp_path / "manifests"))
+    extension = os.path.join(os.path.dirname(extensions), "wifi.bin")
+    output = tmp_path / "out"
+
+    assert components.main([str(output), root, extension, "--jobs", "1"]) == 0
+    catalog = json.loads((output / "catalog.json").read_text())
+
+    assert [entry["manifest"] for entry in catalog].count(root) == 3  # Structure table, identity and root
+    assert {entry["region"] for entry in catalog} == {"display", "identity", "root"}
+    for entry in catalog:
+        with open(entry["manifest"], "rb") as manifest:
+            manifest.seek(entry["offset"])
+            content = manifest.read(entry["size"])
+        with open(entry["path"], "rb") as region:
+            assert region.read() == content
+        assert entry["sha256"] == hashlib.sha256(content).hexdigest()
+        assert ("tag" in entry) == (entry["region"] == "display")
+
+
+def test_process_pool_matches_sequential(tmp_path):
+    root, extensions = write_synthetic_manifests(str(tmp_path / "manifests"))
+    manifests = [root, os.path.join(os.path.dirname(extensions), "wifi.bin")]
+
+    catalogs = []
+    for jobs in ("1", "2"):
+        output = tmp_path / f"jobs{jobs}"
+        result = subprocess.run(
+            [sys.executable, SCRIPT, str(output), *manifests, "--jobs", jobs], capture_output=True, text=True
+        )
+        assert result.returncode == 0, result.stderr
+        catalog = json.loads((output / "catalog.json").read_text())
+        for entry in catalog:
+            assert os.path.dirname(entry.pop("path")) == str(output)
+        catalogs.append(catalog)
+
+    assert catalogs[0] == catalogs[1]
+    assert len(catalogs[0]) == 5
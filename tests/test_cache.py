@@ -0,0 +1,65 @@
+import io
+
+from awdd.cache import DecodeCache
+from awdd.metadata import Metadata
+from awdd.parser import LogParser
+from tests import synthetic_log, write_synthetic_manifests
+
+
+def test_cached_parse_matches_decode(tmp_path):
+    cache = DecodeCache(tmp_path / "cache")
+    parser = LogParser(Metadata(*write_synthetic_manifests(str(tmp_path))), cache=cache)
+    data = synthetic_log()
+
+    first = parser.parse(io.BytesIO(data))
+    second = parser.parse(data)
+
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert second == first
+    assert second.properties[2].value.properties[3].value.properties[1].label == (
+        "active|charging"
+    )
+
+
+def test_cache_key_includes_metadata(tmp_path):
+    cache = DecodeCache(tmp_path / "cache")
+    data = synthetic_log()
+    parser = LogParser(
+        Metadata(*write_synthetic_manifests(str(tmp_path / "a"))), cache=cache
+    )
+    renamed = LogParser(
+        Metadata(*write_synthetic_manifests(str(tmp_path / "b"), "WifiStatsV2")),
+        cache=cache,
+    )
+
+    parser.parse(data)
+    result = renamed.parse(data)
+
+    assert cache.misses == 2
+    wifi = result.properties[2].value.properties[-1].value
+    assert wifi.object_class.name == "WifiStatsV2"
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = DecodeCache(tmp_path, max_bytes=200)
+    tree = [(1, b"x" * 40), (2, list(range(10)))]
+
+    for key in ["a", "b", "c"]:
+        cache.put(key, tree)
+        cache.get("a")
+
+    assert cache.get("a") == tree
+    assert cache.get("b") is None
+    assert sum(path.stat().st_size for path in tmp_path.iterdir()) <= 200
+
+
+def test_cache_size_counts_rewritten_entries_once(tmp_path):
+    cache = DecodeCache(tmp_path, max_bytes=10**6)
+    tree = [(1, b"x" * 40), (2, list(range(10)))]
+
+    cache.put("a", tree)
+    cache.put("b", tree)
+    for _ in range(5):
+        cache.put("a", tree)
+
+    assert cache._size == sum(path.stat().st_size for path in tmp_path.iterdir())
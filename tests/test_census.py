@@ -0,0 +1,102 @@
+import io
+import os
+import pickle
+import subprocess
+import sys
+
+from awdd.census import OVERSIZED, Census, CensusScanner, scan_corpus
+from awdd.metadata import Metadata
+from tests import SYNTHETIC_METRIC_ID, encode_message, synthetic_log, synthetic_metric_log, write_synthetic_manifests
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def test_census_counts_tags_and_metric_bytes(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    log = synthetic_log(timestamps=(1660000000000, 1660000060000, 1660000120000))
+    index, fields = synthetic_metric_log(1660000180000)
+    unknown = encode_message([(index, [(tag, 0x7F0001 if tag == 0x03 else value) for tag, value in fields])])
+
+    census = CensusScanner(metadata).scan(log + unknown)
+    report = census.as_dict(metadata)
+
+    assert census.bytes == len(log + unknown)
+    assert sum(row["bytes"] for row in report["tags"]) == census.bytes
+    assert [(row["name"], row["count"]) for row in report["tags"]] == [
+        ("metriclogs", 4),
+        ("header", 1),
+        ("timestamp", 1),
+    ]
+    assert [(row["name"], row["metric"], row["count"]) for row in report["metrics"]] == [
+        ("WifiStats", SYNTHETIC_METRIC_ID, 3),
+        ("0x7f0001", 0x7F0001, 1),
+    ]
+    assert report["metrics"][1]["bytes"] == len(unknown)
+
+
+def test_oversized_entries_get_their_own_key(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    log = synthetic_log()
+    # An entry without a metric id, small enough to be read
+    bare = encode_message([(0x0F, [(0x01, 1660000000000)])])
+
+    census = CensusScanner(metadata, max_payload=20).scan(log + bare)
+    report = census.as_dict(metadata)
+
+    assert census.skipped_entries == 2
+    assert [(row["name"], row["metric"], row["count"]) for row in report["metrics"]] == [
+        ("<oversized>", OVERSIZED, 2),
+        ("<none>", 0, 1),
+    ]
+
+
+def test_scan_corpus_merges_in_parallel(tmp_path):
+    root, extensions = write_synthetic_manifests(str(tmp_path / "manifests"))
+    metadata = Metadata(root, extensions)
+    paths = []
+    for number in range(6):
+        path = tmp_path / f"{number}.metriclog"
+        path.write_bytes(synthetic_log(build=f"B{number}"))
+        paths.append(str(path))
+    (tmp_path / "broken.metriclog").write_bytes(synthetic_log()[:-3])
+
+    sequential = scan_corpus(metadata, paths, jobs=1)
+    parallel = scan_corpus(metadata, paths + [str(tmp_path / "broken.metriclog")], jobs=3)
+
+    # The broken log is counted up to its cut short last entry
+    assert (parallel.files, parallel.failed) == (7, 1)
+    assert parallel.as_dict(metadata)["metrics"][0]["count"] == sequential.metrics[SYNTHETIC_METRIC_ID].count + 1
+    assert pickle.loads(pickle.dumps(sequential)).as_dict(metadata) == sequential.as_dict(metadata)
+    assert Census().merge(sequential).as_dict() == sequential.as_dict()
+
+    result = subprocess.run(
+        [sys.executable, os.path.join(PROJECT, "bin", "awdd_census.py"), "--root", root, "--extensions", extensions]
+        + paths,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": PROJECT},
+    )
+    assert result.returncode == 0
+    assert "WifiStats" in result.stdout and "metriclogs" in result.stdout
+
+
+def test_entries_are_read_only_up_to_their_metric_id(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    index, fields = synthetic_metric_log(1660000000000)
+    large = encode_message([(index, fields + [(0x7F, bytes(1 << 20))])])
+    read = []
+
+    class Counting(io.BytesIO):
+        def read(self, size=-1):
+            data = super().read(size)
+            read.append(len(data))
+            return data
+
+    census = CensusScanner(metadata, window_size=4096).scan(Counting(synthetic_log() + large))
+
+    assert census.metrics[SYNTHETIC_METRIC_ID].count == CensusScanner(metadata).scan(synthetic_log()).metrics[
+        SYNTHETIC_METRIC_ID
+    ].count + 1
+    assert census.bytes == len(synthetic_log() + large)
+    # Only the window holding the start of the entry, the blob after the metric id is seeked over
+    assert sum(read) <= 2 * 4096
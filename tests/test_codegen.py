@@ -0,0 +1,144 @@
+import pytest
+
+from awdd import TruncatedTagError
+from awdd.codegen import DecodedObject, identifier
+from awdd.metadata import Metadata
+from awdd.object import DiagnosticObject
+from awdd.parser import LogParser
+from tests import (
+    SYNTHETIC_METRIC_ID,
+    define_object,
+    define_property,
+    encode_message,
+    synthetic_log,
+    write_manifest,
+    write_synthetic_manifests,
+)
+
+
+def as_plain(value):
+    # The generic decode as nested dicts keyed by field name, to compare with the generated classes
+    result = {}
+    for prop in value.object_class.properties:
+        result[prop.name] = [] if prop.flags else None
+    for item in value.properties:
+        name = item.property.name
+        converted = as_plain(item.value) if isinstance(item.value, DiagnosticObject) else item.typed
+        if isinstance(result[name], list):
+            result[name].append(converted)
+        else:
+            result[name] = converted
+    return result
+
+
+def test_generated_decoders_match_generic_decode(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    data = synthetic_log()
+
+    decoded = metadata.decoders().decode(data)
+
+    assert isinstance(decoded, DecodedObject)
+    assert type(decoded).__name__ == "Log"
+    assert not hasattr(decoded, "__dict__")
+    assert decoded.as_dict() == as_plain(LogParser(metadata).parse(data))
+    assert decoded.metriclogs[0].wifiStats.ssid == "network"
+
+
+def test_generated_decoders_convert_values(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    sample = [(0x01, -3 & (1 << 64) - 1), (0x02, 3), (0x03, "s\xe9ance".encode("utf-8") + b"\xff")]
+    data = encode_message(
+        [(0x02, [(0x01, "20A362"), (0x02, 2)]), (0x0F, [(0x03, SYNTHETIC_METRIC_ID), (0x04, sample)])]
+    )
+
+    decoded = metadata.decoders().decode(data)
+
+    assert decoded.header.deviceType == "watch"
+    assert decoded.header.softwareBuild == "20A362"
+    converted = decoded.metriclogs[0].sample
+    assert (converted.count, converted.state, converted.name) == (-3, "active|charging", "s\xe9ance\ufffd")
+    assert decoded.as_dict() == as_plain(LogParser(metadata).parse(data))
+
+
+def test_decoders_are_cached_by_identity(tmp_path):
+    first = Metadata(*write_synthetic_manifests(str(tmp_path / "a")))
+    second = Metadata(*write_synthetic_manifests(str(tmp_path / "b")))
+    renamed = Metadata(*write_synthetic_manifests(str(tmp_path / "c"), "WifiStatsV2"))
+
+    assert first.decoders() is second.decoders()
+    assert renamed.decoders() is not first.decoders()
+
+    header = second.root().properties[1].object_type
+    assert second.decoders().decode_object(header, b"\x0a\x02ab\x10\x02").as_dict() == {
+        "softwareBuild": "ab",
+        "deviceType": "watch",
+    }
+
+
+def test_unknown_and_truncated_tags(tmp_path):
+    decoders = Metadata(*write_synthetic_manifests(str(tmp_path))).decoders()
+
+    decoded = decoders.decode(encode_message([(0x01, 10), (0x30, 7), (0x31, "x")]))
+    assert decoded.timestamp == 10
+    assert decoded._unknown == [(0x30, 7), (0x31, b"x")]
+
+    with pytest.raises(TruncatedTagError):
+        decoders.decode(synthetic_log()[:-3])
+
+
+def test_identifier():
+    assert identifier("metric-logs", "f") == "metric_logs"
+    assert identifier("class", "f") == "f_class"
+    assert identifier("2g", "f") == "f_2g"
+    assert identifier(None, "field_1") == "field_1"
+    assert identifier("a\u00b2", "f") == "a2"
+    assert identifier("\u00b2", "f") == "f_2"
+    assert identifier("_private", "f") == "f__private"
+    for name in ("a\u00b2", "x\u2044y", "\u2167", "caf\u00e9"):
+        assert identifier(name, "f").isidentifier()
+
+
+def test_names_cannot_shadow_the_generated_module(tmp_path):
+    # Classes and fields named like the module's helpers and the base class attributes
+    names = ["new", "unknown", "varint_at", "definitions", "DecodedObject", "TruncatedTagError", "decode_Log"]
+    root = [
+        define_object(
+            "Log",
+            define_property(0x01, 0x04, "definition"),
+            define_property(0x02, 0x04, "as_dict"),
+            define_property(0x03, 0x1B, "other", object_type=0x01),
+        ),
+        define_object(names[0], *[define_property(number + 1, 0x04, name) for number, name in enumerate(names)]),
+    ] + [define_object(name) for name in names[1:]]
+    path = str(tmp_path / "AWDMetadata.bin")
+    write_manifest(path, {0x00: root}, is_root=True)
+    metadata = Metadata(path, str(tmp_path / "none" / "*.bin"))
+
+    decoded = metadata.decoders().decode(encode_message([(0x01, 1), (0x02, 2), (0x03, [(0x01, 3), (0x07, 4)])]))
+
+    assert type(decoded).definition is metadata.root()
+    assert decoded.as_dict() == {
+        "definition_1": 1,
+        "as_dict_2": 2,
+        "other": {**{name: None for name in names[:6]}, "new": 3, "decode_Log": 4},
+    }
+
+
+def test_classes_named_like_builtins_and_locals(tmp_path):
+    names = ["str", "value", "result", "data", "position", "end", "key", "index", "payload_end"]
+    root = [
+        define_object(
+            "Log",
+            define_property(0x01, 0x0D, "name"),
+            *[define_property(number + 2, 0x1B, name, object_type=number + 1) for number, name in enumerate(names)],
+        )
+    ] + [define_object(name, define_property(0x01, 0x0D, "text")) for name in names]
+    path = str(tmp_path / "AWDMetadata.bin")
+    write_manifest(path, {0x00: root}, is_root=True)
+    metadata = Metadata(path, str(tmp_path / "none" / "*.bin"))
+    data = encode_message([(0x01, "log")] + [(number + 2, [(0x01, name)]) for number, name in enumerate(names)])
+
+    decoded = metadata.decoders().decode(data)
+
+    assert sorted(metadata.decoders().classes) == sorted(["Log"] + names)
+    assert decoded.as_dict() == {"name": "log", **{name: {"text": name} for name in names}}
@@ -0,0 +1,146 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from awdd.daemon import DECODE_ERROR, READ_ERROR, DaemonClient, DaemonError, DecodeDaemon
+from awdd.metadata import Metadata
+from tests import synthetic_log, write_synthetic_manifests
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    schemas = {
+        "first": Metadata(*write_synthetic_manifests(str(tmp_path / "first"))),
+        "second": Metadata(*write_synthetic_manifests(str(tmp_path / "second"), wifi_name="RadioStats")),
+    }
+    with DecodeDaemon(schemas, str(tmp_path / "awdd.sock")) as running:
+        yield running
+
+
+def test_daemon_decodes_bytes_and_paths(daemon, tmp_path):
+    path = tmp_path / "one.metriclog"
+    path.write_bytes(synthetic_log(build="20A362"))
+
+    with DaemonClient(daemon.socket_path) as client:
+        assert client.ping() == ["first", "second"]
+
+        document = json.loads(client.decode(synthetic_log(build="20B82")))
+        assert document["header"]["softwareBuild"] == "20B82"
+        assert json.loads(client.decode(path=str(path)))["header"]["softwareBuild"] == "20A362"
+
+        text = client.decode(path=str(path), output_format="text", schema="second")
+        assert "softwareBuild: 20A362" in text
+        assert "wifiStats {" in text
+
+        with pytest.raises(DaemonError, match="Unknown schema"):
+            client.decode(synthetic_log(), schema="missing")
+        with pytest.raises(DaemonError, match="FileNotFoundError") as missing:
+            client.decode(path=str(tmp_path / "missing.metriclog"))
+        assert missing.value.kind == READ_ERROR
+        with pytest.raises(DaemonError) as broken:
+            client.decode(synthetic_log() + b"\x80")
+        assert broken.value.kind == DECODE_ERROR
+
+        # The connection is still usable after errors
+        assert client.statistics()["requests"] == 6
+
+
+def test_daemon_batches_concurrent_requests(daemon):
+    def decode(build):
+        with DaemonClient(daemon.socket_path) as client:
+            return json.loads(client.decode(synthetic_log(build=build)))["header"]["softwareBuild"]
+
+    builds = [f"B{number}" for number in range(32)]
+    with ThreadPoolExecutor(16) as pool:
+        assert list(pool.map(decode, builds)) == builds
+
+    assert daemon.requests == 32
+    assert daemon.batches < 32
+
+
+def test_awdd2json_thin_client(daemon, tmp_path):
+    for number in range(3):
+        (tmp_path / f"{number}.metriclog").write_bytes(synthetic_log(build=f"B{number}"))
+    (tmp_path / "broken.metriclog").write_bytes(synthetic_log() + b"\x80")
+
+    result = subprocess.run(
+        [sys.executable, os.path.join(PROJECT, "bin", "awdd2json.py"), "--daemon", daemon.socket_path, str(tmp_path)],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": PROJECT},
+    )
+
+    assert result.returncode == 1
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert sorted(line["log"]["header"]["softwareBuild"] for line in lines) == ["B0", "B1", "B2"]
+    assert "broken.metriclog" in result.stderr
+
+
+def test_daemon_only_replaces_stale_sockets(daemon, tmp_path):
+    schemas = {"first": daemon.parsers["first"].metadata}
+
+    with pytest.raises(DaemonError, match="already listening"):
+        DecodeDaemon(schemas, daemon.socket_path).start()
+
+    (tmp_path / "file").write_bytes(b"keep")
+    with pytest.raises(DaemonError, match="not a socket"):
+        DecodeDaemon(schemas, str(tmp_path / "file")).start()
+    assert (tmp_path / "file").read_bytes() == b"keep"
+
+    # Bound but never listened on, as a crashed daemon leaves it
+    stale = str(tmp_path / "stale.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as bound:
+        bound.bind(stale)
+    with DecodeDaemon(schemas, stale) as replacement:
+        with DaemonClient(replacement.socket_path) as client:
+            assert client.ping() == ["first"]
+
+
+def test_unreachable_daemon(tmp_path):
+    root, extensions = write_synthetic_manifests(str(tmp_path / "manifests"))
+    (tmp_path / "one.metriclog").write_bytes(synthetic_log())
+    command = [sys.executable, os.path.join(PROJECT, "bin", "awdd2json.py"), "--root", root]
+    command += ["--extensions", extensions, str(tmp_path / "one.metriclog")]
+    missing = str(tmp_path / "nothing.sock")
+
+    # From the environment it is only a shortcut, the log is decoded in process instead
+    result = subprocess.run(
+        command, capture_output=True, text=True, env={**os.environ, "PYTHONPATH": PROJECT, "AWDD_DAEMON": missing}
+    )
+    assert result.returncode == 0
+    assert json.loads(result.stdout)["log"]["header"]["softwareBuild"] == "20A362"
+
+    command = [sys.executable, os.path.join(PROJECT, "bin", "awdd2json.py"), "--daemon", missing]
+    result = subprocess.run(
+        command + [str(tmp_path / "one.metriclog")], capture_output=True, text=True, env={**os.environ, "PYTHONPATH": PROJECT}
+    )
+    assert result.returncode == 2
+    assert "Cannot connect to the daemon" in result.stderr and "Traceback" not in result.stderr
+
+
+def test_explicit_schemas_bypass_the_daemon(daemon, tmp_path):
+    root, extensions = write_synthetic_manifests(str(tmp_path / "manifests"))
+    (tmp_path / "one.metriclog").write_bytes(synthetic_log())
+    command = [sys.executable, os.path.join(PROJECT, "bin", "awdd2json.py"), "--root", root]
+    command += ["--extensions", extensions, str(tmp_path / "one.metriclog")]
+
+    # The daemon from the environment decodes with its own schemas, so the ones given here win
+    result = subprocess.run(
+        command, capture_output=True, text=True, env={**os.environ, "PYTHONPATH": PROJECT, "AWDD_DAEMON": daemon.socket_path}
+    )
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout)["log"]["header"]["softwareBuild"] == "20A362"
+    assert daemon.requests == 0
+
+    result = subprocess.run(
+        command + ["--daemon", daemon.socket_path], capture_output=True, text=True, env={**os.environ, "PYTHONPATH": PROJECT}
+    )
+    assert result.returncode == 2
+    assert "do not apply" in result.stderr
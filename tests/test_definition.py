@@ -0,0 +1,84 @@
+import io
+
+import pytest
+
+from awdd import ManifestError
+from awdd.metadata import Metadata
+from awdd.parser import LogParser
+from tests import define_enum, define_object, synthetic_log, write_manifest, write_synthetic_manifests
+
+
+def resolved_metadata(tmp_path) -> Metadata:
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    metadata.resolve()
+    return metadata
+
+
+def test_enum_value_index(tmp_path):
+    device_type = resolved_metadata(tmp_path).all_enums[0x00]
+
+    assert device_type.name == "DeviceType"
+    assert not device_type.is_flags
+    assert device_type.member_for_value(2).name == "watch"
+    assert device_type.member_for_value(3) is None
+    assert device_type.label_for_value(3) == "0x3"
+
+
+def test_flag_enum_decomposition(tmp_path):
+    state_flags = resolved_metadata(tmp_path).all_enums[0x01]
+
+    assert state_flags.is_flags
+    assert state_flags.labels_for_value(0) == ("none",)
+    assert state_flags.labels_for_value(4) == ("docked",)
+    assert state_flags.labels_for_value(7) == ("active", "charging", "docked")
+    assert state_flags.labels_for_value(9) == ("active", "0x8")
+    assert state_flags.label_for_value(3) == "active|charging"
+    assert state_flags.labels_for_value(7) is state_flags.labels_for_value(7)
+
+
+def test_flag_enum_with_combined_members(tmp_path):
+    path = str(tmp_path / "AWDMetadata.bin")
+    enums = [
+        define_enum("Access", read=1, write=2, readWrite=3, execute=4, all=7, shared=8),
+        define_enum("Counter", one=1, two=2, three=3, four=4),
+        define_enum("Sparse", low=1, high=16, odd=33),
+    ]
+    write_manifest(path, {0x00: [define_object("Log"), *enums]}, True)
+    metadata = Metadata(path, str(tmp_path / "none" / "*.bin"))
+    metadata.resolve()
+    access, counter, sparse = (metadata.all_enums[tag] for tag in (0x00, 0x01, 0x02))
+
+    assert access.is_flags
+    assert access.label_for_value(3) == "readWrite"
+    assert access.label_for_value(11) == "read|write|shared"
+    # Counting enums combine their low members too, but use no bit past their member count
+    assert not counter.is_flags
+    # 33 has a bit no single bit member stands for
+    assert not sparse.is_flags
+
+
+def test_diagnostic_value_label(tmp_path):
+    log = LogParser(resolved_metadata(tmp_path)).parse(io.BytesIO(synthetic_log()))
+    header = log.properties[1].value
+    sample = log.properties[2].value.properties[3].value
+
+    assert [value.label for value in header.properties] == [None, "phone"]
+    assert sample.properties[1].label == "active|charging"
+
+
+def test_resolved_schema_is_frozen_and_compact(tmp_path):
+    metadata = resolved_metadata(tmp_path)
+    metric_log = metadata.all_objects[0x02]
+    timestamp = metric_log.property_for_tag(0x01)
+
+    for definition in [metric_log, timestamp, metadata.all_enums[0x01].entries[0]]:
+        assert definition.frozen
+        assert not hasattr(definition, "__dict__")
+
+    with pytest.raises(ManifestError):
+        metric_log.name = "Renamed"
+    with pytest.raises(ManifestError):
+        timestamp.index = 0x10
+
+    assert isinstance(metric_log.properties, tuple)
+    assert timestamp.name is metadata.all_objects[0x00].property_for_tag(0x01).name
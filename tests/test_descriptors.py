@@ -0,0 +1,65 @@
+from google.protobuf import descriptor_pb2
+
+from awdd.descriptors import ProtobufDecoder, file_descriptor
+from awdd.metadata import Metadata
+from awdd.object import object_to_tree
+from awdd.parser import LogParser
+from tests import encode_message, synthetic_log, write_synthetic_manifests
+
+
+def test_descriptor_set_covers_schema(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    descriptors = metadata.descriptor_set()
+
+    assert len(descriptors.file) == 1
+    messages = {message.name: message for message in descriptors.file[0].message_type}
+    assert set(messages) == {"Log", "Header", "MetricLog", "Sample", "WifiStats", "WifiExtensions"}
+
+    metric_log = {field.name: field for field in messages["MetricLog"].field}
+    assert metric_log["wifiStats"].number == 0x2A0000
+    assert metric_log["wifiStats"].type_name == ".awdd.WifiStats"
+    assert messages["Sample"].field[3].label == descriptor_pb2.FieldDescriptorProto.LABEL_REPEATED
+
+    typed = file_descriptor(metadata, raw_values=False)
+    header = {field.name: field for field in typed.message_type[1].field}
+    assert header["deviceType"].type_name == ".awdd.DeviceType"
+    assert header["softwareBuild"].type == descriptor_pb2.FieldDescriptorProto.TYPE_STRING
+    # Flag enums combine values, they stay plain integers
+    assert [enum.name for enum in typed.enum_type] == ["DeviceType"]
+
+
+def test_protobuf_decode_matches_generic_decode(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    data = synthetic_log()
+
+    generic = LogParser(metadata).parse(data)
+    native = LogParser(metadata, use_protobuf=True).parse(data)
+
+    assert object_to_tree(native) == object_to_tree(generic)
+    assert native.properties[2].value.properties[3].value.properties[1].label == "active|charging"
+
+    message = ProtobufDecoder(metadata).parse(data)
+    assert message.metriclogs[1].wifiStats[0].ssid == [b"network"]
+
+
+def test_protobuf_decode_keeps_duplicate_fields(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    # A second header and a second timestamp on a field declared once
+    data = encode_message([(0x01, 5), (0x02, [(0x01, "A")]), (0x02, [(0x02, 1)]), (0x01, 6)])
+
+    generic = LogParser(metadata).parse(data)
+    native = LogParser(metadata, use_protobuf=True).parse(data)
+
+    assert sorted(object_to_tree(native), key=repr) == sorted(object_to_tree(generic), key=repr)
+
+
+def test_protobuf_decode_keeps_unknown_tags(tmp_path):
+    decoder = ProtobufDecoder(Metadata(*write_synthetic_manifests(str(tmp_path))))
+
+    decoded = decoder.decode(encode_message([(0x01, 5), (19500, 3), (0x30, "x")]))
+
+    assert [(value.index, value.value) for value in decoded.properties] == [
+        (0x01, 5),
+        (19500, 3),
+        (0x30, b"x"),
+    ]
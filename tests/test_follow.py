@@ -0,0 +1,93 @@
+from awdd import follow
+from awdd.follow import LogFollower
+from awdd.instrumentation import DecodeStats
+from awdd.metadata import Metadata
+from awdd.stream import ChunkedTagReader
+from awdd.text_writer import TextWriter
+from tests import encode_message, synthetic_log, synthetic_metric_log, write_synthetic_manifests
+
+
+def test_follow_decodes_only_appended_tags(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    path = tmp_path / "live.metriclog"
+    header = synthetic_log(timestamps=(1000,))
+    path.write_bytes(header)
+
+    stats = DecodeStats()
+    with LogFollower(path, metadata, stats=stats) as follower:
+        assert [value.index for value in follower.poll()] == [0x01, 0x02, 0x0F]
+        assert follower.offset == len(header)
+        assert follower.poll() == []
+
+        entry = encode_message([synthetic_metric_log(2000)])
+        with open(path, "ab") as log:
+            log.write(entry[:10])
+        assert follower.poll() == []
+        assert follower.offset == len(header)
+
+        with open(path, "ab") as log:
+            log.write(entry[10:] + entry)
+        bytes_before = stats.bytes_read
+        values = follower.poll()
+        assert [value.value.properties[0].value for value in values] == [2000, 2000]
+        assert stats.bytes_read - bytes_before == 2 * len(entry)
+        assert follower.offset == len(header) + 2 * len(entry)
+
+
+def test_follow_restarts_after_truncation(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    path = tmp_path / "live.metriclog"
+    path.write_bytes(synthetic_log(timestamps=(1000, 2000)))
+
+    follower = LogFollower(path, metadata)
+    assert len(follower.poll()) == 4
+
+    path.write_bytes(encode_message([(0x01, 5)]))
+    assert [(value.index, value.value) for value in follower.poll()] == [(0x01, 5)]
+    follower.close()
+
+
+def test_text_writer(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    path = tmp_path / "log.metriclog"
+    path.write_bytes(synthetic_log(timestamps=(1660000000000,)))
+
+    values = LogFollower(path, metadata).poll()
+    text = "".join(TextWriter().format_value(value) for value in values)
+
+    assert text.startswith("timestamp: 2022-08-08T23:06:40.000\nheader {\n\tsoftwareBuild: 20A362\n")
+    assert "\tdeviceType: phone\n" in text
+    assert "\t\tstate: active|charging\n" in text
+    assert "\twifiStats {\n\t\trssi: -40\n\t\tssid: network\n\t}\n" in text
+
+
+def test_follow_reads_each_byte_once(tmp_path, monkeypatch):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    path = tmp_path / "live.metriclog"
+    entry = encode_message([synthetic_metric_log(2000)])
+    path.write_bytes(b"")
+
+    with LogFollower(path, metadata) as follower:
+        read = []
+        follower.poll()
+        original = follower._stream.read
+        follower._stream.read = lambda *args: read.append(original(*args)) or read[-1]
+        readers = []
+
+        def reader(*args, **kwargs):
+            readers.append(args)
+            return ChunkedTagReader(*args, **kwargs)
+
+        monkeypatch.setattr(follow, "ChunkedTagReader", reader)
+
+        # A large entry trickling in, a few bytes per poll
+        for start in range(0, len(entry), 7):
+            with open(path, "ab") as log:
+                log.write(entry[start : start + 7])
+            values = follower.poll()
+
+        assert [value.value.properties[0].value for value in values] == [2000]
+        assert b"".join(read) == entry
+        assert follower.offset == len(entry)
+        # Decoded once when its header arrived and once when it was complete, not on every poll in between
+        assert len(readers) == 2
@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# Cumulative `-X importtime` budgets in milliseconds for what a short lived CLI run imports, the best of a few
+# runs.  Generous against a typical ~60ms so that a slow machine does not fail them, they are there to catch a
+# heavy dependency creeping back into the import path.  Wall clock timings are noisy on shared machines, so they
+# only run with AWDD_IMPORT_BUDGETS=1 set
+IMPORT_BUDGETS_MS = {
+    "awdd": 100,
+    "awdd.parser": 150,
+    "awdd.json_writer": 175,
+}
+
+# Only loaded by the features that need them
+LAZY_MODULES = ("google.protobuf", "sqlite3", "numpy", "tracemalloc", "multiprocessing", "awdd.descriptors")
+
+RUNS = 3
+
+
+def import_time(module: str) -> float:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": PROJECT},
+    )
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", anything else on stderr is not ours
+        columns = line.split("|")
+        if len(columns) != 3:
+            continue
+        _, cumulative, name = columns
+        if name.strip() == module and cumulative.strip().isdigit():
+            return int(cumulative) / 1000
+    raise AssertionError(f"{module} not in the import time report")
+
+
+@pytest.mark.skipif(not os.environ.get("AWDD_IMPORT_BUDGETS"), reason="set AWDD_IMPORT_BUDGETS=1 to time imports")
+def test_import_time_budget():
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        best = min(import_time(module) for _ in range(RUNS))
+        assert best < budget, f"import {module} took {best:.1f}ms, over the {budget}ms budget"
+
+
+def test_heavy_dependencies_are_lazy():
+    check = (
+        "import sys, awdd, awdd.parser, awdd.json_writer, awdd.text_writer\n"
+        f"print(' '.join(name for name in sys.modules if name.startswith({LAZY_MODULES!r})))\n"
+        "awdd.LogParser, awdd.JsonWriter\n"
+        "awdd.ProtobufDecoder\n"
+        "print('google.protobuf' in sys.modules)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", check],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": PROJECT},
+    )
+    eager, loaded_on_access = result.stdout.splitlines()
+    assert eager == ""
+    assert loaded_on_access == "True"
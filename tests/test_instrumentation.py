@@ -0,0 +1,88 @@
+import io
+import tracemalloc
+
+from awdd import decode_tags
+from awdd.instrumentation import DecodeStats
+from awdd.metadata import Metadata
+from awdd.parser import LogParser
+from tests import synthetic_log, write_synthetic_manifests
+
+
+def test_decode_stats_counts_tags():
+    stats = DecodeStats()
+    tags = decode_tags(synthetic_log(), stats=stats)
+
+    assert stats.tags_decoded == len(tags)
+    assert stats.tags_by_wire_type[0b010] == 3
+
+
+def test_parser_stats_snapshot(tmp_path):
+    stats = DecodeStats()
+    parser = LogParser(Metadata(*write_synthetic_manifests(str(tmp_path))), stats)
+    data = synthetic_log()
+
+    parser.parse(io.BytesIO(data))
+    snapshot = stats.snapshot()
+
+    assert snapshot["bytes_read"] == len(data)
+    assert snapshot["objects_by_class"] == {
+        "Log": 1,
+        "Header": 1,
+        "MetricLog": 2,
+        "Sample": 2,
+        "WifiStats": 2,
+    }
+    # Log: timestamp, header and two entries.  MetricLog: four fields and the extension.  Sample: three fields
+    # and two values
+    assert snapshot["tags_by_class"] == {
+        "Log": 4,
+        "Header": 2,
+        "MetricLog": 10,
+        "Sample": 10,
+        "WifiStats": 4,
+    }
+    assert snapshot["max_depth"] == 2
+    assert set(snapshot["timings"]) == {"resolve", "decode"}
+
+    parser.parse(io.BytesIO(data))
+    assert snapshot["bytes_read"] == len(data)
+    assert stats.bytes_read == 2 * len(data)
+
+
+def test_parser_without_stats(tmp_path):
+    parser = LogParser(Metadata(*write_synthetic_manifests(str(tmp_path))))
+    result = parser.parse(io.BytesIO(synthetic_log()))
+
+    assert parser.stats is None
+    assert result.object_class.name == "Log"
+
+
+def test_resolve_report(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    report = metadata.resolve(report=True)
+
+    assert list(report.phases) == ["header_scan", "parse", "merge", "bind", "extend"]
+    assert [(m.objects, m.enums) for m in report.manifests] == [(4, 2), (2, 0)]
+    assert report.object_count == 6
+    assert report.enum_count == 2
+    assert report.peak_memory > 0
+    assert report.as_dict()["manifests"][0]["path"].endswith("AWDMetadata.bin")
+
+    assert metadata.resolve(report=True) is None
+
+
+def test_resolve_report_keeps_the_callers_peak(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    tracemalloc.start()
+    try:
+        ballast = bytearray(4 << 20)
+        del ballast
+        _, peak = tracemalloc.get_traced_memory()
+
+        report = metadata.resolve(report=True)
+
+        assert tracemalloc.is_tracing()
+        assert tracemalloc.get_traced_memory()[1] >= peak
+        assert report.peak_memory > 0
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,102 @@
+import json
+import os
+import subprocess
+import sys
+
+from awdd.json_writer import JsonWriter
+from awdd.metadata import Metadata
+from awdd.parser import LogParser
+from tests import SYNTHETIC_METRIC_ID, encode_message, synthetic_log, write_synthetic_manifests
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def test_json_writer(tmp_path):
+    parser = LogParser(Metadata(*write_synthetic_manifests(str(tmp_path))))
+    document = json.loads(JsonWriter().write(parser.parse(synthetic_log())))
+
+    assert document["timestamp"] == 1660000000000
+    assert document["header"] == {"softwareBuild": "20A362", "deviceType": "phone"}
+    assert len(document["metriclogs"]) == 2
+    sample = document["metriclogs"][0]["sample"]
+    assert sample == {"count": 5, "state": "active|charging", "name": "sample", "values": [1, 2]}
+    assert document["metriclogs"][0]["wifiStats"]["ssid"] == "network"
+
+    unknown = json.loads(JsonWriter().write(parser.parse(encode_message([(0x30, 1), (0x30, "x")]))))
+    assert unknown == {"0x30": [1, "eA=="]}
+
+
+def test_json_writer_signed_fields(tmp_path):
+    parser = LogParser(Metadata(*write_synthetic_manifests(str(tmp_path))))
+    # Negative varints are the 64 bit two's complement
+    sample = [(0x01, -3 & (1 << 64) - 1), (0x04, -1 & (1 << 64) - 1), (0x04, 7)]
+    log = encode_message([(0x0F, [(0x04, sample), (SYNTHETIC_METRIC_ID, [(0x01, -40 & (1 << 64) - 1)])])])
+
+    entry = json.loads(JsonWriter().write(parser.parse(log)))["metriclogs"][0]
+
+    assert entry["sample"] == {"count": -3, "values": [-1, 7]}
+    assert entry["wifiStats"] == {"rssi": -40}
+
+
+def run_awdd2json(tmp_path, *arguments):
+    root, extensions = write_synthetic_manifests(str(tmp_path / "manifests"))
+    return subprocess.run(
+        [sys.executable, os.path.join(PROJECT, "bin", "awdd2json.py"), "--root", root, "--extensions", extensions]
+        + list(arguments),
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": PROJECT},
+    )
+
+
+def test_awdd2json_ndjson(tmp_path):
+    logs = tmp_path / "logs"
+    (logs / "nested").mkdir(parents=True)
+    for number in range(3):
+        (logs / "nested" / f"{number}.metriclog").write_bytes(synthetic_log(build=f"B{number}"))
+    (logs / "broken.metriclog").write_bytes(synthetic_log() + b"\x80")
+
+    result = run_awdd2json(tmp_path, "-j", "2", str(logs), str(tmp_path / "missing.metriclog"))
+
+    assert result.returncode == 1 | 4
+    lines = [json.loads(line) for line in result.stdout.splitlines()]
+    assert [line["log"]["header"]["softwareBuild"] for line in lines] == ["B0", "B1", "B2"]
+    assert lines[0]["file"].endswith("0.metriclog")
+    assert "broken.metriclog: " in result.stderr
+    assert "missing.metriclog" in result.stderr
+    assert "3/5 files" in result.stderr
+
+
+def test_awdd2json_per_file(tmp_path):
+    log = tmp_path / "a.metriclog"
+    log.write_bytes(synthetic_log())
+
+    result = run_awdd2json(
+        tmp_path, "-q", "--per-file", str(tmp_path / "out"), "--indent", "2", str(tmp_path / "*.metriclog")
+    )
+
+    assert result.returncode == 0
+    assert result.stderr == ""
+    document = json.loads((tmp_path / "out" / "a.metriclog.json").read_text())
+    assert document["header"]["deviceType"] == "phone"
+
+
+def test_awdd2json_per_file_mirrors_input_layout(tmp_path):
+    logs = tmp_path / "logs"
+    for directory, build in (("first", "B1"), ("second", "B2")):
+        (logs / directory).mkdir(parents=True)
+        (logs / directory / "a.metriclog").write_bytes(synthetic_log(build=build))
+
+    result = run_awdd2json(tmp_path, "-q", "-j", "1", "--per-file", str(tmp_path / "json"), str(logs))
+
+    assert result.returncode == 0
+    for directory, build in (("first", "B1"), ("second", "B2")):
+        document = json.loads((tmp_path / "json" / directory / "a.metriclog.json").read_text())
+        assert document["header"]["softwareBuild"] == build
+
+    # A file where an output directory should be cannot be written to
+    (tmp_path / "blocked").mkdir()
+    (tmp_path / "blocked" / "first").write_text("")
+    result = run_awdd2json(tmp_path, "-q", "-j", "1", "--per-file", str(tmp_path / "blocked"), str(logs))
+    assert result.returncode == 8
+    assert (tmp_path / "blocked" / "second" / "a.metriclog.json").exists()
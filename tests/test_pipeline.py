@@ -0,0 +1,164 @@
+import io
+import os
+import subprocess
+import sys
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from awdd.json_writer import JsonWriter
+from awdd.metadata import Metadata
+from awdd.parser import LogParser
+from awdd.pipeline import DECODE, READ, LogPipeline, LogSource, bounded_map, iter_sources
+from tests import synthetic_log, write_synthetic_manifests
+
+PROJECT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def test_iter_sources_expands_archives(tmp_path):
+    (tmp_path / "logs").mkdir()
+    (tmp_path / "logs" / "a.metriclog").write_bytes(b"a")
+    (tmp_path / "logs" / "notes.txt").write_bytes(b"")
+
+    with tarfile.open(tmp_path / "batch.tar.gz", "w:gz") as archive:
+        for name in ("b.metriclog", "c.metriclog"):
+            member = tarfile.TarInfo(name)
+            member.size = 1
+            archive.addfile(member, io.BytesIO(name[:1].encode()))
+    with zipfile.ZipFile(tmp_path / "batch.zip", "w") as archive:
+        archive.writestr("d.metriclog", b"d")
+
+    sources = list(
+        iter_sources(
+            [str(tmp_path / "logs"), str(tmp_path / "batch.tar.gz"), str(tmp_path / "batch.zip"), "missing"]
+        )
+    )
+    assert [source.name.replace(str(tmp_path), "") for source in sources] == [
+        "/logs/a.metriclog",
+        "/batch.tar.gz:b.metriclog",
+        "/batch.tar.gz:c.metriclog",
+        "/batch.zip:d.metriclog",
+        "missing",
+    ]
+    assert [source.data for source in sources[1:4]] == [b"b", b"c", b"d"]
+
+
+def test_pipeline_orders_output_and_reports_failures(tmp_path):
+    parser = LogParser(Metadata(*write_synthetic_manifests(str(tmp_path))))
+    sources = [LogSource(f"log{number}", data=synthetic_log(build=f"B{number}")) for number in range(30)]
+    sources[7] = LogSource("missing", str(tmp_path / "missing.metriclog"))
+    sources[11] = LogSource("broken", data=synthetic_log() + b"\x80")
+
+    written = []
+    pipeline = LogPipeline(
+        parser,
+        lambda result, source: JsonWriter().dumps(result),
+        lambda item: written.append(item.source.name),
+        readers=4,
+        decoders=3,
+        renderers=2,
+        queue_size=2,
+    )
+    items = list(pipeline.run(sources))
+
+    assert [item.source.name for item in items] == [source.name for source in sources]
+    assert written == [source.name for source in sources if source.name not in ("missing", "broken")]
+    assert (items[7].stage, type(items[7].error)) == (READ, FileNotFoundError)
+    assert items[11].stage == DECODE
+    assert all(item.output is None and item.data is None for item in items)
+
+
+def test_pipeline_applies_backpressure(tmp_path):
+    parser = LogParser(Metadata(*write_synthetic_manifests(str(tmp_path))))
+    log = synthetic_log()
+    state = {"read": 0, "written": 0, "ahead": 0}
+    lock = threading.Lock()
+
+    def sources():
+        for number in range(100):
+            with lock:
+                state["read"] += 1
+                state["ahead"] = max(state["ahead"], state["read"] - state["written"])
+            yield LogSource(str(number), data=log)
+
+    def write(item):
+        time.sleep(0.002)
+        with lock:
+            state["written"] += 1
+
+    items = LogPipeline(parser, lambda result, source: "", write, readers=2, queue_size=1).run(sources())
+    for number, item in enumerate(items):
+        if number == 20:
+            break
+    items.close()
+
+    # Five queues of one plus a log in each of five workers and the one being produced, never the whole input
+    assert state["ahead"] <= 12
+    assert state["read"] < 40
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith("awdd-")]
+
+
+def test_pipeline_bounds_logs_held_for_ordering(tmp_path):
+    parser = LogParser(Metadata(*write_synthetic_manifests(str(tmp_path))))
+    log = synthetic_log()
+    state = {"rendered": 0, "before_first_write": None}
+
+    class StalledPipeline(LogPipeline):
+        @staticmethod
+        def _read(item):
+            if item.sequence == 0:
+                time.sleep(0.3)
+            LogPipeline._read(item)
+
+    def render(result, source):
+        state["rendered"] += 1
+        return ""
+
+    def write(item):
+        if state["before_first_write"] is None:
+            state["before_first_write"] = state["rendered"]
+
+    pipeline = StalledPipeline(parser, render, write, readers=2, queue_size=2)
+    items = list(pipeline.run(LogSource(str(number), data=log) for number in range(200)))
+
+    assert len(items) == 200
+    assert state["before_first_write"] <= pipeline.max_in_flight
+
+
+def test_bounded_map_takes_inputs_lazily():
+    taken = []
+
+    def numbers():
+        for number in range(100):
+            taken.append(number)
+            yield number
+
+    with ThreadPoolExecutor(2) as pool:
+        results = bounded_map(pool, lambda a, b: a * b, numbers(), range(100, 200), window=3)
+        assert [next(results) for _ in range(5)] == [0, 101, 204, 309, 416]
+        assert len(taken) <= 8
+        results.close()
+
+
+def test_awdd2text_reads_archives(tmp_path):
+    root, extensions = write_synthetic_manifests(str(tmp_path / "manifests"))
+    with tarfile.open(tmp_path / "logs.tar", "w") as archive:
+        for build in ("B1", "B2"):
+            data = synthetic_log(build=build)
+            member = tarfile.TarInfo(f"{build}.metriclog")
+            member.size = len(data)
+            archive.addfile(member, io.BytesIO(data))
+
+    result = subprocess.run(
+        [sys.executable, os.path.join(PROJECT, "bin", "awdd2text.py"), "--root", root, "--extensions", extensions]
+        + [str(tmp_path / "logs.tar")],
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONPATH": PROJECT},
+    )
+
+    assert result.returncode == 0
+    assert result.stdout.index("logs.tar:B1.metriclog") < result.stdout.index("softwareBuild: B1")
+    assert result.stdout.index("softwareBuild: B1") < result.stdout.index("softwareBuild: B2")
@@ -0,0 +1,68 @@
+import shutil
+import subprocess
+
+import pytest
+from google.protobuf import descriptor_pool, message_factory
+
+from awdd.metadata import Metadata
+from awdd.protoexport import export_descriptor_set, export_proto
+from tests import synthetic_log, write_synthetic_manifests
+
+
+def message_classes(files, pool):
+    # `GetMessages` only takes a pool from protobuf 4.22 on, older runtimes build classes through a factory
+    for file in files:
+        pool.Add(file)
+    names = [file.name for file in files]
+    if hasattr(message_factory, "GetMessageClassesForFiles"):
+        return message_factory.GetMessageClassesForFiles(names, pool)
+    try:
+        return message_factory.MessageFactory(pool).GetMessages(names)
+    except NotImplementedError:
+        # The upb backend of 4.21 cannot register extensions of messages from a pool of its own
+        pytest.skip("this protobuf runtime cannot register extensions on a custom pool")
+
+
+def test_export_splits_extension_categories(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    descriptors = export_descriptor_set(metadata)
+
+    assert [file.name for file in descriptors.file] == ["awdd.proto", "awdd_002a.proto"]
+    root, extension = descriptors.file
+    metric_log = root.message_type[2]
+    assert metric_log.name == "MetricLog"
+    assert [field.name for field in metric_log.field] == ["timestamp", "triggerTime", "metricId", "sample"]
+    assert [(r.start, r.end) for r in metric_log.extension_range] == [(0x2A0000, 0x2A0001)]
+
+    assert list(extension.dependency) == ["awdd.proto"]
+    container = extension.message_type[1]
+    assert container.extension[0].extendee == ".awdd.MetricLog"
+
+
+def test_exported_descriptors_decode_logs(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    descriptors = export_descriptor_set(metadata)
+
+    pool = descriptor_pool.DescriptorPool()
+    classes = message_classes(list(descriptors.file), pool)
+    log = classes["awdd.Log"].FromString(synthetic_log())
+
+    wifi = pool.FindExtensionByName("awdd.WifiExtensions.wifiStats")
+    assert log.metriclogs[0].Extensions[wifi].ssid == "network"
+    assert log.header.deviceType == pool.FindEnumTypeByName("awdd.DeviceType").values_by_name[
+        "DEVICETYPE_PHONE"
+    ].number
+    assert log.metriclogs[0].sample.state == 3
+
+
+@pytest.mark.skipif(shutil.which("protoc") is None, reason="protoc is not installed")
+def test_exported_sources_compile(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    paths = export_proto(metadata, tmp_path / "proto")
+
+    assert [path.name for path in paths] == ["awdd.proto", "awdd_002a.proto", "descriptors.pb"]
+    subprocess.run(
+        ["protoc", f"--descriptor_set_out={tmp_path / 'compiled.pb'}", "-I", str(tmp_path / "proto")]
+        + [path.name for path in paths[:-1]],
+        check=True,
+    )
@@ -0,0 +1,140 @@
+import io
+import os
+
+import pytest
+
+from awdd.definition import ManifestObjectDefinition
+from awdd.metadata import Metadata
+from awdd.parser import LogParser
+from tests import (
+    define_object,
+    define_property,
+    synthetic_log,
+    write_manifest,
+    write_synthetic_manifests,
+)
+
+
+def metric_log_properties(metadata: Metadata):
+    return [prop.name for prop in metadata.all_objects[0x02].properties]
+
+
+def test_refresh_without_changes(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    metadata.resolve()
+
+    assert not metadata.refresh()
+    assert metric_log_properties(metadata)[-1] == "wifiStats"
+
+
+def test_refresh_changed_manifest(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    metadata.resolve()
+    root_object = metadata.root()
+    wifi_path = os.path.join(tmp_path, "Metadata", "wifi.bin")
+
+    # Same identity hash, only the mtime moves
+    os.utime(wifi_path, ns=(0, 0))
+    assert not metadata.refresh()
+
+    write_synthetic_manifests(str(tmp_path), "WifiStatsV2", "11" * 20)
+    result = metadata.refresh()
+
+    assert [path.name for path in result.changed] == ["wifi.bin"]
+    assert metadata.root() is root_object
+    assert metric_log_properties(metadata).count("wifiStats") == 1
+    assert metadata.all_objects[0x2A0000].name == "WifiStatsV2"
+
+    log = LogParser(metadata).parse(io.BytesIO(synthetic_log()))
+    entry = log.properties[-1].value
+    assert entry.properties[-1].value.object_class.name == "WifiStatsV2"
+
+
+def test_refresh_added_and_removed_manifest(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    metadata.resolve()
+
+    cellular_path = os.path.join(tmp_path, "Metadata", "cellular.bin")
+    write_manifest(
+        cellular_path,
+        {
+            0x2B: [
+                define_object("CellularStats", define_property(0x01, 0x04, "bars")),
+                define_object(
+                    "CellularExtensions",
+                    define_property(
+                        0x2B0000,
+                        0x1B,
+                        "cellularStats",
+                        object_type=0x00,
+                        extension_tag=0x02,
+                        extension_scope=0x02,
+                    ),
+                ),
+            ]
+        },
+    )
+
+    result = metadata.refresh()
+    assert [path.name for path in result.added] == ["cellular.bin"]
+    assert metric_log_properties(metadata)[-2:] == ["wifiStats", "cellularStats"]
+
+    os.remove(os.path.join(tmp_path, "Metadata", "wifi.bin"))
+    result = metadata.refresh()
+
+    assert [path.name for path in result.removed] == ["wifi.bin"]
+    assert 0x2A0000 not in metadata.all_objects
+    assert metric_log_properties(metadata)[-1] == "cellularStats"
+    assert "wifiStats" not in metric_log_properties(metadata)
+
+
+def test_refresh_root_manifest_reloads(tmp_path):
+    root_path, extension_pattern = write_synthetic_manifests(str(tmp_path))
+    metadata = Metadata(root_path, extension_pattern)
+    metadata.resolve()
+    previous_root = metadata.root()
+
+    # Rewriting with the same identity is not a change
+    write_synthetic_manifests(str(tmp_path))
+    assert not metadata.refresh()
+
+    write_synthetic_manifests(str(tmp_path), root_hash="22" * 20)
+
+    assert metadata.refresh().full_reload
+    assert metadata.root() is not previous_root
+    assert metric_log_properties(metadata).count("wifiStats") == 1
+
+
+def test_refresh_publishes_only_once_built(tmp_path, monkeypatch):
+    paths = write_synthetic_manifests(str(tmp_path))
+    # Extends WifiStats, which lives in another manifest
+    write_manifest(
+        os.path.join(tmp_path, "Metadata", "cellular.bin"),
+        {
+            0x2B: [
+                define_object(
+                    "CellularExtensions",
+                    define_property(0x10, 0x04, "bars", extension_tag=0x2A0000, extension_scope=0x02),
+                )
+            ]
+        },
+    )
+    metadata = Metadata(*paths)
+    metadata.resolve()
+    bars = metadata.all_objects[0x2B0000].own_properties[0]
+    previous = metadata.all_objects[0x2A0000]
+    assert previous.properties[-1] is bars
+
+    write_synthetic_manifests(str(tmp_path), "WifiStatsV2", "11" * 20)
+    with monkeypatch.context() as patch:
+        patch.setattr(ManifestObjectDefinition, "freeze", lambda self: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            metadata.refresh()
+
+    assert metadata.all_objects[0x2A0000] is previous
+    assert bars.extends is previous
+
+    assert [path.name for path in metadata.refresh().changed] == ["wifi.bin"]
+    assert metadata.all_objects[0x2A0000].name == "WifiStatsV2"
+    assert bars.extends is metadata.all_objects[0x2A0000]
+    assert metadata.all_objects[0x2A0000].properties[-1] is bars
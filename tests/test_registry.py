@@ -0,0 +1,72 @@
+import pytest
+
+from awdd import ManifestError
+from awdd.parser import LogParser
+from awdd.registry import MetadataRegistry
+from tests import synthetic_log, write_synthetic_manifests
+
+
+def wifi_class(result) -> str:
+    entry = [value for value in result.properties if value.index == 0x0F][0]
+    wifi = [value for value in entry.value.properties if value.property.name == "wifiStats"][0]
+    return wifi.value.object_class.name
+
+
+@pytest.fixture
+def schemas(tmp_path):
+    write_synthetic_manifests(str(tmp_path / "20A362"), "WifiStats", root_hash="01" * 20)
+    write_synthetic_manifests(str(tmp_path / "21A329"), "RadioStats", root_hash="02" * 20)
+    # Different directory, same manifest identities as 21A329
+    write_synthetic_manifests(str(tmp_path / "21A331"), "RadioStats", root_hash="02" * 20)
+    (tmp_path / "notes").mkdir()
+    return tmp_path
+
+
+def test_registry_selects_schema_per_log(schemas):
+    registry = MetadataRegistry()
+    assert registry.add_directory(schemas) == ["20A362", "21A329", "21A331"]
+    assert registry.default_build == "20A362"
+
+    parser = LogParser(registry=registry)
+    assert wifi_class(parser.parse(synthetic_log(build="20A362"))) == "WifiStats"
+    assert wifi_class(parser.parse(synthetic_log(build="21A329"))) == "RadioStats"
+    assert wifi_class(parser.parse(synthetic_log(build="21A331"))) == "RadioStats"
+    assert wifi_class(parser.parse(synthetic_log(build="22A100"))) == "WifiStats"
+
+    # Two builds with the same manifests share one schema, nothing is resolved twice
+    assert registry.loads == 2
+    assert registry.metadata("21A329") is registry.metadata("21A331")
+    assert registry.unknown_builds == {"22A100": 1}
+    assert registry.software_build(synthetic_log(build="21A329")) == "21A329"
+
+
+def test_registry_evicts_least_recently_used(schemas):
+    registry = MetadataRegistry(max_bytes=1)
+    registry.add_directory(schemas)
+
+    first = registry.metadata("20A362")
+    registry.metadata("21A329")
+    assert registry.loads == 2
+    assert len(registry._resident) == 1
+
+    assert registry.metadata("20A362") is not first
+    assert registry.loads == 3
+
+
+def test_parser_keeps_only_resident_schemas(schemas):
+    registry = MetadataRegistry(max_bytes=1)
+    registry.add_directory(schemas)
+    parser = LogParser(registry=registry)
+
+    for build in ["20A362", "21A329", "20A362", "21A329", "20A362"]:
+        parser.parse(synthetic_log(build=build))
+        # Parsers of evicted schemas are dropped, only the one just used is held
+        assert [child.metadata for child in parser._schema_parsers.values()] == registry.resident()
+
+
+def test_registry_errors(tmp_path):
+    registry = MetadataRegistry()
+    with pytest.raises(ManifestError):
+        registry.metadata("20A362")
+    with pytest.raises(ManifestError):
+        registry.add("20A362", str(tmp_path / "AWDMetadata.bin"))
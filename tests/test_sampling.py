@@ -0,0 +1,77 @@
+import pickle
+
+import pytest
+
+from awdd.instrumentation import DecodeStats
+from awdd.metadata import Metadata
+from awdd.parser import LogParser
+from awdd.sampling import Sampler
+from tests import SYNTHETIC_METRIC_ID, encode_message, synthetic_metric_log, write_synthetic_manifests
+
+TIMESTAMPS = [1660000000000 + number * 1000 for number in range(20)]
+
+
+def entry(timestamp: int, metric: int):
+    index, fields = synthetic_metric_log(timestamp)
+    return index, [(tag, metric if tag == 0x03 else value) for tag, value in fields]
+
+
+def corpus_log() -> bytes:
+    # Entries alternate between two metric classes, the header sits in the middle
+    entries = [entry(timestamp, SYNTHETIC_METRIC_ID + number % 2) for number, timestamp in enumerate(TIMESTAMPS)]
+    return encode_message(
+        [(0x01, TIMESTAMPS[0])] + entries[:10] + [(0x02, [(0x01, "20A362"), (0x02, 1)])] + entries[10:]
+    )
+
+
+def sampled(result):
+    return [
+        {value.property.name: value.value for value in item.value.properties if value.property.name != "sample"}
+        for item in result.properties
+        if item.index == 0x0F
+    ]
+
+
+@pytest.fixture
+def metadata(tmp_path):
+    return Metadata(*write_synthetic_manifests(str(tmp_path)))
+
+
+def test_every_nth_entry(metadata):
+    stats = DecodeStats()
+    result = LogParser(metadata, stats=stats, sampler=Sampler(every=3, seed=1)).parse(corpus_log())
+
+    assert [item["timestamp"] for item in sampled(result)] == TIMESTAMPS[1::3]
+    assert [value.property.name for value in result.properties if value.index != 0x0F] == ["timestamp", "header"]
+    assert (stats.entries_seen, stats.entries_sampled) == (20, 7)
+    assert stats.bytes_read < len(corpus_log())
+
+
+def test_reservoir_per_class_is_deterministic(metadata):
+    log = corpus_log()
+    first = sampled(LogParser(metadata, sampler=Sampler(per_class=3, seed=7)).parse(log))
+    again = sampled(LogParser(metadata, sampler=Sampler(per_class=3, seed=7)).parse(log))
+
+    assert first == again
+    assert sorted(item["metricId"] for item in first) == [SYNTHETIC_METRIC_ID] * 3 + [SYNTHETIC_METRIC_ID + 1] * 3
+    # Kept in log order
+    timestamps = [item["timestamp"] for item in first]
+    assert timestamps == sorted(timestamps)
+
+    other = [sampled(LogParser(metadata, sampler=Sampler(per_class=3, seed=seed)).parse(log)) for seed in range(8)]
+    assert any(result != first for result in other)
+
+
+def test_file_fraction_and_pickling():
+    sampler = Sampler(every=2, file_fraction=0.25, seed=3)
+    names = [f"log{number}.metriclog" for number in range(2000)]
+    kept = [name for name in names if sampler.keep_file(name)]
+
+    assert 400 < len(kept) < 600
+    assert kept == [name for name in names if pickle.loads(pickle.dumps(sampler)).keep_file(name)]
+    assert all(Sampler().keep_file(name) for name in names[:10])
+
+    with pytest.raises(ValueError):
+        Sampler(every=0)
+    with pytest.raises(ValueError):
+        Sampler(file_fraction=1.5)
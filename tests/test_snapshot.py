@@ -0,0 +1,103 @@
+import io
+import os
+import pickle
+
+from awdd.metadata import Metadata
+from awdd.parser import LogParser
+from awdd.snapshot import MetadataSnapshot
+from tests import define_enum, define_object, define_property, synthetic_log, write_manifest, write_synthetic_manifests
+
+
+def flatten(value):
+    if hasattr(value, "properties"):
+        return [
+            (prop.property.name if prop.property else None, flatten(prop.value))
+            for prop in value.properties
+        ]
+    return value
+
+
+def resolved_metadata(tmp_path) -> Metadata:
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    metadata.resolve()
+    return metadata
+
+
+def test_pickled_metadata_decodes_identically(tmp_path):
+    metadata = resolved_metadata(tmp_path)
+    restored = pickle.loads(pickle.dumps(metadata))
+
+    assert restored.root_manifest is None
+    assert restored.root().frozen
+    assert restored.all_objects.keys() == metadata.all_objects.keys()
+    assert restored.all_enums[0x01].label_for_value(3) == "active|charging"
+
+    data = synthetic_log()
+    expected = LogParser(metadata).parse(io.BytesIO(data))
+    actual = LogParser(restored).parse(io.BytesIO(data))
+    assert flatten(actual) == flatten(expected)
+
+    metric_log = restored.all_objects[0x02]
+    assert [prop.name for prop in metric_log.own_properties][-1] == "sample"
+    assert metric_log.properties[-1].extends is metric_log
+
+
+def test_snapshot_round_trip(tmp_path):
+    snapshot = resolved_metadata(tmp_path).snapshot()
+    copy = pickle.loads(pickle.dumps(snapshot))
+
+    assert len(copy) == len(snapshot) == 6
+    assert copy.to_bytes() == snapshot.to_bytes()
+
+
+def test_shared_memory_snapshot(tmp_path):
+    segment = resolved_metadata(tmp_path).snapshot().share()
+    try:
+        attached = MetadataSnapshot.attach(segment.name)
+        restored = attached.restore()
+        attached.close()
+
+        assert restored.root().name == "Log"
+        assert restored.all_objects[0x2A0000].name == "WifiStats"
+    finally:
+        segment.close()
+        segment.unlink()
+
+
+def test_snapshot_keeps_signed_and_wrapped_enum_values(tmp_path):
+    # A signed member reads back as the raw 64 bit two's complement varint
+    path = str(tmp_path / "AWDMetadata.bin")
+    write_manifest(path, {0x00: [define_object("Log"), define_enum("Result", failed=(1 << 64) - 3, ok=1)]}, True)
+    metadata = Metadata(path, str(tmp_path / "none" / "*.bin"))
+    metadata.resolve()
+    snapshot = MetadataSnapshot.from_bytes(metadata.snapshot().to_bytes())
+
+    assert list(snapshot.member_values) == [-3, 1]
+    restored = snapshot.restore()
+    assert [member.value for member in restored.all_enums[0x00].entries] == [(1 << 64) - 3, 1]
+    assert restored.all_enums[0x00].label_for_value((1 << 64) - 3) == "failed"
+
+
+def test_snapshot_keeps_configuration_scope_targets(tmp_path):
+    # The extension plugs into an ambient type of the root manifest, which is not part of all_objects
+    root = str(tmp_path / "AWDMetadata.bin")
+    extension = str(tmp_path / "extensions" / "config.bin")
+    os.makedirs(os.path.dirname(extension))
+    write_manifest(
+        root,
+        {0x00: [define_object("Log", define_property(0x01, 0x0D, "softwareBuild"))]},
+        True,
+        types=[define_enum("Mode", off=0, on=1), define_object("Configuration", define_property(0x01, 0x0D, "name"))],
+    )
+    added = define_property(0x05, 0x0D, "region", extension_tag=0x01, extension_scope=0x03)
+    write_manifest(extension, {0x2A: [define_object("ConfigurationExtension", added)]})
+    metadata = Metadata(root, str(tmp_path / "extensions" / "*.bin"))
+    metadata.resolve()
+
+    restored = pickle.loads(pickle.dumps(metadata.snapshot())).restore()
+    extended = restored.all_objects[0x2A0000].own_properties[0]
+    assert extended.name == "region"
+    assert extended.extends is not None and extended.extends.name == "Configuration"
+    assert [prop.name for prop in extended.extends.properties] == ["name", "region"]
+    assert extended.extends.properties[1] is extended
+    assert restored.all_objects.keys() == metadata.all_objects.keys()
@@ -0,0 +1,124 @@
+import sqlite3
+
+from awdd.metadata import Metadata
+from awdd.parser import LogParser
+from awdd.sqlite import SqliteExporter
+from tests import (
+    define_enum,
+    encode_message,
+    define_object,
+    define_property,
+    synthetic_log,
+    write_manifest,
+    write_synthetic_manifests,
+)
+
+
+def test_export_synthetic_logs(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    paths = []
+    for number, build in enumerate(["20A362", "20B82"]):
+        path = tmp_path / f"log{number}.awd"
+        path.write_bytes(synthetic_log((1000 * (number + 1), 1500 * (number + 1)), build))
+        paths.append(path)
+
+    database = tmp_path / "logs.sqlite"
+    with SqliteExporter(database, metadata, batch_size=7) as exporter:
+        assert exporter.export_files(paths) == 2
+
+    connection = sqlite3.connect(database)
+    assert connection.execute("SELECT path FROM files ORDER BY id").fetchall() == [
+        (str(path),) for path in paths
+    ]
+    assert connection.execute(
+        "SELECT class, COUNT(*) FROM objects GROUP BY class ORDER BY class"
+    ).fetchall() == [
+        ("Header", 2),
+        ("Log", 2),
+        ("MetricLog", 4),
+        ("Sample", 4),
+        ("WifiStats", 4),
+    ]
+
+    assert connection.execute(
+        'SELECT h.softwareBuild, d.name FROM Header h JOIN enum_DeviceType d ON d.value = h.deviceType '
+        "JOIN objects o ON o.id = h.parent_id JOIN files f ON f.id = o.file_id ORDER BY f.id"
+    ).fetchall() == [("20A362", "phone"), ("20B82", "phone")]
+
+    assert connection.execute(
+        "SELECT m.timestamp, w.ssid, w.parent_field FROM MetricLog m JOIN WifiStats w ON w.parent_id = m.id "
+        "ORDER BY m.timestamp"
+    ).fetchall() == [
+        (1000, "network", "wifiStats"),
+        (1500, "network", "wifiStats"),
+        (2000, "network", "wifiStats"),
+        (3000, "network", "wifiStats"),
+    ]
+
+    assert connection.execute(
+        "SELECT position, value FROM Sample_values WHERE owner_id = (SELECT MIN(id) FROM Sample) ORDER BY position"
+    ).fetchall() == [(0, 1), (1, 2)]
+
+
+def test_export_appends_to_existing_database(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    database = tmp_path / "logs.sqlite"
+    log = LogParser(metadata).parse(synthetic_log())
+    for _ in range(2):
+        with SqliteExporter(database, metadata) as exporter:
+            exporter.export(log)
+
+    connection = sqlite3.connect(database)
+    assert connection.execute("SELECT COUNT(*) FROM Log").fetchone() == (2,)
+    assert connection.execute("SELECT COUNT(*) FROM enum_StateFlags").fetchone() == (4,)
+
+
+def test_same_named_enums_get_their_own_tables(tmp_path):
+    root, extensions = write_synthetic_manifests(str(tmp_path))
+    # Another category with an enum named like the root's, differing only in case, and a class using it
+    write_manifest(
+        str(tmp_path / "Metadata" / "radio.bin"),
+        {
+            0x2B: [
+                define_object("header", define_property(0x01, 0x0B, "band", enum_type=0x00)),
+                define_enum("devicetype", low=7, high=8),
+            ]
+        },
+        identity=("03" * 20, "radio", 1660000000000),
+    )
+    metadata = Metadata(root, extensions)
+
+    database = tmp_path / "logs.sqlite"
+    with SqliteExporter(database, metadata) as exporter:
+        exporter.export(LogParser(metadata).parse(synthetic_log()))
+
+    connection = sqlite3.connect(database)
+    tables = {name for (name,) in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"enum_DeviceType", "enum_devicetype_2b0000", "Header", "header_2b0000"} <= tables
+    assert connection.execute("SELECT name FROM enum_DeviceType ORDER BY value").fetchall() == [("phone",), ("watch",)]
+    assert connection.execute("SELECT name FROM enum_devicetype_2b0000 ORDER BY value").fetchall() == [
+        ("low",),
+        ("high",),
+    ]
+    references = connection.execute("PRAGMA foreign_key_list(header_2b0000)").fetchall()
+    assert [reference[2] for reference in references if reference[3] == "band"] == ["enum_devicetype_2b0000"]
+
+
+def test_child_tables_do_not_collide_with_classes(tmp_path):
+    path = str(tmp_path / "AWDMetadata.bin")
+    foo = define_object(
+        "Foo",
+        define_property(0x01, 0x04, "bar", flags=0x01),
+        define_property(0x02, 0x1B, "nested", object_type=0x01),
+    )
+    write_manifest(path, {0x00: [foo, define_object("Foo_bar", define_property(0x01, 0x04, "value"))]}, True)
+    metadata = Metadata(path, str(tmp_path / "none" / "*.bin"))
+    log = LogParser(metadata).parse(encode_message([(0x01, 5), (0x01, 6), (0x02, [(0x01, 9)])]))
+
+    database = tmp_path / "logs.sqlite"
+    with SqliteExporter(database, metadata) as exporter:
+        exporter.export(log)
+
+    connection = sqlite3.connect(database)
+    assert connection.execute("SELECT value FROM Foo_bar").fetchall() == [(9,)]
+    assert connection.execute("SELECT value FROM Foo_bar_1 ORDER BY position").fetchall() == [(5,), (6,)]
@@ -0,0 +1,110 @@
+import io
+import os
+import threading
+
+import pytest
+
+from awdd import TruncatedTagError, decode_tags
+from awdd.metadata import Metadata
+from awdd.parser import LogParser
+from awdd.stream import ChunkedTagReader, PayloadStream
+from tests import encode_message, synthetic_log, write_synthetic_manifests
+
+
+def pipe_of(data: bytes):
+    read_fd, write_fd = os.pipe()
+
+    def writer():
+        with os.fdopen(write_fd, "wb") as output:
+            output.write(data)
+
+    threading.Thread(target=writer, daemon=True).start()
+    return os.fdopen(read_fd, "rb", buffering=0)
+
+
+def test_chunked_reader_matches_decode_tags():
+    data = synthetic_log() * 50
+    expected = decode_tags(data)
+
+    with pipe_of(data) as stream:
+        reader = ChunkedTagReader(stream, window_size=16)
+        tags = list(reader)
+
+    assert [(tag.index, tag.length, tag.value) for tag in tags] == [
+        (tag.index, tag.length, tag.value) for tag in expected
+    ]
+    assert reader.offset == len(data)
+    assert len(reader._buffer) <= 32
+
+
+@pytest.mark.parametrize("use_pipe", [False, True])
+def test_oversized_payloads_are_streamed(use_pipe):
+    data = synthetic_log()
+    expected = decode_tags(data)
+    stream = pipe_of(data) if use_pipe else io.BytesIO(data)
+
+    reader = ChunkedTagReader(stream, window_size=8, max_payload=32)
+    values = []
+    for tag in reader:
+        if isinstance(tag.value, PayloadStream):
+            # Only read part of the payload, the reader skips the rest
+            values.append(tag.value.read(4))
+        else:
+            values.append(tag.value)
+
+    assert values[:2] == [expected[0].value, expected[1].value]
+    assert values[2:] == [tag.value[:4] for tag in expected[2:]]
+    assert reader.offset == len(data)
+
+
+def test_truncated_tag():
+    data = synthetic_log()
+    reader = ChunkedTagReader(io.BytesIO(data[:-3]), window_size=8)
+
+    with pytest.raises(TruncatedTagError):
+        list(reader)
+
+
+def test_truncated_payload_stream():
+    data = encode_message([(0x01, bytes(64))])
+    payload = ChunkedTagReader(io.BytesIO(data[:-3]), window_size=8, max_payload=32).read_tag().value
+    # The read fails itself rather than returning what there was as if the payload ended there
+    with pytest.raises(TruncatedTagError):
+        payload.read()
+
+
+def test_skipping_past_the_end(tmp_path):
+    data = synthetic_log()
+    path = tmp_path / "cut.metriclog"
+    path.write_bytes(data[:-3])
+
+    def skip_all(stream):
+        reader = ChunkedTagReader(stream, window_size=8)
+        while (header := reader.read_header()) is not None:
+            reader.skip_payload(header)
+        return reader.offset
+
+    # Seeked over in a file, read through in a pipe
+    with open(path, "rb") as stream, pytest.raises(TruncatedTagError):
+        skip_all(stream)
+    read, write = os.pipe()
+    with os.fdopen(read, "rb") as stream:
+        os.write(write, data[:-3])
+        os.close(write)
+        with pytest.raises(TruncatedTagError):
+            skip_all(stream)
+
+    path.write_bytes(data)
+    with open(path, "rb") as stream:
+        assert skip_all(stream) == len(data)
+
+
+def test_parse_chunked(tmp_path):
+    parser = LogParser(Metadata(*write_synthetic_manifests(str(tmp_path))))
+    data = synthetic_log()
+
+    expected = parser.parse(io.BytesIO(data))
+    with pipe_of(data) as stream:
+        values = list(parser.parse_chunked(stream, window_size=8))
+
+    assert values == expected.properties
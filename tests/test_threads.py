@@ -0,0 +1,64 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from awdd import ManifestError
+from awdd.instrumentation import DecodeStats
+from awdd.json_writer import JsonWriter
+from awdd.metadata import Metadata
+from awdd.parser import LogParser
+from tests import synthetic_log, write_synthetic_manifests
+
+
+def test_parse_many_matches_sequential(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    logs = [synthetic_log(timestamps=(1000 + number, 2000 + number), build=f"B{number}") for number in range(40)]
+    paths = []
+    for number, log in enumerate(logs[:10]):
+        path = tmp_path / f"{number}.metriclog"
+        path.write_bytes(log)
+        paths.append(path)
+
+    sequential_stats = DecodeStats()
+    sequential = LogParser(metadata, stats=sequential_stats)
+    expected = [JsonWriter().dumps(sequential.parse(log)) for log in logs + logs[:10]]
+
+    stats = DecodeStats()
+    parser = LogParser(metadata, stats=stats)
+    results = parser.parse_many(logs + paths, max_workers=8)
+
+    assert [JsonWriter().dumps(result) for result in results] == expected
+    assert stats.bytes_read == sequential_stats.bytes_read
+    assert stats.tags_by_wire_type == sequential_stats.tags_by_wire_type
+    assert stats.objects_by_class == sequential_stats.objects_by_class
+
+    with pytest.raises(FileNotFoundError):
+        parser.parse_many([logs[0], tmp_path / "missing.metriclog"])
+
+
+def test_schema_is_resolved_once_and_frozen(tmp_path, monkeypatch):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    calls = []
+    original = Metadata._merge
+
+    def counting_merge(self):
+        calls.append(threading.get_ident())
+        original(self)
+
+    monkeypatch.setattr(Metadata, "_merge", counting_merge)
+
+    barrier = threading.Barrier(8)
+
+    def resolve(_):
+        barrier.wait()
+        return LogParser(metadata).parse(synthetic_log()).properties[0].value
+
+    with ThreadPoolExecutor(8) as pool:
+        assert set(pool.map(resolve, range(8))) == {1660000000000}
+    assert len(calls) == 1
+
+    with pytest.raises(TypeError):
+        metadata.all_objects[0x7FFF] = None
+    with pytest.raises(ManifestError):
+        metadata.root().name = "Changed"
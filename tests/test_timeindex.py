@@ -0,0 +1,91 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from awdd import DecodeError
+from awdd.metadata import Metadata
+from awdd.timeindex import TimeIndex, TimeIndexBuilder, build_time_index
+from tests import SYNTHETIC_METRIC_ID, synthetic_log, write_synthetic_manifests
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    paths = []
+    for number, timestamps in enumerate([(3000, 1000), (2000, 5000), (4000,)]):
+        path = tmp_path / f"log{number}.awd"
+        path.write_bytes(synthetic_log(timestamps))
+        paths.append(path)
+
+    index = build_time_index(metadata, paths, tmp_path / "logs.awdt")
+    yield metadata, paths, index
+    index.close()
+
+
+def test_index_is_sorted(corpus):
+    metadata, paths, index = corpus
+
+    assert len(index) == 5
+    assert [entry.time for entry in index] == [1000, 2000, 3000, 4000, 5000]
+    assert [entry.file for entry in index] == [0, 1, 0, 2, 1]
+    assert {entry.metric for entry in index} == {SYNTHETIC_METRIC_ID}
+    assert index.files == [str(path) for path in paths]
+    assert index.stale_files() == []
+
+
+def test_query_decodes_only_matching_entries(corpus):
+    metadata, paths, index = corpus
+
+    assert [entry.time for entry in index.query(2000, 4000)] == [2000, 3000]
+    assert list(index.query(6000, 7000)) == []
+    assert [entry.time for entry in index.query(datetime(1970, 1, 1, 0, 0, 4), 10**6)] == [
+        4000,
+        5000,
+    ]
+    assert list(index.query(0, 10**6, metric=1)) == []
+
+    records = list(index.records(metadata, 1500, 3500))
+    assert [entry.time for entry, _ in records] == [2000, 3000]
+    for entry, record in records:
+        assert record.object_class.name == "MetricLog"
+        assert record.properties[0].value == entry.time
+        assert record.properties[-1].value.object_class.name == "WifiStats"
+
+
+def test_index_falls_back_to_trigger_time(tmp_path):
+    metadata = Metadata(*write_synthetic_manifests(str(tmp_path)))
+    path = tmp_path / "log.awd"
+    path.write_bytes(synthetic_log((1000,)))
+
+    builder = TimeIndexBuilder(metadata, time_fields=("missing", "triggerTime"))
+    builder.add_file(path)
+    builder.write(tmp_path / "logs.awdt")
+
+    with TimeIndex(tmp_path / "logs.awdt") as index:
+        assert [entry.time for entry in index] == [1005]
+
+    path.write_bytes(synthetic_log((1000, 2000)))
+    with TimeIndex(tmp_path / "logs.awdt") as index:
+        assert index.stale_files() == [str(path)]
+
+
+def test_records_refuse_changed_logs(corpus):
+    metadata, paths, index = corpus
+
+    # Same size, so only the modification time gives it away
+    stat = os.stat(paths[1])
+    os.utime(paths[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert [entry.time for entry, _ in index.records(metadata, 0, 1500)] == [1000]
+    with pytest.raises(DecodeError, match="changed since it was indexed"):
+        list(index.records(metadata, 0, 10**6))
+
+
+def test_invalid_index_files(tmp_path):
+    (tmp_path / "short.awdt").write_bytes(b"AWDT")
+    with pytest.raises(DecodeError, match="not a time index"):
+        TimeIndex(tmp_path / "short.awdt")
+
+    (tmp_path / "other.awdt").write_bytes(b"ABCD" + bytes(20))
+    with pytest.raises(DecodeError, match="not a version 1 time index"):
+        TimeIndex(tmp_path / "other.awdt")
@@ -0,0 +1,46 @@
+import io
+from datetime import datetime
+
+import pytest
+
+from awdd import apple_time_to_datetime
+from awdd.metadata import Metadata
+from awdd.parser import LogParser
+from awdd.timestamps import timestamps_to_datetime64, timestamps_to_isoformat
+from tests import synthetic_log, write_synthetic_manifests
+
+TIMESTAMPS = [0, 1660000000123, 1660000060999]
+
+
+def test_apple_time_to_datetime():
+    assert apple_time_to_datetime(1660000000123) == datetime(
+        2022, 8, 8, 23, 6, 40, 123000
+    )
+
+
+def test_timestamps_to_isoformat():
+    assert timestamps_to_isoformat(TIMESTAMPS) == [
+        "1970-01-01T00:00:00.000",
+        "2022-08-08T23:06:40.123",
+        "2022-08-08T23:07:40.999",
+    ]
+
+
+def test_timestamps_to_datetime64():
+    numpy = pytest.importorskip("numpy")
+    values = timestamps_to_datetime64(TIMESTAMPS)
+
+    assert values.dtype == numpy.dtype("datetime64[ms]")
+    assert values.astype("int64").tolist() == TIMESTAMPS
+
+
+def test_timestamp_values_stay_raw(tmp_path):
+    parser = LogParser(Metadata(*write_synthetic_manifests(str(tmp_path))))
+    log = parser.parse(io.BytesIO(synthetic_log()))
+    timestamp, header = log.properties[0], log.properties[1]
+
+    assert timestamp.value == 1660000000000
+    assert type(timestamp.value) is int
+    assert timestamp.is_timestamp
+    assert timestamp.datetime == datetime(2022, 8, 8, 23, 6, 40)
+    assert header.datetime is None